@@ -0,0 +1,78 @@
+"""
+Compares compress_utils.compress_file with the previous tar-then-gzip implementation
+on a synthetic tree of Zarr metric stores, similar to a run saved with MetricsType.ZARR.
+
+Usage:
+    python benchmarks/bench_compress.py [--metrics 40] [--samples 200000] [--threads 8]
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+import numpy as np
+import zarr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prov4ml.utils import compress_utils
+
+def create_metrics_tree(path: str, metrics: int, samples: int) -> int:
+    """Writes `metrics` Zarr stores of `samples` values in chunks of 1000, returns the number of files."""
+    for m in range(metrics):
+        group = zarr.open(os.path.join(path, f"metric_{m}_Context.TRAINING_GR0.zarr"), mode="w")
+        rng = np.random.default_rng(m)
+        group.create_dataset("values", data=np.cumsum(rng.normal(size=samples)).astype("f4"), chunks=(1000,))
+        group.create_dataset("epochs", data=(np.arange(samples) // 1000).astype("i4"), chunks=(1000,))
+        group.create_dataset("timestamps", data=(1.7e12 + np.arange(samples) * 37).astype("i8"), chunks=(1000,))
+    return sum(len(files) for _, _, files in os.walk(path))
+
+def legacy_compress(input_file: str, output_file: str) -> str:
+    """The implementation before streaming: writes an intermediate .tar, then gzips it."""
+    with tarfile.open(output_file + ".tar", "w") as tar:
+        tar.add(input_file, arcname=os.path.basename(input_file))
+    with open(output_file + ".tar", "rb") as f_in, gzip.open(output_file + ".tar.gz", "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(output_file + ".tar")
+    return output_file + ".tar.gz"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metrics", type=int, default=40)
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, "metrics")
+        files = create_metrics_tree(tree, args.metrics, args.samples)
+        print(f"{files} files, {args.threads} threads, {os.cpu_count()} cores")
+
+        cases = [
+            ("legacy tar + gzip", lambda out: legacy_compress(tree, out)),
+            ("gzip, 1 thread", lambda out: compress_utils.compress_file(tree, out, threads=1)),
+            (f"gzip, {args.threads} threads", lambda out: compress_utils.compress_file(tree, out, threads=args.threads)),
+        ]
+        try:
+            import zstandard # noqa: F401
+            cases.append((f"zstd -3, {args.threads} threads", lambda out: compress_utils.compress_file(tree, out, codec="zstd", level=3, threads=args.threads)))
+        except ImportError:
+            print("zstandard is not installed, skipping zstd")
+
+        for i, (label, compress) in enumerate(cases):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                path = compress(os.path.join(tmp, f"out_{i}"))
+            elapsed = time.perf_counter() - start
+            print(f"{label:24s} {elapsed:7.2f}s {os.path.getsize(path) / 1e6:8.2f}MB")
+
+        with tarfile.open(os.path.join(tmp, "out_2.tar.gz")) as tar:
+            assert len(tar.getnames()) >= files, "the parallel gzip archive is incomplete"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the model version storages of save_model_version ("torch", "dedup", "delta", "safetensors")
+on a series of versions of a partially frozen model: size on disk, save time and load time.
+
+Usage:
+    python benchmarks/bench_model_storage.py [--layers 12] [--frozen 8] [--width 1024] [--versions 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prov4ml.utils import model_storage
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+def make_model(layers: int, frozen: int, width: int) -> torch.nn.Module:
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(*[torch.nn.Linear(width, width) for _ in range(layers)])
+    for layer in list(model)[:frozen]:
+        layer.requires_grad_(False)
+    return model
+
+def train_step(model: torch.nn.Module, optimizer: torch.optim.Optimizer, width: int) -> None:
+    optimizer.zero_grad()
+    model(torch.randn(8, width)).pow(2).mean().backward()
+    optimizer.step()
+
+def get_save(storage: str, path: str, name: str, version: int, keyframe_interval: int):
+    """Returns the save function used by save_model_version for `storage`."""
+    extension = model_storage.MODEL_STORAGES[storage]
+    if storage == "dedup":
+        previous_path = os.path.join(path, f"{name}_{version - 1}{extension}") if version > 0 else None
+        return lambda state, save_path: model_storage.save_deduplicated(state, save_path, previous_path)
+    if storage == "delta":
+        keyframe_path = model_storage.get_delta_keyframe(os.path.join(path, f"{name}_{version}{extension}"), version, keyframe_interval)
+        return lambda state, save_path: model_storage.save_delta(state, save_path, keyframe_path)
+    if storage == "safetensors":
+        return model_storage.save_safetensors
+    return torch.save
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layers", type=int, default=12)
+    parser.add_argument("--frozen", type=int, default=8)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--versions", type=int, default=20)
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.layers} Linear({args.width}, {args.width}) layers, {args.frozen} frozen, {args.versions} versions")
+    print(f"{'storage':12s} {'disk MB':>9s} {'save ms':>9s} {'load ms':>9s}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage, extension in model_storage.MODEL_STORAGES.items():
+            # the layout of save_model_version: <artifacts>/<model_name>/<model_name>_<version><extension>,
+            # blobs of the "dedup" storage are shared in <artifacts>/objects
+            artifacts_dir = os.path.join(tmp, storage)
+            path = os.path.join(artifacts_dir, "model")
+            os.makedirs(path)
+            model = make_model(args.layers, args.frozen, args.width)
+            optimizer = torch.optim.SGD([p for p in model.parameters() if p.requires_grad], lr=1e-3)
+
+            saved, save_time = [], 0.0
+            for version in range(args.versions):
+                train_step(model, optimizer, args.width)
+                state = {name: tensor.detach().clone() for name, tensor in model.state_dict().items()}
+                version_path = os.path.join(path, f"model_{version}{extension}")
+                save = get_save(storage, path, "model", version, args.keyframe_interval)
+                start = time.perf_counter()
+                save(state, version_path)
+                save_time += time.perf_counter() - start
+                saved.append((version_path, state))
+
+            # loads start without cached keyframes, as in a new process
+            model_storage._delta_series_reset()
+            load_time = 0.0
+            for version_path, state in saved:
+                start = time.perf_counter()
+                loaded = model_storage.load_model_version(version_path)
+                load_time += time.perf_counter() - start
+                assert all(torch.equal(loaded[name], tensor) for name, tensor in state.items()), f"{storage} did not restore {version_path}"
+
+            print(f"{storage:12s} {directory_size(artifacts_dir) / 1e6:9.1f} {save_time / args.versions * 1e3:9.1f} {load_time / args.versions * 1e3:9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Measures the per-call cost of the logging functions on a rank that does not collect provenance,
+which return before doing any work.
+
+Usage:
+    python benchmarks/bench_non_collecting.py [--calls 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prov4ml
+from prov4ml.constants import PROV4ML_DATA
+
+def bench(label: str, log, calls: int) -> None:
+    start = time.perf_counter()
+    for step in range(calls):
+        log(step)
+    print(f"{label:22s} {(time.perf_counter() - start) / calls * 1e6:8.2f} us/call")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    model = torch.nn.Linear(64, 64)
+    batch = (torch.randn(32, 64), None)
+    context = prov4ml.Context.TRAINING
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # rank 1 does not collect, since collect_all_processes is False
+        prov4ml.start_run("www.example.org", "bench_non_collecting", tmp, rank=1)
+        assert not PROV4ML_DATA.is_collecting
+
+        bench("log_metric", lambda step: prov4ml.log_metric("loss", 1.0, context, step=step), args.calls)
+        bench("log_system_metrics", lambda step: prov4ml.log_system_metrics(context, step=step), args.calls)
+        bench("log_carbon_metrics", lambda step: prov4ml.log_carbon_metrics(context, step=step), args.calls)
+        bench("log_flops_per_batch", lambda step: prov4ml.log_flops_per_batch("flops", model, batch, context, step=step), args.calls)
+        bench("save_model_version", lambda step: prov4ml.save_model_version(model, "model", context, step=step), args.calls)
+
+        prov4ml.end_run()
+
+if __name__ == "__main__":
+    main()
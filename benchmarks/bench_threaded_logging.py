@@ -0,0 +1,73 @@
+"""
+Measures the throughput of log_metric when several threads log the same metric,
+and checks that the saved values are ordered by timestamp.
+
+Usage:
+    python benchmarks/bench_threaded_logging.py [--samples 100000] [--threads 1 2 4 8] [--txt]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prov4ml
+from prov4ml.constants import PROV4ML_DATA
+
+def read_timestamps(metrics_dir: str, metric: str, file_type: prov4ml.MetricsType) -> np.ndarray:
+    """Reads back the timestamps saved for `metric`."""
+    path = glob.glob(os.path.join(metrics_dir, f"{metric}_*.{file_type.value}"))[0]
+    if file_type == prov4ml.MetricsType.TXT:
+        with open(path) as f:
+            return np.array([int(line.rsplit(",", 1)[1]) for line in f.read().splitlines()[1:]])
+    import zarr
+    return zarr.open(path, mode="r")["timestamps"][:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--save-after-n-logs", type=int, default=10_000)
+    parser.add_argument("--txt", action="store_true", help="save metrics as text instead of zarr")
+    args = parser.parse_args()
+    file_type = prov4ml.MetricsType.TXT if args.txt else prov4ml.MetricsType.ZARR
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prov4ml.start_run(
+            prov_user_namespace="www.example.org",
+            experiment_name="bench_threaded_logging",
+            provenance_save_dir=tmp,
+            save_after_n_logs=args.save_after_n_logs,
+            metrics_file_type=file_type,
+            use_compression=False,
+        )
+        print(f"{os.cpu_count()} cores, {file_type.value} files")
+
+        for threads in args.threads:
+            per_thread = args.samples // threads
+            metric = f"shared_{threads}"
+            def work():
+                for step in range(per_thread):
+                    prov4ml.log_metric(metric, 0.5, prov4ml.Context.TRAINING, step=step)
+
+            workers = [threading.Thread(target=work) for _ in range(threads)]
+            start = time.perf_counter()
+            for worker in workers: worker.start()
+            for worker in workers: worker.join()
+            elapsed = time.perf_counter() - start
+            print(f"{threads} threads: {per_thread * threads / elapsed:12,.0f} samples/s")
+
+        metrics_dir = PROV4ML_DATA.METRICS_DIR
+        prov4ml.end_run()
+
+        for threads in args.threads:
+            timestamps = read_timestamps(metrics_dir, f"shared_{threads}", file_type)
+            print(f"{threads} threads: {len(timestamps)} values saved, {int(np.sum(np.diff(timestamps) < 0))} out of order")
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,20 @@
 from .logging_aux import *
 from .prov4ml import *
 from .datamodel.cumulative_metrics import FoldOperation
-from .loggers.prov4ml_logger import ProvMLLogger
-from .loggers.prov4ml_itwinai_logger import ProvMLItwinAILogger, LoggingItemKind
\ No newline at end of file
+from .datamodel.attribute_type import LoggingItemKind
+from .utils.model_storage import load_model_version, open_model_version
+
+# the loggers depend on lightning and itwinai, they are only imported when first accessed
+_LAZY_ATTRIBUTES = {
+    "ProvMLLogger": ".loggers.prov4ml_logger",
+    "ProvMLItwinAILogger": ".loggers.prov4ml_itwinai_logger",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,29 @@
 
+from contextvars import ContextVar
+from typing import Any
+
 from prov4ml.datamodel.prov4ml_data import Prov4MLData
 
-# Global variable to store provenance data
-PROV4ML_DATA = Prov4MLData()
\ No newline at end of file
+# Provenance data of the default run, used by `start_run` and `end_run`
+DEFAULT_PROV4ML_DATA = Prov4MLData()
+
+# Provenance data of the run active in the current thread or task, see `prov4ml.Run.activate`
+_ACTIVE_PROV4ML_DATA: ContextVar[Prov4MLData] = ContextVar("prov4ml_active_data", default=DEFAULT_PROV4ML_DATA)
+
+def get_active_data() -> Prov4MLData:
+    """Returns the provenance data of the run active in the current context, the default run unless a `Run` is activated."""
+    return _ACTIVE_PROV4ML_DATA.get()
+
+class _ActiveProv4MLData:
+    """Forwards attribute accesses to the provenance data of the run active in the current context."""
+    __slots__ = ()
+
+    # forwards every attribute, without looking it up on the proxy first
+    def __getattribute__(self, name: str) -> Any:
+        return getattr(_ACTIVE_PROV4ML_DATA.get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(_ACTIVE_PROV4ML_DATA.get(), name, value)
+
+# Global variable to store provenance data, resolved to the active run
+PROV4ML_DATA = _ActiveProv4MLData()
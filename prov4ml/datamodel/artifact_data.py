@@ -3,6 +3,7 @@ from typing import Any, Optional
 import warnings
 
 from prov4ml.utils.funcs import get_current_time_millis
+from prov4ml.utils.model_storage import DELTA_EXTENSION, MANIFEST_EXTENSION, SAFETENSORS_EXTENSION
 
 class ArtifactInfo:
     """
@@ -16,6 +17,8 @@ class ArtifactInfo:
         creation_timestamp (Optional[int]): The creation timestamp of the artifact.
         last_modified_timestamp (Optional[int]): The last modified timestamp of the artifact.
         is_model_version (bool): Indicates if the artifact is a PyTorch model.
+        digest (Optional[str]): The BLAKE2b digest of the artifact, set in the background once computed.
+        size (Optional[int]): The size of the artifact in bytes, set along with the digest.
     """
     def __init__(
         self, 
@@ -33,6 +36,8 @@ class ArtifactInfo:
         self.last_modified_timestamp = timestamp
 
         self.is_model_version = artifact_is_pytorch_model(name)
+        self.digest: Optional[str] = None
+        self.size: Optional[int] = None
 
     def update(
         self, 
@@ -66,9 +71,9 @@ def artifact_is_pytorch_model(artifact: Any) -> bool:
     """
 
     if type(artifact) is str: 
-        return artifact.endswith(".pt") or artifact.endswith(".pth") or artifact.endswith(".torch")
+        return artifact.endswith((".pt", ".pth", ".torch", MANIFEST_EXTENSION, DELTA_EXTENSION, SAFETENSORS_EXTENSION))
     elif type(artifact) is ArtifactInfo:
-        return artifact.path.endswith(".pt") or artifact.path.endswith(".pth") or artifact.path.endswith(".torch")
+        return artifact.path.endswith((".pt", ".pth", ".torch", MANIFEST_EXTENSION, DELTA_EXTENSION, SAFETENSORS_EXTENSION))
         
     warnings.warn("Artifact is not a string or ArtifactInfo object. Cannot determine if it is a PyTorch model.")
     return False
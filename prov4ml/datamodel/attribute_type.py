@@ -15,6 +15,10 @@ class LoggingItemKind(Enum):
         Represents the FLOPS (floating-point operations per second) calculated per batch.
     FLOPS_PER_EPOCH : str
         Represents the FLOPS calculated per epoch.
+    FLOPS_PER_LAYER : str
+        Represents the FLOPS of a single layer, estimated analytically per batch.
+    MODEL_STATISTIC : str
+        Represents statistics of the parameters or gradients of a model, such as their norms.
     SYSTEM_METRIC : str
         Represents system metrics related to hardware and system performance.
     CARBON_METRIC : str
@@ -37,6 +41,8 @@ class LoggingItemKind(Enum):
     METRIC = 'metric'
     FLOPS_PER_BATCH = 'flops_pb'
     FLOPS_PER_EPOCH = 'flops_pe'
+    FLOPS_PER_LAYER = 'flops_pl'
+    MODEL_STATISTIC = 'model_stats'
     SYSTEM_METRIC = 'system'
     CARBON_METRIC = 'carbon'
     EXECUTION_TIME = 'execution_time'
@@ -97,6 +103,10 @@ class Prov4MLAttribute:
             return 'custom_metric'
         elif kind == LoggingItemKind.FLOPS_PER_BATCH or kind == LoggingItemKind.FLOPS_PER_EPOCH:
             return 'fvcore.nn.FlopCountAnalysis'
+        elif kind == LoggingItemKind.FLOPS_PER_LAYER:
+            return 'prov4ml.utils.flops_utils'
+        elif kind == LoggingItemKind.MODEL_STATISTIC:
+            return 'prov4ml.utils.stats_utils'
         elif kind == LoggingItemKind.SYSTEM_METRIC:
             if sys.platform != 'darwin':
                 return 'pyamdgpuinfo'
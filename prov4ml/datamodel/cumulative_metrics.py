@@ -1,5 +1,11 @@
 
-from typing import Any  
+import threading
+from typing import Any, List
+
+from prov4ml.utils.stats_utils import is_tensor, stage_tensor, tensors_to_host
+
+# tensor values kept on their device by a cumulative metric at most, before they are folded
+MAX_PENDING_VALUES = 1024
 
 class FoldOperation:
     """
@@ -38,6 +44,8 @@ class CumulativeMetric:
         The current value of the cumulative metric.
     fold_operation : callable
         The operation used to combine the current value with new values.
+    pending_values : List[torch.Tensor]
+        Tensor values kept on their device, folded into the current value when it is read or the metric is saved.
 
     Methods:
     --------
@@ -45,6 +53,8 @@ class CumulativeMetric:
         Initializes the CumulativeMetric with a label, an initial value, and a fold operation.
     update(value: Any) -> None
         Updates the current value of the metric using the specified fold operation.
+    fold_pending_values() -> None
+        Folds the tensor values kept on their device into the current value.
     """
     def __init__(
             self, 
@@ -69,8 +79,30 @@ class CumulativeMetric:
         None
         """
         self.label = label
-        self.current_value = initial_value
+        self._current_value = initial_value
         self.fold_operation = fold_operation
+        self.pending_values: List[Any] = []
+        self._lock = threading.RLock()
+
+    @property
+    def current_value(self) -> Any:
+        with self._lock:
+            self.fold_pending_values()
+            return self._current_value
+
+    def fold_pending_values(self) -> None:
+        """
+        Copies the pending tensor values to the host, with one batched copy per device, and folds them into the current value.
+
+        Returns:
+        --------
+        None
+        """
+        with self._lock:
+            if not self.pending_values: return
+            values, self.pending_values = tensors_to_host(self.pending_values), []
+            for value in values:
+                self._current_value = self.fold_operation(self._current_value, value)
 
     def update(self, value : Any) -> None:
         """
@@ -80,9 +112,17 @@ class CumulativeMetric:
         -----------
         value : Any
             The new value to be combined with the current value using the fold operation.
+            Single-element tensors are kept on their device until the current value is read, the metric
+            it follows is saved, or `MAX_PENDING_VALUES` of them are pending.
 
         Returns:
         --------
         None
         """
-        self.current_value = self.fold_operation(self.current_value, value)
\ No newline at end of file
+        with self._lock:
+            if is_tensor(value):
+                self.pending_values.append(stage_tensor(value))
+                if len(self.pending_values) >= MAX_PENDING_VALUES:
+                    self.fold_pending_values()
+            else:
+                self._current_value = self.fold_operation(self.current_value, value)
\ No newline at end of file
@@ -1,12 +1,19 @@
 
 import os
+import sys
+import heapq
+import itertools
+import threading
+from collections import deque
+from operator import itemgetter
 import numpy as np
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, List, Tuple
 from typing import Optional
-import zarr
 
 from prov4ml.datamodel.attribute_type import LoggingItemKind
 from prov4ml.provenance.metrics_type import MetricsType
+from prov4ml.utils.stats_utils import RunningStats, is_tensor, stage_tensor, tensors_to_host
+from prov4ml.utils.zarr_utils import get_zarr_staging_path, open_zarr_store, pack_zarr_to_zip
 
 class MetricInfo:
     """
@@ -23,16 +30,32 @@ class MetricInfo:
     total_metric_values : int
         The total number of metric values recorded.
     epochDataList : dict
-        A dictionary mapping epoch numbers to lists of metric values recorded in those epochs.
+        A dictionary mapping epoch numbers to lists of metric values recorded in those epochs, 
+        filled from the append buffers of the threads when the metric is saved.
+    stats : RunningStats
+        Running statistics of all the values saved to file so far.
+    lock : threading.RLock
+        Held while the buffers are merged and saved, adding a value does not take it.
+
+    Each thread appends the values it logs to its own buffer, so logging from several threads takes no lock.
+    The buffers are merged by timestamp, then by logging order, when the metric is saved. Values saved 
+    later than values with a newer timestamp, e.g. by a thread preempted while logging, are merged 
+    into the tail of the file, which stays ordered by timestamp.
 
     Methods:
     --------
     __init__(name: str, context: Any, source=LoggingItemKind) -> None
         Initializes the MetricInfo class with the given name, context, and source.
-    add_metric(value: Any, epoch: int, timestamp : int) -> None
+    add_metric(value: Any, epoch: int, timestamp : int) -> int
         Adds a metric value for a specific epoch to the MetricInfo object.
+    merge_buffers() -> None
+        Moves the values appended by all threads to epochDataList.
+    values_to_host() -> None
+        Replaces the buffered tensor values with their values on the host.
     save_to_file(path : str, process : Optional[int] = None) -> None
         Saves the metric information to a file.
+    pack_to_zip(path : str, process : Optional[int] = None) -> None
+        Packs the zarr store of the metric into a single zip file.
     """
     def __init__(self, name: str, context: Any, source=LoggingItemKind) -> None:
         """
@@ -54,31 +77,108 @@ class MetricInfo:
         self.name = name
         self.context = context
         self.source = source
-        self.total_metric_values = 0
         self.epochDataList: Dict[int, List[Any]] = {}
-
-    def add_metric(self, value: Any, epoch: int, timestamp : int) -> None:
+        self.stats = RunningStats()
+        self.lock = threading.RLock()
+
+        # append buffers of (epoch, value, timestamp, sequence number), one per logging thread
+        self._buffers: List[Tuple[threading.Thread, Deque[Tuple[int, Any, int, int]]]] = []
+        self._local = threading.local()
+        self._sequence = itertools.count(1)
+        self._merged_values = 0
+        # newest timestamp saved to file, values older than it are merged into the saved tail
+        self._last_timestamp = None
+
+    @property
+    def total_metric_values(self) -> int:
+        return self._merged_values + sum(len(buffer) for _, buffer in self._buffers)
+
+    def _thread_buffer(self) -> Deque[Tuple[int, Any, int, int]]:
+        buffer: Deque[Tuple[int, Any, int, int]] = deque()
+        with self.lock:
+            self._buffers.append((threading.current_thread(), buffer))
+        self._local.buffer = buffer
+        return buffer
+
+    def add_metric(self, value: Any, epoch: int, timestamp : int) -> int:
         """
         Adds a metric value for a specific epoch to the MetricInfo object.
 
+        Single-element tensors are kept on their device, so logging them does not wait for the device,
+        and are copied to the host together when the metric is saved.
+
         Parameters:
         -----------
         value : Any
-            The value of the metric to be added.
+            The value of the metric to be added, a number or a single-element tensor.
         epoch : int
             The epoch number in which the metric value is recorded.
         timestamp : int
             The timestamp when the metric value was recorded.
 
+        Returns:
+        --------
+        int
+            The number of values added to the metric so far, this one included.
+        """
+        if is_tensor(value):
+            value = stage_tensor(value)
+
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._thread_buffer()
+
+        # deque appends and itertools.count are atomic, no lock is needed
+        sequence = next(self._sequence)
+        buffer.append((epoch, value, timestamp, sequence))
+        return sequence
+
+    def merge_buffers(self) -> None:
+        """
+        Moves the values appended by all threads to epochDataList, ordered by timestamp and then by
+        logging order. Values appended while merging are kept for the next merge.
+
+        Returns:
+        --------
+        None
+        """
+        with self.lock:
+            items = []
+            for _, buffer in self._buffers:
+                for _ in range(len(buffer)):
+                    items.append(buffer.popleft())
+            # forget the buffers of threads that ended
+            self._buffers = [(thread, buffer) for thread, buffer in self._buffers if buffer or thread.is_alive()]
+
+            items.sort(key=itemgetter(2, 3))
+            for epoch, value, timestamp, _ in items:
+                if epoch not in self.epochDataList:
+                    self.epochDataList[epoch] = []
+                self.epochDataList[epoch].append((value, timestamp))
+            self._merged_values += len(items)
+
+    def values_to_host(self) -> None:
+        """
+        Replaces the buffered tensor values with their values on the host, with one batched copy per device.
+
         Returns:
         --------
         None
         """
-        if epoch not in self.epochDataList:
-            self.epochDataList[epoch] = []
+        torch = sys.modules.get("torch")
+        if torch is None: return
 
-        self.epochDataList[epoch].append((value, timestamp))
-        self.total_metric_values += 1
+        positions = [
+            (items, index) 
+            for items in self.epochDataList.values() 
+            for index, (value, _) in enumerate(items) if isinstance(value, torch.Tensor)
+        ]
+        if not positions: return
+
+        values = tensors_to_host([items[index][0] for items, index in positions])
+        for (items, index), value in zip(positions, values):
+            items[index] = (value, items[index][1])
 
     def save_to_file(
             self, 
@@ -109,15 +209,79 @@ class MetricInfo:
         else:
             file = os.path.join(path, f"{self.name}_{self.context}.{file_type.value}")
 
+        self.merge_buffers()
+        self.values_to_host()
+
         if file_type == MetricsType.ZARR:
             self.save_to_zarr(file, use_compression)
+        elif file_type == MetricsType.ZARR_ZIP:
+            # values are appended to a directory store, packed into the zip file by pack_to_zip
+            self.save_to_zarr(get_zarr_staging_path(file), use_compression)
         elif file_type == MetricsType.TXT:
             self.save_to_txt(file)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
 
+        self.update_stats()
+        timestamps = [timestamp for items in self.epochDataList.values() for _, timestamp in items]
+        if timestamps:
+            self._last_timestamp = max(timestamps if self._last_timestamp is None else timestamps + [self._last_timestamp])
         self.epochDataList = {}
 
+    def _sorted_rows(self) -> List[Tuple[int, Any, int]]:
+        """Returns the (epoch, value, timestamp) rows of epochDataList, ordered by timestamp."""
+        rows = [(epoch, value, timestamp) for epoch, items in self.epochDataList.items() for value, timestamp in items]
+        rows.sort(key=itemgetter(2))
+        return rows
+
+    def _is_late(self, rows: List[Tuple[int, Any, int]]) -> bool:
+        """Checks if some of the rows are older than the newest row already saved to file."""
+        return self._last_timestamp is not None and bool(rows) and rows[0][2] < self._last_timestamp
+
+    def update_stats(self) -> None:
+        """
+        Folds the values currently buffered into the running statistics of the metric.
+        Non numeric values are ignored.
+
+        Returns:
+        --------
+        None
+        """
+        values = [value for items in self.epochDataList.values() for value, _ in items]
+        try:
+            self.stats.update(np.asarray(values, dtype=np.float64))
+        except (TypeError, ValueError):
+            pass
+
+    def pack_to_zip(
+            self,
+            path: str,
+            process: Optional[int] = None
+        ) -> None:
+        """
+        Packs the zarr store of the metric into a single zip file, which readers can open in place.
+
+        Parameters:
+        -----------
+        path : str
+            The directory path where the file is saved.
+        process : Optional[int], optional
+            The process identifier to be included in the filename. If not provided, 
+            the filename will not include a process identifier.
+
+        Returns:
+        --------
+        None
+        """
+        if process is not None:
+            file = os.path.join(path, f"{self.name}_{self.context}_GR{process}.{MetricsType.ZARR_ZIP.value}")
+        else:
+            file = os.path.join(path, f"{self.name}_{self.context}.{MetricsType.ZARR_ZIP.value}")
+
+        zarr_dir = get_zarr_staging_path(file)
+        if os.path.exists(zarr_dir):
+            pack_zarr_to_zip(zarr_dir, file)
+
     def save_to_zarr(
             self,
             zarr_file: str,
@@ -135,6 +299,8 @@ class MetricInfo:
         --------
         None
         """
+        import zarr
+
         if os.path.exists(zarr_file):
             dataset = zarr.open(zarr_file, mode='a')
         else:
@@ -145,15 +311,12 @@ class MetricInfo:
             dataset.attrs['context'] = str(self.context)
             dataset.attrs['source'] = str(self.source)
 
-        epochs = []
-        values = []
-        timestamps = []
-
-        for epoch, items in self.epochDataList.items():
-            for value, timestamp in items:
-                epochs.append(epoch)
-                values.append(value)
-                timestamps.append(timestamp)
+        rows = self._sorted_rows()
+        if 'epochs' in dataset and self._is_late(rows):
+            rows = self._merge_zarr_tail(dataset, rows)
+        epochs = [epoch for epoch, _, _ in rows]
+        values = [value for _, value, _ in rows]
+        timestamps = [timestamp for _, _, timestamp in rows]
 
         if 'epochs' in dataset:
             dataset['epochs'].append(epochs)
@@ -169,6 +332,62 @@ class MetricInfo:
                 dataset.create_dataset('values', data=values, chunks=(1000,), dtype='f4', compressor=None)
                 dataset.create_dataset('timestamps', data=timestamps, chunks=(1000,), dtype='i8', compressor=None)
 
+    @staticmethod
+    def _merge_zarr_tail(dataset, rows: List[Tuple[int, Any, int]]) -> List[Tuple[int, Any, int]]:
+        """
+        Removes from the arrays of `dataset` the saved rows newer than the oldest of `rows`, 
+        and returns them merged with `rows` by timestamp.
+        """
+        saved_timestamps = dataset['timestamps']
+        size = saved_timestamps.shape[0]
+        # saved rows are ordered by timestamp, read back chunk by chunk until older than all new rows
+        start = size
+        block = saved_timestamps.chunks[0]
+        while start > 0:
+            block_start = max(0, start - block)
+            tail = saved_timestamps[block_start:start]
+            start = block_start + int(np.searchsorted(tail, rows[0][2], side='right'))
+            if start > block_start: break
+
+        saved_rows = list(zip(dataset['epochs'][start:].tolist(), dataset['values'][start:].tolist(), saved_timestamps[start:].tolist()))
+        for name in ('epochs', 'values', 'timestamps'):
+            dataset[name].resize(start)
+        return list(heapq.merge(saved_rows, rows, key=itemgetter(2)))
+
+    @staticmethod
+    def _merge_txt_tail(txt_file: str, rows: List[Tuple[int, Any, int]]) -> List[str]:
+        """
+        Truncates from `txt_file` the saved lines newer than the oldest of `rows`, 
+        and returns them merged with the lines of `rows` by timestamp.
+        """
+        oldest = rows[0][2]
+        saved_lines = []
+        with open(txt_file, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            # saved lines are ordered by timestamp, read back blocks of growing size until one older than all new rows
+            block = 1 << 16
+            while True:
+                block_start = max(0, size - block)
+                f.seek(block_start)
+                data = f.read(size - block_start)
+                # skip the header, or the first line of the block which may be partial
+                body_start = block_start + data.find(b"\n") + 1
+                offset, saved_lines = size, []
+                for line in reversed(data[body_start - block_start:].split(b"\n")[:-1]):
+                    if float(line.rsplit(b",", 1)[1]) <= oldest: break
+                    offset -= len(line) + 1
+                    saved_lines.append(line.decode())
+                else:
+                    if block_start > 0:
+                        block *= 2
+                        continue
+                break
+            f.truncate(offset)
+
+        saved_rows = [(float(line.rsplit(",", 1)[1]), line) for line in reversed(saved_lines)]
+        new_rows = [(timestamp, f"{epoch}, {value}, {timestamp}") for epoch, value, timestamp in rows]
+        return [line for _, line in heapq.merge(saved_rows, new_rows, key=itemgetter(0))]
+
     def save_to_txt(
             self,
             txt_file: str
@@ -187,12 +406,17 @@ class MetricInfo:
         """
         file_exists = os.path.exists(txt_file)
 
+        rows = self._sorted_rows()
+        if file_exists and self._is_late(rows):
+            lines = self._merge_txt_tail(txt_file, rows)
+        else:
+            lines = [f"{epoch}, {value}, {timestamp}" for epoch, value, timestamp in rows]
+
         with open(txt_file, "a") as f:
             if not file_exists:
                 f.write(f"{self.name}, {self.context}, {self.source}\n")
-            for epoch, values in self.epochDataList.items():
-                for value, timestamp in values:
-                    f.write(f"{epoch}, {value}, {timestamp}\n")
+            for line in lines:
+                f.write(line + "\n")
 
     def copy_to_zarr(
             self,
@@ -225,20 +449,21 @@ class MetricInfo:
         else:
             file = os.path.join(path, f"{self.name}_{self.context}.{file_type.value}")
 
+        import zarr
+
         output_path = os.path.join(path, f"copy_{self.name}_{self.context}_GR{process}.{file_type.value}")
         output_file = zarr.open(output_path, mode='w')
 
-        if file_type == MetricsType.ZARR:
-            dataset = zarr.open(file, mode='r')
-
-            for name in dataset.array_keys():
-                if use_compression:
-                    output_file.create_dataset(name, data=dataset[name], chunks=dataset[name].chunks, dtype=dataset[name].dtype, shape=dataset[name].shape)
-                else:
-                    output_file.create_dataset(name, data=dataset[name], chunks=dataset[name].chunks, dtype=dataset[name].dtype, shape=dataset[name].shape, compressor=None)
+        if file_type == MetricsType.ZARR or file_type == MetricsType.ZARR_ZIP:
+            with open_zarr_store(file, mode='r') as dataset:
+                for name in dataset.array_keys():
+                    if use_compression:
+                        output_file.create_dataset(name, data=dataset[name], chunks=dataset[name].chunks, dtype=dataset[name].dtype, shape=dataset[name].shape)
+                    else:
+                        output_file.create_dataset(name, data=dataset[name], chunks=dataset[name].chunks, dtype=dataset[name].dtype, shape=dataset[name].shape, compressor=None)
 
-            for key, value in dataset.attrs.items():
-                output_file.attrs[key] = value
+                for key, value in dataset.attrs.items():
+                    output_file.attrs[key] = value
 
         elif file_type == MetricsType.TXT:
             with open(file, "r") as f:
@@ -1,5 +1,8 @@
 
 import os
+import threading
+import warnings
+import weakref
 from typing import Any, Dict, List, Optional
 
 from prov4ml.datamodel.artifact_data import ArtifactInfo
@@ -9,7 +12,13 @@ from prov4ml.datamodel.cumulative_metrics import CumulativeMetric, FoldOperation
 from prov4ml.datamodel.metric_data import MetricInfo
 from prov4ml.provenance.context import Context
 from prov4ml.provenance.metrics_type import MetricsType
-from prov4ml.utils import funcs
+from prov4ml.configs import SILENT
+from prov4ml.utils import funcs, hash_utils
+from prov4ml.utils.index_utils import ExperimentIndex, get_index_path
+from prov4ml.utils.stats_utils import is_tensor
+
+# instances notified by the fork handlers registered at the end of this module
+_INSTANCES: "weakref.WeakSet[Prov4MLData]" = weakref.WeakSet()
 
 class Prov4MLData:
     """
@@ -51,6 +60,29 @@ class Prov4MLData:
         A flag indicating whether the provenance data collection is active.
     save_metrics_after_n_logs : int
         The number of logs after which metrics are saved.
+    index_runs : bool
+        A flag indicating whether a summary of the run is added to the experiment index at the end of the run.
+    current_step : int
+        The step of the last metric logged, used to tag metrics sampled in the background.
+    current_context : Context
+        The context of the last metric logged, used to tag metrics sampled in the background.
+    hash_artifacts : bool
+        A flag indicating whether the digest and size of the artifacts are computed in the background.
+    checkpoint_writer : Optional[AsyncCheckpointWriter]
+        The background writer of the model versions of the run.
+    model_versions : Dict[str, int]
+        The next version number of each model, by checkpoint directory.
+    flops_per_batch_counter : int
+        The FLOPs of the batches logged with `log_flops_per_batch` so far.
+    flops_per_epoch_counter : int
+        The FLOPs of the epochs logged with `log_flops_per_epoch` so far.
+
+    Thread and fork safety:
+    -----------------------
+    The dictionaries are updated under a lock. Each thread appends the values it logs to its own buffer
+    in each metric, without locking, and the buffers of a metric are merged under the lock of the metric when it is saved.
+    When the process forks during a run (e.g. DataLoader workers), the forked children send
+    what they log to the parent over a pipe, and a listener thread of the parent adds it to the run.
 
     Methods:
     --------
@@ -89,6 +121,18 @@ class Prov4MLData:
 
     save_all_metrics() -> None
         Saves all tracked metrics to temporary files.
+
+    pack_all_metrics() -> None
+        Packs all tracked zarr metrics into single zip files.
+
+    get_run_summary(provenance_file: str) -> Dict[str, Any]
+        Returns a compact summary of the run.
+
+    add_run_to_index(provenance_file: str) -> None
+        Appends the summary of the run to the experiment index.
+
+    stop_fork_listener() -> None
+        Processes what forked children logged so far and stops listening to them.
     """
     def __init__(self) -> None:
         self.metrics: Dict[(str, Context), MetricInfo] = {}
@@ -110,6 +154,24 @@ class Prov4MLData:
         self.is_collecting = False
 
         self.save_metrics_after_n_logs = 100
+        self.index_runs = True
+
+        self.current_step = 0
+        self.current_context = Context.TRAINING
+
+        self.hash_artifacts = True
+        self.checkpoint_writer = None
+        self.model_versions: Dict[str, int] = {}
+        self.flops_per_batch_counter = 0
+        self.flops_per_epoch_counter = 0
+
+        self._lock = threading.RLock()
+        # pipe from forked children to this process, and the listener reading it
+        self._fork_channel = None
+        self._fork_listener: Optional[threading.Thread] = None
+        # set in forked children, which send what they log to the parent
+        self._parent_channel = None
+        _INSTANCES.add(self)
 
     def init(
             self, 
@@ -120,7 +182,8 @@ class Prov4MLData:
             save_after_n_logs: int = 100, 
             rank: Optional[int] = None,
             metrics_file_type: MetricsType = MetricsType.ZARR,
-            use_compression: bool = True
+            use_compression: bool = True,
+            index_runs: bool = True
         ) -> None:
         """
         Initializes the experiment with the given parameters and sets up directories and metadata.
@@ -141,6 +204,10 @@ class Prov4MLData:
             The rank of the current process in a distributed setting. If not provided, determines the global rank.
         metrics_file_type : MetricsType
             The file type used to store metrics. Default is MetricsType.ZARR.
+        use_compression : bool, optional
+            Whether to compress the zarr metric files. Default is True.
+        index_runs : bool, optional
+            Whether to add a summary of the run to the experiment index at the end of the run. Default is True.
 
         Returns:
         --------
@@ -159,11 +226,11 @@ class Prov4MLData:
         if user_namespace:
             self.USER_NAMESPACE = user_namespace
 
-        # look at PROV dir how many experiments are there with the same name
         if not os.path.exists(self.PROV_SAVE_PATH):
             os.makedirs(self.PROV_SAVE_PATH, exist_ok=True)
-        prev_exps = os.listdir(self.PROV_SAVE_PATH) if self.PROV_SAVE_PATH else []
-        run_id = len([exp for exp in prev_exps if funcs.prov4ml_experiment_matches(experiment_name, exp)]) 
+        # without collect_all_processes only the first rank allocates a run id
+        num_ranks = funcs.get_world_size() if collect_all_processes else 1
+        run_id = funcs.allocate_run_id(self.PROV_SAVE_PATH, experiment_name, rank=self.global_rank, job_id=funcs.get_job_id(), num_ranks=num_ranks)
 
         self.EXPERIMENT_DIR = os.path.join(self.PROV_SAVE_PATH, experiment_name + f"_{run_id}")
         self.RUN_ID = run_id
@@ -171,6 +238,7 @@ class Prov4MLData:
         self.METRICS_DIR = os.path.join(self.EXPERIMENT_DIR, "metrics")
         self.METRICS_FILE_TYPE = metrics_file_type
         self.use_compression = use_compression
+        self.index_runs = index_runs
 
     def add_metric(
         self, 
@@ -189,7 +257,7 @@ class Prov4MLData:
         metric : str
             The name of the metric to add.
         value : Any
-            The value of the metric to add.
+            The value of the metric to add, a number or a single-element tensor, kept on its device until the metric is saved.
         step : int
             The step or iteration number associated with the metric value.
         context : Optional[Any], optional
@@ -205,17 +273,61 @@ class Prov4MLData:
         """        
         if not self.is_collecting: return
 
-        if (metric, context) not in self.metrics:
-            self.metrics[(metric, context)] = MetricInfo(metric, context, source=source)
-        
-        self.metrics[(metric, context)].add_metric(value, step, timestamp if timestamp else funcs.get_current_time_millis())
+        timestamp = timestamp if timestamp else funcs.get_current_time_millis()
+        if self._parent_channel is not None:
+            self._send_to_parent("add_metric", metric, value.item() if is_tensor(value) else value, step, context, source, timestamp)
+            return
+
+        if step is not None:
+            self.current_step = step
+            self.current_context = context
 
-        if metric in self.cumulative_metrics:
-            self.cumulative_metrics[metric].update(value)
+        metric_info = self.metrics.get((metric, context))
+        if metric_info is None:
+            with self._lock:
+                metric_info = self.metrics.setdefault((metric, context), MetricInfo(metric, context, source=source))
 
-        total_metrics_values = self.metrics[(metric, context)].total_metric_values
-        if total_metrics_values % self.save_metrics_after_n_logs == 0:
-            self.save_metric_to_file(self.metrics[(metric, context)])
+        # a single thread reaches each multiple of save_metrics_after_n_logs, and saves the values of all threads
+        if metric_info.add_metric(value, step, timestamp) % self.save_metrics_after_n_logs == 0:
+            self.save_metric_to_file(metric_info)
+
+        cumulative_metric = self.cumulative_metrics.get(metric)
+        if cumulative_metric is not None:
+            cumulative_metric.update(value)
+
+    def add_metrics(
+        self, 
+        metrics: Dict[str, Any], 
+        step: int, 
+        context: Optional[Any] = None, 
+        source: LoggingItemKind = None, 
+        timestamp = None
+    ) -> None:
+        """
+        Adds a sample of several metrics at once, all recorded with the same step and timestamp.
+
+        Parameters:
+        -----------
+        metrics : Dict[str, Any]
+            The values of the metrics to add, by metric name.
+        step : int
+            The step or iteration number associated with the metric values.
+        context : Optional[Any], optional
+            The context in which the metrics are recorded, default is None.
+        source : LoggingItemKind, optional
+            The source of the logging item, default is None.
+        timestamp : optional
+            The timestamp when the metrics are recorded. If not provided, the current time in milliseconds is used.
+
+        Returns:
+        --------
+        None
+        """
+        if not self.is_collecting: return
+
+        timestamp = timestamp if timestamp else funcs.get_current_time_millis()
+        for metric, value in metrics.items():
+            self.add_metric(metric, value, step, context=context, source=source, timestamp=timestamp)
 
     def add_cumulative_metric(self, label: str, value: Any, fold_operation: FoldOperation) -> None:
         """
@@ -236,7 +348,16 @@ class Prov4MLData:
         """
         if not self.is_collecting: return
 
-        self.cumulative_metrics[label] = CumulativeMetric(label, value, fold_operation)
+        if self._parent_channel is not None:
+            # fold operations are lambdas, sent by name
+            names = [name for name, operation in vars(FoldOperation).items() if operation is fold_operation]
+            self._send_to_parent("add_cumulative_metric", label, value, names[0] if names else fold_operation)
+            return
+        if isinstance(fold_operation, str):
+            fold_operation = getattr(FoldOperation, fold_operation)
+
+        with self._lock:
+            self.cumulative_metrics[label] = CumulativeMetric(label, value, fold_operation)
 
     def add_parameter(self, parameter: str, value: Any) -> None:
         """
@@ -255,7 +376,12 @@ class Prov4MLData:
         """
         if not self.is_collecting: return
 
-        self.parameters[parameter] = ParameterInfo(parameter, value)
+        if self._parent_channel is not None:
+            self._send_to_parent("add_parameter", parameter, value)
+            return
+
+        with self._lock:
+            self.parameters[parameter] = ParameterInfo(parameter, value)
 
     def add_artifact(
         self, 
@@ -274,10 +400,20 @@ class Prov4MLData:
             step (Optional[int]): The step number for the artifact. Defaults to None.
             context (Optional[Any]): The context of the artifact. Defaults to None.
             timestamp (Optional[int]): The timestamp of the artifact. Defaults to None.
+
+        The digest and size of the artifact are computed in the background, if artifact hashing is enabled when the run is started.
         """
         if not self.is_collecting: return
 
-        self.artifacts[(artifact_name, context)] = ArtifactInfo(artifact_name, value, step, context=context, timestamp=timestamp)
+        if self._parent_channel is not None:
+            self._send_to_parent("add_artifact", artifact_name, value, step, context, timestamp)
+            return
+
+        artifact = ArtifactInfo(artifact_name, value, step, context=context, timestamp=timestamp)
+        with self._lock:
+            self.artifacts[(artifact_name, context)] = artifact
+        if self.hash_artifacts and hash_utils.HASHER is not None:
+            hash_utils.HASHER.submit(artifact)
 
     def get_artifacts(self) -> List[ArtifactInfo]:
         """
@@ -288,7 +424,8 @@ class Prov4MLData:
         """
         if not self.is_collecting: return
 
-        return list(self.artifacts.values())
+        with self._lock:
+            return list(self.artifacts.values())
     
     def get_model_versions(self) -> List[ArtifactInfo]:
         """
@@ -299,7 +436,7 @@ class Prov4MLData:
         """
         if not self.is_collecting: return
 
-        return [artifact for artifact in self.artifacts.values() if artifact.is_model_version]
+        return [artifact for artifact in self.get_artifacts() if artifact.is_model_version]
     
     def get_final_model(self) -> Optional[ArtifactInfo]:
         """
@@ -332,7 +469,13 @@ class Prov4MLData:
         if not os.path.exists(self.METRICS_DIR):
             os.makedirs(self.METRICS_DIR, exist_ok=True)
 
-        metric.save_to_file(self.METRICS_DIR, file_type=self.METRICS_FILE_TYPE, use_compression=self.use_compression, process=self.global_rank)
+        with metric.lock:
+            metric.save_to_file(self.METRICS_DIR, file_type=self.METRICS_FILE_TYPE, use_compression=self.use_compression, process=self.global_rank)
+
+        # fold the tensor values of the final metric following this metric with the same host copy cadence
+        cumulative_metric = self.cumulative_metrics.get(metric.name)
+        if cumulative_metric is not None:
+            cumulative_metric.fold_pending_values()
 
     def save_all_metrics(self) -> None:
         """
@@ -344,5 +487,156 @@ class Prov4MLData:
         """
         if not self.is_collecting: return
 
-        for metric in self.metrics.values():
-            self.save_metric_to_file(metric)
\ No newline at end of file
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            self.save_metric_to_file(metric)
+
+    def pack_all_metrics(self) -> None:
+        """
+        Packs the zarr stores of all tracked metrics into single zip files, 
+        if metrics are saved as MetricsType.ZARR_ZIP.
+
+        Returns:
+        --------
+        None
+        """
+        if not self.is_collecting: return
+
+        if self.METRICS_FILE_TYPE != MetricsType.ZARR_ZIP: return
+
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            with metric.lock:
+                metric.pack_to_zip(self.METRICS_DIR, process=self.global_rank)
+
+    def get_run_summary(self, provenance_file: str) -> Dict[str, Any]:
+        """
+        Returns a compact summary of the run, as stored in the experiment index.
+
+        Parameters:
+        -----------
+        provenance_file : str
+            The path of the provenance graph file of the run.
+
+        Returns:
+        --------
+        Dict[str, Any]
+            The run identifiers, parameters, final cumulative metrics, per-metric statistics and file paths.
+        """
+        return {
+            "experiment_name": "_".join(os.path.basename(self.EXPERIMENT_DIR).split("_")[:-1]),
+            "experiment_dir": os.path.abspath(self.EXPERIMENT_DIR),
+            "run_id": self.RUN_ID,
+            "global_rank": self.global_rank,
+            "user_namespace": self.USER_NAMESPACE,
+            "end_time": funcs.get_current_time_millis() / 1000,
+            "parameters": {name: param.value for name, param in self.parameters.items()},
+            "final_metrics": {name: metric.current_value for name, metric in self.cumulative_metrics.items()},
+            "metrics": {f"{name}_{context}": metric.stats.to_dict() for (name, context), metric in self.metrics.items()},
+            "files": {
+                "provenance_file": os.path.abspath(provenance_file),
+                "metrics_dir": os.path.abspath(self.METRICS_DIR),
+                "artifacts_dir": os.path.abspath(self.ARTIFACTS_DIR),
+            },
+        }
+
+    def add_run_to_index(self, provenance_file: str) -> None:
+        """
+        Appends the summary of the run to the experiment index stored in PROV_SAVE_PATH.
+
+        Parameters:
+        -----------
+        provenance_file : str
+            The path of the provenance graph file of the run.
+
+        Returns:
+        --------
+        None
+        """
+        if not self.is_collecting or not self.index_runs: return
+
+        ExperimentIndex(get_index_path(self.PROV_SAVE_PATH)).add_run(self.get_run_summary(provenance_file))
+
+    def _send_to_parent(self, method: str, *args: Any) -> None:
+        """Sends a call of `method` to the parent process, from a forked child."""
+        channel, lock = self._parent_channel
+        try:
+            with lock:
+                channel.send((method, args))
+        except Exception as e:
+            if not SILENT:
+                warnings.warn(f"Could not send {method} to the parent process: {e}")
+
+    def _listen_to_children(self) -> None:
+        """Adds what forked children send to this run, until `stop_fork_listener` is called."""
+        reader = self._fork_channel[0]
+        while True:
+            try:
+                message = reader.recv()
+            except (EOFError, OSError):
+                return
+            if message is None: return
+            method, args = message
+            try:
+                getattr(self, method)(*args)
+            except Exception as e:
+                if not SILENT:
+                    warnings.warn(f"Could not log {method} from a child process: {e}")
+
+    def _before_fork(self) -> None:
+        """Opens the pipe from the children to be forked and starts listening to it, the first time a collecting run forks."""
+        if not self.is_collecting or self._parent_channel is not None or self._fork_channel is not None: return
+
+        import multiprocessing
+        context = multiprocessing.get_context("fork")
+        reader, writer = context.Pipe(duplex=False)
+        self._fork_channel = (reader, writer, context.Lock())
+        self._fork_listener = threading.Thread(target=self._listen_to_children, name="prov4ml-fork-listener", daemon=True)
+        self._fork_listener.start()
+
+    def _after_fork_in_child(self) -> None:
+        """Resets the state inherited from the parent, and sends what the child logs to the parent."""
+        self._lock = threading.RLock()
+        self.metrics = {}
+        self.parameters = {}
+        self.artifacts = {}
+        self.cumulative_metrics = {}
+        self._fork_listener = None
+        self.checkpoint_writer = None
+        if self._fork_channel is not None:
+            reader, writer, lock = self._fork_channel
+            reader.close()
+            self._fork_channel = None
+            self._parent_channel = (writer, lock)
+
+    def stop_fork_listener(self) -> None:
+        """
+        Processes everything forked children sent so far and stops listening to them, children
+        that log afterwards are warned that their values are not recorded.
+
+        Returns:
+        --------
+        None
+        """
+        if self._fork_channel is None: return
+
+        reader, writer, lock = self._fork_channel
+        with lock:
+            writer.send(None)
+        self._fork_listener.join()
+        reader.close()
+        writer.close()
+        self._fork_channel = None
+        self._fork_listener = None
+
+def _before_fork() -> None:
+    for data in list(_INSTANCES):
+        data._before_fork()
+
+def _after_fork_in_child() -> None:
+    for data in list(_INSTANCES):
+        data._after_fork_in_child()
+
+os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
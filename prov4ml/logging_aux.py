@@ -1,15 +1,18 @@
 import os
-import torch
 import warnings
 
-from torch.utils.data import DataLoader, Subset, Dataset
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 
 from prov4ml.datamodel.attribute_type import LoggingItemKind
-from prov4ml.utils import energy_utils, flops_utils, system_utils, time_utils, funcs
+from prov4ml.utils import checkpoint_utils, energy_utils, flops_utils, model_storage, stats_utils, system_utils, time_utils, funcs
 from prov4ml.provenance.context import Context
 from prov4ml.datamodel.cumulative_metrics import FoldOperation
 from prov4ml.constants import PROV4ML_DATA
+
+# torch is only imported by the functions that need it, to keep `import prov4ml` fast
+if TYPE_CHECKING:
+    import torch
+    from torch.utils.data import DataLoader, Subset, Dataset
     
 def log_metric(key: str, value: float, context:Context, step: Optional[int] = None, source: LoggingItemKind = None) -> None:
     """
@@ -17,7 +20,7 @@ def log_metric(key: str, value: float, context:Context, step: Optional[int] = No
 
     Args:
         key (str): The key of the metric.
-        value (float): The value of the metric.
+        value (float): The value of the metric, a number or a single-element tensor. Tensors are kept on their device and copied to the host in batches when the metric is saved, so logging them does not synchronize with the device as `.item()` would.
         context (Context): The context in which the metric is recorded.
         step (Optional[int], optional): The step number for the metric. Defaults to None.
         source (LoggingItemKind, optional): The source of the logging item. Defaults to None.
@@ -25,14 +28,33 @@ def log_metric(key: str, value: float, context:Context, step: Optional[int] = No
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     PROV4ML_DATA.add_metric(key,value,step, context=context, source=source)
 
+def log_metrics(metrics: Dict[str, float], context: Context, step: Optional[int] = None, source: LoggingItemKind = None) -> None:
+    """
+    Logs several metrics at once, recorded with the same context, step and timestamp.
+
+    Args:
+        metrics (Dict[str, float]): The values of the metrics, by metric key, numbers or single-element tensors.
+        context (Context): The context in which the metrics are recorded.
+        step (Optional[int], optional): The step number for the metrics. Defaults to None.
+        source (LoggingItemKind, optional): The source of the logging item. Defaults to None.
+
+    Returns:
+        None
+    """
+    if not PROV4ML_DATA.is_collecting: return
+    PROV4ML_DATA.add_metrics(metrics, step, context=context, source=source)
+
 def log_execution_start_time() -> None:
     """Logs the start time of the current execution. """
+    if not PROV4ML_DATA.is_collecting: return
     return log_param("execution_start_time", time_utils.get_time())
 
 def log_execution_end_time() -> None:
     """Logs the end time of the current execution."""
+    if not PROV4ML_DATA.is_collecting: return
     return log_param("execution_end_time", time_utils.get_time())
 
 def log_current_execution_time(label: str, context: Context, step: Optional[int] = None) -> None:
@@ -46,6 +68,7 @@ def log_current_execution_time(label: str, context: Context, step: Optional[int]
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     return log_metric(label, time_utils.get_time(), context, step=step, source=LoggingItemKind.EXECUTION_TIME)
 
 def log_param(key: str, value: Any) -> None:
@@ -58,9 +81,10 @@ def log_param(key: str, value: Any) -> None:
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     PROV4ML_DATA.add_parameter(key,value)
 
-def log_model_memory_footprint(model: Union[torch.nn.Module, Any], model_name: str = "default") -> None:
+def log_model_memory_footprint(model: Union['torch.nn.Module', Any], model_name: str = "default") -> None:
     """Logs the memory footprint of the provided model.
     
     Args:
@@ -70,6 +94,7 @@ def log_model_memory_footprint(model: Union[torch.nn.Module, Any], model_name: s
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     log_param("model_name", model_name)
 
     total_params = sum(p.numel() for p in model.parameters())
@@ -96,7 +121,7 @@ def log_model_memory_footprint(model: Union[torch.nn.Module, Any], model_name: s
     log_param("memory_of_model", memory_per_model)
     log_param("total_memory_load_of_model", memory_per_model + memory_per_grad + memory_per_optim)
 
-def log_model(model: Union[torch.nn.Module, Any], model_name: str = "default", log_model_info: bool = True, log_as_artifact=True) -> None:
+def log_model(model: Union['torch.nn.Module', Any], model_name: str = "default", log_model_info: bool = True, log_as_artifact=True) -> None:
     """Logs the provided model as artifact and logs memory footprint of the model. 
     
     Args:
@@ -105,13 +130,54 @@ def log_model(model: Union[torch.nn.Module, Any], model_name: str = "default", l
         log_model_info (bool, optional): Whether to log model memory footprint. Defaults to True.
         log_as_artifact (bool, optional): Whether to log the model as an artifact. Defaults to True.
     """
+    if not PROV4ML_DATA.is_collecting: return
     if log_model_info:
         log_model_memory_footprint(model, model_name)
 
     if log_as_artifact:
         save_model_version(model, model_name, Context.EVALUATION)
         
-def log_flops_per_epoch(label: str, model: Any, dataset: Any, context: Context, step: Optional[int] = None) -> None:
+def log_model_statistics(
+        model: Union['torch.nn.Module', Any], 
+        context: Context, 
+        step: Optional[int] = None, 
+        gradients: bool = False, 
+        max_elements: Optional[int] = None
+    ) -> None:
+    """Logs the L2 norm, mean, standard deviation, minimum and maximum of every parameter of the model,
+    as `{parameter}_{statistic}` metrics, and of their gradients as `{parameter}_grad_{statistic}`.
+
+    The statistics of all parameters are computed with batched reductions and copied to the host at once,
+    instead of synchronizing with the device for each value.
+    
+    Args:
+        model (Union[torch.nn.Module, Any]): The model.
+        context (mlflow.tracking.Context): The MLflow tracking context.
+        step (Optional[int], optional): The step number for the logged statistics. Defaults to None.
+        gradients (bool, optional): Whether to also log the statistics of the gradients, for parameters which have one. Defaults to False.
+        max_elements (Optional[int], optional): If given, the mean, standard deviation and extrema of larger tensors
+            are estimated on an evenly strided sample of about `max_elements` elements, norms are always exact. Defaults to None.
+
+    Returns:
+        None
+    """
+    if not PROV4ML_DATA.is_collecting: return
+
+    names, tensors = [], []
+    for name, parameter in model.named_parameters():
+        names.append(name)
+        tensors.append(parameter)
+        if gradients and parameter.grad is not None:
+            names.append(f"{name}_grad")
+            tensors.append(parameter.grad)
+
+    metrics = {}
+    for name, values in zip(names, stats_utils.tensor_statistics(tensors, max_elements)):
+        for statistic, value in zip(stats_utils.TENSOR_STATISTICS, values):
+            metrics[f"{name}_{statistic}"] = value
+    log_metrics(metrics, context, step=step, source=LoggingItemKind.MODEL_STATISTIC)
+
+def log_flops_per_epoch(label: str, model: Any, dataset: Any, context: Context, step: Optional[int] = None, mode: str = "fvcore") -> None:
     """Logs the number of FLOPs (floating point operations) per epoch for the given model and dataset.
     
     Args:
@@ -120,14 +186,26 @@ def log_flops_per_epoch(label: str, model: Any, dataset: Any, context: Context,
         dataset (Any): The dataset used for training the model.
         context (mlflow.tracking.Context): The MLflow tracking context.
         step (Optional[int], optional): The step number for the logged FLOPs per epoch. Defaults to None.
+        mode (str, optional): "fvcore" to trace the model, or "analytical" to estimate FLOPs with forward hooks. Defaults to "fvcore".
 
     Returns:
         None
     """
-    return log_metric(label, flops_utils.get_flops_per_epoch(model, dataset), context, step=step, source=LoggingItemKind.FLOPS_PER_EPOCH)
+    if not PROV4ML_DATA.is_collecting: return
+    return log_metric(label, flops_utils.get_flops_per_epoch(model, dataset, mode), context, step=step, source=LoggingItemKind.FLOPS_PER_EPOCH)
 
-def log_flops_per_batch(label: str, model: Any, batch: Any, context: Context, step: Optional[int] = None) -> None:
+def log_flops_per_batch(
+        label: str, 
+        model: Any, 
+        batch: Any, 
+        context: Context, 
+        step: Optional[int] = None, 
+        mode: str = "fvcore", 
+        per_layer: bool = False
+    ) -> None:
     """Logs the number of FLOPs (floating point operations) per batch for the given model and batch of data.
+
+    The logged value is cumulative, the FLOP/s throughput is derived from it when the provenance document is created.
     
     Args:
         label (str): The label to associate with the logged FLOPs per batch.
@@ -135,11 +213,17 @@ def log_flops_per_batch(label: str, model: Any, batch: Any, context: Context, st
         batch (Any): A batch of data used for inference with the model.
         context (mlflow.tracking.Context): The MLflow tracking context.
         step (Optional[int], optional): The step number for the logged FLOPs per batch. Defaults to None.
+        mode (str, optional): "fvcore" to trace the model, or "analytical" to estimate FLOPs with forward hooks. Defaults to "fvcore".
+        per_layer (bool, optional): Whether to also log the FLOPs of each layer of the batch as `{label}_{layer}`, estimated analytically. Defaults to False.
 
     Returns:
         None
     """
-    return log_metric(label, flops_utils.get_flops_per_batch(model, batch), context, step=step, source=LoggingItemKind.FLOPS_PER_BATCH)
+    if not PROV4ML_DATA.is_collecting: return
+    log_metric(label, flops_utils.get_flops_per_batch(model, batch, mode), context, step=step, source=LoggingItemKind.FLOPS_PER_BATCH)
+    if per_layer:
+        flops_by_layer = flops_utils.get_flops_per_layer(model, batch)
+        log_metrics({f"{label}_{layer}": flops for layer, flops in flops_by_layer.items()}, context, step=step, source=LoggingItemKind.FLOPS_PER_LAYER)
 
 def log_system_metrics(
     context: Context,
@@ -154,19 +238,15 @@ def log_system_metrics(
     Returns:
         None
     """
-    log_metric("cpu_usage", system_utils.get_cpu_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("memory_usage", system_utils.get_memory_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("disk_usage", system_utils.get_disk_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("gpu_memory_usage", system_utils.get_gpu_memory_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("gpu_usage", system_utils.get_gpu_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("gpu_temperature", system_utils.get_gpu_temperature(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
-    log_metric("gpu_power_usage", system_utils.get_gpu_power_usage(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
+    if not PROV4ML_DATA.is_collecting: return
+    log_metrics(system_utils.get_system_metrics(), context, step=step, source=LoggingItemKind.SYSTEM_METRIC)
 
 def log_carbon_metrics(
     context: Context,
     step: Optional[int] = None,
     ):
     """Logs carbon emissions metrics such as energy consumed, emissions rate, and power consumption.
+    Energy and emissions refer to the interval since the previous call, the tracker is never stopped.
     
     Args:
         context (mlflow.tracking.Context): The MLflow tracking context.
@@ -175,17 +255,8 @@ def log_carbon_metrics(
     Returns:
         None
     """    
-    emissions = energy_utils.stop_carbon_tracked_block()
-   
-    log_metric("emissions", emissions.energy_consumed, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("emissions_rate", emissions.emissions_rate, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("cpu_power", emissions.cpu_power, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("gpu_power", emissions.gpu_power, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("ram_power", emissions.ram_power, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("cpu_energy", emissions.cpu_energy, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("gpu_energy", emissions.gpu_energy, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("ram_energy", emissions.ram_energy, context, step=step, source=LoggingItemKind.CARBON_METRIC)
-    log_metric("energy_consumed", emissions.energy_consumed, context, step=step, source=LoggingItemKind.CARBON_METRIC)
+    if not PROV4ML_DATA.is_collecting: return
+    log_metrics(energy_utils.get_carbon_metrics(), context, step=step, source=LoggingItemKind.CARBON_METRIC)
 
 def log_artifact(
         artifact_path : str, 
@@ -205,18 +276,25 @@ def log_artifact(
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     timestamp = timestamp or funcs.get_current_time_millis()
     PROV4ML_DATA.add_artifact(artifact_path, step=step, context=context, timestamp=timestamp)
 
 def save_model_version(
-        model: Union[torch.nn.Module, Any], 
+        model: Union['torch.nn.Module', Any], 
         model_name: str, 
         context: Context, 
         step: Optional[int] = None, 
-        timestamp: Optional[int] = None
+        timestamp: Optional[int] = None,
+        asynchronous: bool = True,
+        storage: str = "torch",
+        keyframe_interval: int = 10
     ) -> None:
     """
     Saves the state dictionary of the provided model and logs it as an artifact.
+
+    By default the state dictionary is snapshotted to host memory and written by a background thread,
+    the artifact is logged once the file is written and `end_run` waits for all pending writes.
     
     Parameters:
         model (torch.nn.Module): The PyTorch model to be saved.
@@ -224,22 +302,59 @@ def save_model_version(
         context (Context): The context in which the model is saved.
         step (Optional[int]): The step or epoch number associated with the saved model. Defaults to None.
         timestamp (Optional[int]): The timestamp associated with the saved model. Defaults to None.
+        asynchronous (bool): Whether to write the model in the background. Defaults to True.
+        storage (str): "torch" to save a `.pth` file, "dedup" to save a manifest of content-addressed tensors,
+            storing only the tensors which changed since any previous version, "delta" to save a compressed
+            difference from the last keyframe version, or "safetensors" to save a file which can be memory mapped
+            by `open_model_version`. Defaults to "torch".
+        keyframe_interval (int): With "delta" storage, the number of versions between two full keyframes. Defaults to 10.
 
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
+
+    if storage not in model_storage.MODEL_STORAGES:
+        raise ValueError(f"Unsupported model storage: {storage}")
 
     path = os.path.join(PROV4ML_DATA.ARTIFACTS_DIR, model_name)
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
 
-    # count all models with the same name stored at "path"
-    num_files = len([file for file in os.listdir(path) if str(file).startswith(model_name)])
-
-    torch.save(model.state_dict(), f"{path}/{model_name}_{num_files}.pth")
-    log_artifact(f"{path}/{model_name}_{num_files}.pth", context=context, step=step, timestamp=timestamp)
+    extension = model_storage.MODEL_STORAGES[storage]
+    version = checkpoint_utils.next_model_version(path, model_name)
+    model_path = f"{path}/{model_name}_{version}{extension}"
+    timestamp = timestamp or funcs.get_current_time_millis()
 
-def log_dataset(dataset : Union[DataLoader, Subset, Dataset], label : str): 
+    save = None
+    if storage == "dedup":
+        previous_path = f"{path}/{model_name}_{version - 1}{extension}" if version > 0 else None
+        save = lambda state, save_path: model_storage.save_deduplicated(state, save_path, previous_path)
+    elif storage == "delta":
+        keyframe_path = model_storage.get_delta_keyframe(model_path, version, keyframe_interval)
+        save = lambda state, save_path: model_storage.save_delta(state, save_path, keyframe_path)
+    elif storage == "safetensors":
+        save = model_storage.save_safetensors
+
+    def on_complete(written_path: str, info: Optional[Dict[str, Any]]) -> None:
+        PROV4ML_DATA.add_artifact(written_path, value=info, step=step, context=context, timestamp=timestamp)
+
+    if asynchronous:
+        checkpoint_utils.get_checkpoint_writer().submit(model.state_dict(), model_path, on_complete=on_complete, save=save)
+    else:
+        import torch
+
+        # keep versions ordered with the ones still being written in the background
+        checkpoint_utils.wait_for_checkpoints()
+        state = model.state_dict()
+        if save is not None:
+            # the storages read the raw bytes of the tensors, which must be in host memory
+            state = checkpoint_utils.snapshot_state(state)
+            for event in checkpoint_utils._record_copy_events():
+                event.synchronize()
+        on_complete(model_path, (save or torch.save)(state, model_path))
+
+def log_dataset(dataset : Union['DataLoader', 'Subset', 'Dataset'], label : str): 
     """
     Logs dataset statistics such as total samples and total steps.
 
@@ -250,6 +365,10 @@ def log_dataset(dataset : Union[DataLoader, Subset, Dataset], label : str):
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
+
+    from torch.utils.data import DataLoader, Subset
+
     # handle datasets from DataLoader
     if isinstance(dataset, DataLoader):
         dl = dataset
@@ -284,4 +403,5 @@ def register_final_metric(
     Returns:
         None
     """
+    if not PROV4ML_DATA.is_collecting: return
     PROV4ML_DATA.add_cumulative_metric(metric_name, initial_value, fold_operation)
\ No newline at end of file
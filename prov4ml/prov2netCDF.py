@@ -118,8 +118,8 @@ if __name__ == "__main__":
     input_file, output_file = parse_args()
 
     json_to_netcdf(input_file, output_file)
-    compress_file(output_file, output_file)
+    compressed_file = compress_file(output_file, output_file)
     
     print_file_size(input_file)
     print_file_size(output_file)
-    print_file_size(output_file + '.gz')
+    print_file_size(compressed_file)
@@ -1,6 +1,5 @@
 import json
 import os
-import zarr
 import argparse
 import numpy as np
 
@@ -10,6 +9,7 @@ if __package__ == None:
 
 from prov4ml.utils.prov_getters import get_metrics, get_metric_numpy
 from prov4ml.utils.compress_utils import compress_file, print_file_size
+from prov4ml.utils.zarr_utils import is_zip_store, open_zarr_store
 
 def json_to_zarr(json_file, zarr_file):
     # Load JSON data
@@ -55,31 +55,27 @@ def json_to_zarr(json_file, zarr_file):
             values[size].resize(1, size)
             times[size].resize(1, size)
 
-    # Create zarr file
-    dataset = zarr.open(zarr_file, mode='w')
+    # Create zarr file, a single zip file if the name ends with .zip
+    with open_zarr_store(zarr_file, mode='w') as dataset:
 
-    groups = {size: dataset.create_group(f"metric_granularity_{size}") for size in unique_sizes}
+        groups = {size: dataset.create_group(f"metric_granularity_{size}") for size in unique_sizes}
 
-    # Populate dataset
-    for size, group in groups.items(): 
+        # Populate dataset, written once so that zip stores never hold duplicate entries
+        for size, group in groups.items(): 
 
-        chunks = size if size < 10000 else 10000 # To refine
+            chunks = size if size < 10000 else 10000 # To refine
 
-        group.create_dataset(name='epochs', shape=(num_metrics_per_size[size],size), chunks=(num_metrics_per_size[size],chunks), dtype='i4')
-        group.create_dataset(name='values', shape=(num_metrics_per_size[size],size), chunks=(num_metrics_per_size[size],chunks), dtype='f4')
-        group.create_dataset(name='timestamps', shape=(num_metrics_per_size[size],size), chunks=(num_metrics_per_size[size],chunks), dtype='i8')
+            group.create_dataset(name='epochs', data=epochs[size], chunks=(num_metrics_per_size[size],chunks), dtype='i4')
+            group.create_dataset(name='values', data=values[size], chunks=(num_metrics_per_size[size],chunks), dtype='f4')
+            group.create_dataset(name='timestamps', data=times[size], chunks=(num_metrics_per_size[size],chunks), dtype='i8')
 
-        group['epochs'] = epochs[size]
-        group['values'] = values[size]
-        group['timestamps'] = times[size]
+        # Add metadata
 
-    # Add metadata
+        dataset.attrs['description'] = 'lol'
+        print(dataset.attrs['description'])
 
-    dataset.attrs['description'] = 'lol'
-    print(dataset.attrs['description'])
-
-    print(dataset.info)
-    print(dataset.tree())
+        print(dataset.info)
+        print(dataset.tree())
 
     print(f'Zarr file "{zarr_file}" created successfully.')
 
@@ -88,6 +84,7 @@ def parse_args():
 
     parser.add_argument('-i', '--input', help='input file path, must be .json', required=True)
     parser.add_argument('-o', '--output', help='output file path, if missing defaults to <input>.zarr', required=False)
+    parser.add_argument('-z', '--zip', help='write a single-file zip store (<output>.zarr.zip) instead of a directory', action='store_true')
 
     args = parser.parse_args()
     
@@ -105,11 +102,14 @@ def parse_args():
     if args.output:
         output_file = os.path.abspath(args.output)
 
-        if not output_file.endswith('.zarr'):
+        if not output_file.endswith('.zarr') and not output_file.endswith('.zarr.zip'):
             output_file += '.zarr'
     else:
         output_file = input_file.replace('.json', '.zarr')
 
+    if args.zip and not output_file.endswith('.zip'):
+        output_file += '.zip'
+
     return input_file, output_file
 
 if __name__ == "__main__":
@@ -117,8 +117,11 @@ if __name__ == "__main__":
     input_file, output_file = parse_args()
 
     json_to_zarr(input_file, output_file)
-    compress_file(output_file, output_file)
 
     print_file_size(input_file)
     print_file_size(output_file)
-    print_file_size(output_file + '.tar.gz')
+
+    # zip stores are already a single file, readable in place
+    if not is_zip_store(output_file):
+        compressed_file = compress_file(output_file, output_file)
+        print_file_size(compressed_file)
@@ -1,10 +1,17 @@
 import os
-from typing import Optional
+import functools
+from typing import Any, Callable, Iterator, Optional
 from contextlib import contextmanager
 
-from prov4ml.constants import PROV4ML_DATA
+from prov4ml import logging_aux
+from prov4ml.constants import PROV4ML_DATA, _ACTIVE_PROV4ML_DATA
+from prov4ml.datamodel.prov4ml_data import Prov4MLData
+from prov4ml.utils import checkpoint_utils
 from prov4ml.utils import energy_utils
 from prov4ml.utils import flops_utils
+from prov4ml.utils import hash_utils
+from prov4ml.utils import system_sampler
+from prov4ml.utils import system_utils
 from prov4ml.provenance.metrics_type import MetricsType
 from prov4ml.logging_aux import log_execution_start_time, log_execution_end_time
 from prov4ml.provenance.provenance_graph import create_prov_document
@@ -21,7 +28,12 @@ def start_run_ctx(
         create_graph: Optional[bool] = False, 
         create_svg: Optional[bool] = False, 
         metrics_file_type: MetricsType = MetricsType.ZARR,
-        use_compression: bool = True
+        use_compression: bool = True,
+        index_runs: bool = True,
+        system_sampling_interval: Optional[float] = None,
+        energy_backend: str = "codecarbon",
+        checkpoint_max_pending: int = 2,
+        hash_artifacts: bool = True
     ): 
     """
     Context manager for starting and ending a run, initializing provenance data collection and optionally creating visualizations.
@@ -49,6 +61,18 @@ def start_run_ctx(
         Whether to create a collection of provenance data from all runs. Default is False.
     metrics_file_type : MetricsType
         The type of file to save metrics. Defaults to MetricsType.ZARR.
+    use_compression : bool
+        Whether to compress the zarr metric files. Defaults to True.
+    index_runs : bool
+        Whether to append a summary of the run to the experiment index in the provenance save directory. Defaults to True.
+    system_sampling_interval : Optional[float], optional
+        If given, the system metrics are sampled every `system_sampling_interval` seconds by a background thread. Defaults to None.
+    energy_backend : str
+        The source of the carbon metrics: "codecarbon", or "rapl" to read the CPU and DRAM energy counters of the Linux powercap interface. Defaults to "codecarbon".
+    checkpoint_max_pending : int
+        The maximum number of model versions being written in the background at the same time, `save_model_version` blocks when it is reached. Defaults to 2.
+    hash_artifacts : bool
+        Whether to compute the digest and size of every logged artifact in the background, recorded in the provenance graph. Defaults to True.
 
     Raises:
     -------
@@ -69,35 +93,25 @@ def start_run_ctx(
     if create_svg and not create_graph:
         raise ValueError("Cannot create SVG without creating the graph.")
 
-    PROV4ML_DATA.init(
+    start_run(
+        prov_user_namespace, 
         experiment_name=experiment_name, 
-        prov_save_path=provenance_save_dir, 
-        user_namespace=prov_user_namespace, 
+        provenance_save_dir=provenance_save_dir, 
         collect_all_processes=collect_all_processes, 
         save_after_n_logs=save_after_n_logs, 
         rank=rank, 
         metrics_file_type=metrics_file_type,
-        use_compression=use_compression
+        use_compression=use_compression,
+        index_runs=index_runs,
+        system_sampling_interval=system_sampling_interval,
+        energy_backend=energy_backend,
+        checkpoint_max_pending=checkpoint_max_pending,
+        hash_artifacts=hash_artifacts
     )
-   
-    energy_utils._carbon_init()
-    flops_utils._init_flops_counters()
-
-    log_execution_start_time()
 
     yield None#current_run #return the mlflow context manager, same one as mlflow.start_run()
 
-    log_execution_end_time()
-
-    doc = create_prov_document()
-
-    graph_filename = f'provgraph_{PROV4ML_DATA.EXPERIMENT_NAME}.json'
-
-    if not os.path.exists(PROV4ML_DATA.EXPERIMENT_DIR):
-        os.makedirs(PROV4ML_DATA.EXPERIMENT_DIR, exist_ok=True)
-
-    path_graph = os.path.join(PROV4ML_DATA.EXPERIMENT_DIR, graph_filename)
-    save_prov_file(doc, path_graph, create_graph, create_svg)
+    end_run(create_graph, create_svg)
 
 def start_run(
         prov_user_namespace: str,
@@ -107,7 +121,12 @@ def start_run(
         save_after_n_logs: Optional[int] = 100,
         rank : Optional[int] = None, 
         metrics_file_type: MetricsType = MetricsType.ZARR,
-        use_compression: bool = True
+        use_compression: bool = True,
+        index_runs: bool = True,
+        system_sampling_interval: Optional[float] = None,
+        energy_backend: str = "codecarbon",
+        checkpoint_max_pending: int = 2,
+        hash_artifacts: bool = True
     ) -> None:
     """
     Initializes the provenance data collection and sets up various utilities for tracking.
@@ -128,12 +147,24 @@ def start_run(
         The rank of the current process in a distributed setting. If not provided, defaults to None.
     metrics_file_type : MetricsType
         The type of file to save metrics. Defaults to MetricsType.ZARR.
+    use_compression : bool
+        Whether to compress the zarr metric files. Defaults to True.
+    index_runs : bool
+        Whether to append a summary of the run to the experiment index in the provenance save directory. Defaults to True.
+    system_sampling_interval : Optional[float], optional
+        If given, the system metrics are sampled every `system_sampling_interval` seconds by a background thread. Defaults to None.
+    energy_backend : str
+        The source of the carbon metrics: "codecarbon", or "rapl" to read the CPU and DRAM energy counters of the Linux powercap interface. Defaults to "codecarbon".
+    checkpoint_max_pending : int
+        The maximum number of model versions being written in the background at the same time, `save_model_version` blocks when it is reached. Defaults to 2.
+    hash_artifacts : bool
+        Whether to compute the digest and size of every logged artifact in the background, recorded in the provenance graph. Defaults to True.
 
     Returns:
     --------
     None
     """
-    PROV4ML_DATA.init(
+    _init_run(
         experiment_name=experiment_name, 
         prov_save_path=provenance_save_dir, 
         user_namespace=prov_user_namespace, 
@@ -141,11 +172,29 @@ def start_run(
         save_after_n_logs=save_after_n_logs, 
         rank=rank,
         metrics_file_type=metrics_file_type,
-        use_compression=use_compression
+        use_compression=use_compression,
+        index_runs=index_runs,
+        checkpoint_max_pending=checkpoint_max_pending,
+        hash_artifacts=hash_artifacts
     )
 
-    energy_utils._carbon_init()
-    flops_utils._init_flops_counters()
+    # non-collecting ranks skip the trackers and probes, all logging calls are no-ops on them
+    if PROV4ML_DATA.is_collecting:
+        energy_utils._carbon_init(energy_backend)
+        system_utils._gpu_init()
+        system_utils._process_init()
+        system_sampler._sampler_init(system_sampling_interval)
+
+def _init_run(checkpoint_max_pending: int = 2, hash_artifacts: bool = True, **kwargs) -> None:
+    """Initializes the provenance data of the active run, with the keyword arguments of `Prov4MLData.init`, and its checkpoint writer."""
+    PROV4ML_DATA.init(**kwargs)
+
+    PROV4ML_DATA.hash_artifacts = hash_artifacts
+    if PROV4ML_DATA.is_collecting:
+        flops_utils._init_flops_counters()
+        checkpoint_utils._checkpoint_writer_init(checkpoint_max_pending)
+        if hash_artifacts:
+            hash_utils._hasher_init()
 
     log_execution_start_time()
 
@@ -178,10 +227,20 @@ def end_run(
 
     if not PROV4ML_DATA.is_collecting: return
     
+    system_sampler._sampler_stop()
+    energy_utils._carbon_stop()
+    _finalize_run(create_graph, create_svg)
+
+def _finalize_run(create_graph: Optional[bool] = False, create_svg: Optional[bool] = False) -> None:
+    """Saves the remaining metrics, the provenance graph and the index entry of the active run."""
     log_execution_end_time()
+    PROV4ML_DATA.stop_fork_listener()
+    checkpoint_utils._checkpoint_writer_stop()
+    hash_utils.wait_for_hashes()
 
     # save remaining metrics
     PROV4ML_DATA.save_all_metrics()
+    PROV4ML_DATA.pack_all_metrics()
 
     doc = create_prov_document()
    
@@ -192,4 +251,155 @@ def end_run(
     
     path_graph = os.path.join(PROV4ML_DATA.EXPERIMENT_DIR, graph_filename)
     save_prov_file(doc, path_graph, create_graph, create_svg)
+    PROV4ML_DATA.add_run_to_index(path_graph)
+
+# logging functions available as methods of `Run`
+RUN_FUNCTIONS = [
+    "log_metric", "log_metrics", "log_current_execution_time", "log_param", 
+    "log_model_memory_footprint", "log_model", "log_model_statistics", 
+    "log_flops_per_epoch", "log_flops_per_batch", "log_system_metrics", "log_carbon_metrics", 
+    "log_artifact", "save_model_version", "log_dataset", "register_final_metric", 
+]
+
+class Run:
+    """
+    A run with its own provenance data, metric buffers and checkpoint writer, isolated from the
+    default run of `start_run` and from other runs, so that several runs can be collected in the same process,
+    one after the other or concurrently in different threads.
+
+    The logging functions of the module are available as methods, e.g. `run.log_metric(...)`, and log to this run.
+    Inside `with run.activate():`, the module functions, e.g. `prov4ml.log_metric(...)`, log to this run as well.
+    The energy tracker and the GPU and process probes are shared by all the runs of the process,
+    the background sampling of system metrics is only available to the default run.
+
+    Example:
+    --------
+    with prov4ml.Run("www.example.org", experiment_name="trial", provenance_save_dir="prov") as run:
+        run.log_param("lr", 0.01)
+        run.log_metric("loss", loss, prov4ml.Context.TRAINING, step=epoch)
+
+    Attributes:
+    -----------
+    data : Prov4MLData
+        The provenance data of the run.
+    create_graph : bool
+        Whether to create a graph representation of the provenance data when the run ends.
+    create_svg : bool
+        Whether to create an SVG file for the graph visualization when the run ends.
+
+    Methods:
+    --------
+    start() -> Run
+        Starts collecting the provenance data of the run.
+    end() -> None
+        Saves the provenance data of the run.
+    activate() -> Iterator[Run]
+        Makes the run the target of the module logging functions in the current thread or task.
+    """
+    def __init__(
+            self, 
+            prov_user_namespace: str,
+            experiment_name: Optional[str] = None,
+            provenance_save_dir: Optional[str] = None,
+            collect_all_processes: Optional[bool] = False,
+            save_after_n_logs: Optional[int] = 100,
+            rank : Optional[int] = None, 
+            create_graph: Optional[bool] = False, 
+            create_svg: Optional[bool] = False, 
+            metrics_file_type: MetricsType = MetricsType.ZARR,
+            use_compression: bool = True,
+            index_runs: bool = True,
+            checkpoint_max_pending: int = 2,
+            hash_artifacts: bool = True
+        ) -> None:
+        """
+        Creates a run, the parameters are the same as the ones of `start_run_ctx`.
+
+        Raises:
+        -------
+        ValueError
+            If `create_svg` is True but `create_graph` is False.
+        """
+        if create_svg and not create_graph:
+            raise ValueError("Cannot create SVG without creating the graph.")
+
+        self.data = Prov4MLData()
+        self.create_graph = create_graph
+        self.create_svg = create_svg
+        self._init_kwargs = dict(
+            experiment_name=experiment_name, 
+            prov_save_path=provenance_save_dir, 
+            user_namespace=prov_user_namespace, 
+            collect_all_processes=collect_all_processes, 
+            save_after_n_logs=save_after_n_logs, 
+            rank=rank,
+            metrics_file_type=metrics_file_type,
+            use_compression=use_compression,
+            index_runs=index_runs,
+            checkpoint_max_pending=checkpoint_max_pending,
+            hash_artifacts=hash_artifacts
+        )
+
+    @contextmanager
+    def activate(self) -> Iterator["Run"]:
+        """
+        Makes the run the target of the module logging functions until the end of the `with` block,
+        in the current thread or task only, other threads keep logging to their own run.
+
+        Yields:
+        -------
+        Run
+            The run.
+        """
+        token = _ACTIVE_PROV4ML_DATA.set(self.data)
+        try:
+            yield self
+        finally:
+            _ACTIVE_PROV4ML_DATA.reset(token)
+
+    def start(self) -> "Run":
+        """
+        Starts collecting the provenance data of the run.
+
+        Returns:
+        --------
+        Run
+            The run.
+        """
+        with self.activate():
+            _init_run(**self._init_kwargs)
+        return self
+
+    def end(self) -> None:
+        """
+        Waits for the pending checkpoints and artifact digests, and saves the metrics, 
+        the provenance graph and the index entry of the run.
+
+        Returns:
+        --------
+        None
+        """
+        if not self.data.is_collecting: return
+
+        with self.activate():
+            _finalize_run(self.create_graph, self.create_svg)
+        self.data.is_collecting = False
+
+    def __enter__(self) -> "Run":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.end()
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name not in RUN_FUNCTIONS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        function = getattr(logging_aux, name)
+
+        @functools.wraps(function)
+        def run_function(*args, **kwargs):
+            with self.activate():
+                return function(*args, **kwargs)
+        return run_function
 
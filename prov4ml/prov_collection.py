@@ -1,38 +1,134 @@
-
 import os
 import json
 import argparse
+import warnings
 import prov.model as prov
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Tuple
 
+from prov4ml.configs import SILENT
 from prov4ml.utils.file_utils import save_prov_file
-    
+from prov4ml.utils.index_utils import ExperimentIndex, get_index_path
+from prov4ml.utils.prov_getters import parse_metric_list
+from prov4ml.utils.stats_utils import RunningStats
+
 
-class Summarizer(): 
+class Summarizer():
+    """
+    Aggregates per-run metric values into cross-run statistics.
+
+    Each metric keeps a mergeable RunningStats (count, mean, variance, min, max, quantiles),
+    so memory does not grow with the number of runs and summarizers built on different
+    processes can be merged.
+    """
     def __init__(self) -> None:
-        self.data = {}
+        self.data: Dict[str, RunningStats] = {}
+
+    def add_metric_data(self, metric_name, metric_value):
+        if metric_name not in self.data:
+            self.data[metric_name] = RunningStats()
+        self.data[metric_name].update(metric_value)
 
-    def add_metric_data(self, metric_name, metric_value): 
-        self.data[metric_name] = metric_value
+    def merge(self, other: 'Summarizer') -> None:
+        for metric, stats in other.data.items():
+            if metric not in self.data:
+                self.data[metric] = RunningStats()
+            self.data[metric].merge(stats)
 
-    def get_metrics(self): 
+    def get_metrics(self):
         return self.data.keys()
 
-    def get_summary_entity(self, doc): 
+    def get_summary_entity(self, doc):
         metrics_stats = {}
-        for metric in self.get_metrics(): 
-            m_value = sum(self.data[metric]) / len(self.data[metric])
-            std_value = sum([(x - m_value) ** 2 for x in self.data[metric]]) / len(self.data[metric])
-
-            metrics_stats[f"{metric}_mean"] = m_value,
-            metrics_stats[f"{metric}_std"] = std_value
+        for metric in self.get_metrics():
+            for stat, value in self.data[metric].to_dict().items():
+                metrics_stats[f"{metric}_{stat}"] = value
 
         doc.entity('Metric Summary', other_attributes=metrics_stats)
 
+def summarize_run(prov_file: str, create_summary: bool = False) -> Optional[Tuple[str, Optional[str], Dict[str, float]]]:
+    """
+    Reads a single provenance file and reduces it to its namespace and per-metric run means.
+    Files which cannot be read or parsed are skipped with a warning.
+
+    Parameters:
+    -----------
+    prov_file : str
+        The path to the PROV-JSON file of a run.
+    create_summary : bool
+        Whether to compute the mean of every TRAINING metric of the run.
+
+    Returns:
+    --------
+    Optional[Tuple[str, Optional[str], Dict[str, float]]]
+        The file path, the custom namespace of the run and the mean value of each TRAINING metric, 
+        or None if the file could not be read.
+    """
+    try:
+        with open(prov_file, 'r') as f:
+            data = json.load(f)
+
+        nsp = data.get("prefix", {}).get("default")
+
+        means = {}
+        if create_summary:
+            for metric, entity in data.get("entity", {}).items():
+                if "TRAINING" not in metric or "prov-ml:metric_value_list" not in entity: continue
+                values = parse_metric_list(entity["prov-ml:metric_value_list"])
+                if values.size:
+                    means[metric] = float(values.mean())
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        if not SILENT:
+            warnings.warn(f"Skipping provenance file {prov_file}: {e}")
+        return None
+
+    return prov_file, nsp, means
+
+def iter_prov_files(experiment_path: str) -> Iterator[str]:
+    """Yields the PROV-JSON files in the experiment directory, without listing it in memory."""
+    with os.scandir(experiment_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                yield entry.path
+
+# Number of provenance files being parsed per worker process, bounds the results held in memory
+FILES_IN_FLIGHT_PER_WORKER = 4
+
+def iter_summarized_runs(experiment_path: str, create_summary: bool = False, workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[str], Dict[str, float]]]:
+    """
+    Yields the results of `summarize_run` for every provenance file in `experiment_path`, in completion order.
+    Files are parsed by a pool of `workers` processes, with at most `FILES_IN_FLIGHT_PER_WORKER` files per 
+    worker submitted at once, so memory does not grow with the number of runs.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = FILES_IN_FLIGHT_PER_WORKER * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for prov_file in iter_prov_files(experiment_path):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(executor.submit(summarize_run, prov_file, create_summary))
+        for future in in_flight:
+            yield future.result()
+
+def iter_indexed_runs(experiment_path: str, create_summary: bool = False) -> Iterator[Tuple[str, Optional[str], Dict[str, float]]]:
+    """
+    Yields the same results as `summarize_run` for every rank of the run saved in `experiment_path`,
+    looked up in the experiment index written by `end_run` instead of reading the provenance files.
+    """
+    index = ExperimentIndex(get_index_path(os.path.dirname(os.path.abspath(experiment_path))))
+    for run in index.get_runs(experiment_dir=experiment_path):
+        means = {}
+        if create_summary:
+            means = {metric: stats["mean"] for metric, stats in run["metrics"].items() if "TRAINING" in metric and stats["count"]}
+        yield run["files"]["provenance_file"], run["user_namespace"], means
+
 def main(args):
     experiment_path = args.experiment_path
 
     experiment_dir = os.path.dirname(experiment_path)
-    prov_files = [f for f in os.listdir(experiment_path) if f.endswith(".json")]
 
     doc = prov.ProvDocument()
     doc.add_namespace('prov','http://www.w3.org/ns/prov#')
@@ -41,51 +137,55 @@ def main(args):
 
     summarizer = Summarizer() if args.create_summary else None
 
-    # join the provenance data of all runs
+    # join the provenance data of all runs, files are parsed in parallel and
+    # only their per-metric means are sent back to this process
     nsp = None
-    for f in prov_files:
-        f = os.path.join(experiment_path, f)
-        data = json.load(open(f, 'r'))
-        # prov_doc = prov.ProvDocument()
-        # prov_doc = prov_doc.deserialize(f)
+    if args.from_index:
+        results = iter_indexed_runs(experiment_path, summarizer is not None)
+    else:
+        results = iter_summarized_runs(experiment_path, summarizer is not None, args.workers)
+    for result in results:
+        if result is None: continue
+        f, run_nsp, means = result
 
         # get the custom namespace of the experiment
-        nsp = data["prefixes"]["namespace"]
+        if nsp is None and run_nsp is not None:
+            nsp = run_nsp
+            doc.set_default_namespace(nsp)
 
         gr = f.split("_")[-1].split(".")[0]
 
         if summarizer is not None:
-            metrics = [m for m in data["entity"].keys() if "TRAINING" in m]
-            for metric in metrics:
-                values = eval(data["entity"][metric]["prov-ml:metric_value_list"])
-                summarizer.add_metric_data(metric, sum(values) / len(values))
+            for metric, value in means.items():
+                summarizer.add_metric_data(metric, value)
 
-        doc.entity(f'{experiment_path}', other_attributes={
+        doc.entity(os.path.basename(f), other_attributes={
             "prov-ml:type": "ProvMLFile",
             "prov-ml:label": f,
-            "prov-ml:global_rank": gr, 
+            "prov-ml:global_rank": gr,
         })
 
-    doc.set_default_namespace(nsp)
     if summarizer is not None:
         summarizer.get_summary_entity(doc)
 
     save_prov_file(
-        doc, 
-        os.path.join(experiment_dir, "prov_collection.json"), 
-        args.create_dot, 
+        doc,
+        os.path.join(experiment_dir, "prov_collection.json"),
+        args.create_dot,
         args.create_svg
     )
 
-    
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Create summary collection of an experiment')
     parser.add_argument('experiment_path', type=str, help='The path to the experiment directory')
-    
-    parser.add_argument('create_summary', action='store_true', help='Whether to create a metric summary', default=False)
 
-    parser.add_argument('create_dot', action='store_true', help='Whether to create a DOT file for visualization', default=False)
-    parser.add_argument('create_svg', action='store_true', help='Whether to create an SVG file for visualization', default=False)
+    parser.add_argument('--create_summary', action='store_true', help='Whether to create a metric summary', default=False)
+    parser.add_argument('--workers', type=int, help='Number of processes reading the provenance files', default=None)
+    parser.add_argument('--from_index', action='store_true', help='Whether to read the run summaries from the experiment index instead of the provenance files', default=False)
+
+    parser.add_argument('--create_dot', action='store_true', help='Whether to create a DOT file for visualization', default=False)
+    parser.add_argument('--create_svg', action='store_true', help='Whether to create an SVG file for visualization', default=False)
     args = parser.parse_args()
 
     main(args)
\ No newline at end of file
@@ -6,6 +6,8 @@ class MetricsType(Enum):
     Attributes:
         TXT (str): Represents text file format.
         ZARR (str): Represents Zarr file format.
+        ZARR_ZIP (str): Represents Zarr file format, packed into a single zip file at the end of the run.
     """
     TXT = 'txt'
     ZARR = 'zarr'
+    ZARR_ZIP = 'zarr.zip'
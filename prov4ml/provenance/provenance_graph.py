@@ -7,29 +7,51 @@ from datetime import datetime
 import getpass
 import subprocess
 import warnings
-import zarr
-from numpy import array, array2string, inf
+from typing import Any, Optional
+from numpy import array, array2string, diff, inf
 
 from prov4ml.constants import PROV4ML_DATA
-from prov4ml.datamodel.attribute_type import Prov4MLAttribute
+from prov4ml.datamodel.attribute_type import Prov4MLAttribute, LoggingItemKind
 from prov4ml.datamodel.artifact_data import artifact_is_pytorch_model
 from prov4ml.provenance.context import Context
 from prov4ml.provenance.metrics_type import MetricsType
+from prov4ml.utils.energy_utils import integrate_energy
 from prov4ml.utils.funcs import get_global_rank, get_runtime_type
+from prov4ml.utils.hash_utils import HASH_ALGORITHM
+from prov4ml.utils.zarr_utils import open_zarr_store
+
+def get_energy_metric_name(name: str) -> Optional[str]:
+    """
+    Returns the name of the energy series integrated from a power metric, or None if `name` is not a power metric.
+
+    Parameters:
+    -----------
+    name : str
+        The name of the metric, e.g. `gpu_power_usage` or `gpu_power_usage_0` for a single device.
+
+    Returns:
+    --------
+    Optional[str]
+        The name of the energy metric, e.g. `gpu_energy_consumption` or `gpu_energy_consumption_0`.
+    """
+    if name == "gpu_power_usage" or name.startswith("gpu_power_usage_"):
+        return name.replace("gpu_power_usage", "gpu_energy_consumption", 1)
+    return None
 
 def calculate_energy_consumption(
     doc: prov.ProvDocument,
     ctx: Context,
-    epochs: list[int],
-    timestamps: list[int],
-    values: list[float], 
+    epochs: Any,
+    timestamps: Any,
+    values: Any, 
+    name: str = "energy_consumption",
 ) -> None:
     """
     Calculates energy consumption based on power usage values and updates the provenance document.
 
-    This function computes the total energy consumption from power usage values over specified epochs,
-    and records the result in the given provenance document. It also creates or updates entities and
-    relationships in the document related to energy consumption metrics.
+    The power samples are integrated over time with the trapezoidal rule, with vectorized NumPy operations,
+    and the result is recorded as a per-epoch energy series, along with the cumulative energy at the end
+    of each epoch.
 
     Parameters:
     -----------
@@ -37,12 +59,14 @@ def calculate_energy_consumption(
         The provenance document to which the energy consumption data will be added.
     ctx : Context
         The context in which the energy consumption was measured (e.g., TRAINING, VALIDATION, EVALUATION).
-    epochs : list[int]
-        A list of epochs during which power usage was measured.
-    timestamps : list[int]
-        A list of timestamps corresponding to the epochs, representing the time at which power usage was recorded.
-    values : list[float]
-        A list of power usage values recorded during the specified epochs.
+    epochs : Any
+        The epoch of each power sample.
+    timestamps : Any
+        The timestamp of each power sample, in milliseconds.
+    values : Any
+        The power samples, in W.
+    name : str
+        The name of the energy metric. Defaults to "energy_consumption".
 
     Returns:
     --------
@@ -50,11 +74,11 @@ def calculate_energy_consumption(
 
     Notes:
     ------
-    - The energy consumption is computed by summing the product of the time interval between successive
-      timestamps and the corresponding power usage values.
-    - The function creates or updates an entity in the provenance document to represent the energy consumption metric.
+    - The energy of the interval between two consecutive samples is assigned to the epoch of the later sample.
+    - `prov-ml:metric_value_list` holds the energy consumed in each epoch (J), 
+      `prov-ml:metric_cumulative_value_list` the energy consumed up to the end of each epoch (J)
+      and `prov-ml:metric_timestamp_list` the last timestamp of each epoch.
     - Relationships are established between the energy consumption entity and the epochs during which the measurements were taken.
-    - The provenance document's energy consumption entity is updated with attributes including epochs, values, and timestamps.
 
     Examples:
     ---------
@@ -66,30 +90,92 @@ def calculate_energy_consumption(
         values=[150.0, 160.0, 155.0]
     )
     """
-    energy = 0
-    for i in range(1, len(epochs)):
-        energy += (timestamps[i] - timestamps[i-1]) * values[i]
+    epochs, energy, cumulative_energy, timestamps = integrate_energy(epochs, timestamps, values)
 
-    if not doc.get_record(f'energy_consumption_{ctx}'):
-        metric_entity = doc.entity(f'energy_consumption_{ctx}',{
+    if not doc.get_record(f'{name}_{ctx}'):
+        metric_entity = doc.entity(f'{name}_{ctx}',{
             'prov-ml:type':Prov4MLAttribute.get_attr('Metric'),
-            'prov-ml:name':Prov4MLAttribute.get_attr("energy_consumption"),
+            'prov-ml:name':Prov4MLAttribute.get_attr(name),
             'prov-ml:context':Prov4MLAttribute.get_attr(ctx),
-            'prov-ml:source':Prov4MLAttribute.get_source_from_kind("gpu_power_usage"),
+            'prov-ml:source':Prov4MLAttribute.get_source_from_kind(LoggingItemKind.SYSTEM_METRIC),
         })
     else:
-        metric_entity = doc.get_record(f'energy_consumption_{ctx}')[0]
+        metric_entity = doc.get_record(f'{name}_{ctx}')[0]
 
-    for epoch in epochs: 
-        doc.wasGeneratedBy(metric_entity,f'epoch_{epoch}',identifier=f'energy_consumption_train_{epoch}_gen')
+    if ctx == Context.TRAINING:
+        for epoch in epochs: 
+            doc.wasGeneratedBy(metric_entity,f'epoch_{epoch}',identifier=f'{name}_train_{epoch}_gen')
     
     metric_entity.add_attributes({
-        'prov-ml:metric_epoch_list': Prov4MLAttribute.get_attr(epochs), 
-        'prov-ml:metric_value_list': Prov4MLAttribute.get_attr(energy),
-        'prov-ml:metric_timestamp_list': Prov4MLAttribute.get_attr(timestamps),
+        'prov-ml:metric_epoch_list': Prov4MLAttribute.get_attr(array2string(epochs, separator=', ', max_line_width=inf, threshold=sys.maxsize)), 
+        'prov-ml:metric_value_list': Prov4MLAttribute.get_attr(array2string(energy, separator=', ', max_line_width=inf, threshold=sys.maxsize)),
+        'prov-ml:metric_cumulative_value_list': Prov4MLAttribute.get_attr(array2string(cumulative_energy, separator=', ', max_line_width=inf, threshold=sys.maxsize)),
+        'prov-ml:metric_timestamp_list': Prov4MLAttribute.get_attr(array2string(timestamps, separator=', ', max_line_width=inf, threshold=sys.maxsize)),
         'prov-ml:context': Prov4MLAttribute.get_attr(ctx),
     })
     
+def calculate_flops_throughput(
+    doc: prov.ProvDocument,
+    ctx: Context,
+    epochs: Any,
+    timestamps: Any,
+    values: Any,
+    name: str = "flops_throughput",
+) -> None:
+    """
+    Calculates the FLOP/s throughput from a cumulative FLOPs counter and updates the provenance document.
+
+    Parameters:
+    -----------
+    doc : prov.ProvDocument
+        The provenance document to which the throughput data will be added.
+    ctx : Context
+        The context in which the FLOPs were counted (e.g., TRAINING, VALIDATION, EVALUATION).
+    epochs : Any
+        The epoch of each counter value.
+    timestamps : Any
+        The timestamp of each counter value, in milliseconds.
+    values : Any
+        The cumulative FLOPs, as logged by `log_flops_per_batch`.
+    name : str
+        The name of the throughput metric. Defaults to "flops_throughput".
+
+    Returns:
+    --------
+    None
+
+    Notes:
+    ------
+    - The throughput of the interval between two consecutive values is assigned to the epoch and timestamp of the later value.
+    - Intervals with no elapsed time (e.g. values logged within the same millisecond) are dropped.
+    """
+    epochs, timestamps = array(epochs), array(timestamps, dtype='i8')
+    elapsed = diff(timestamps) / 1000
+    valid = elapsed > 0
+    throughput = diff(array(values, dtype='f8'))[valid] / elapsed[valid]
+    epochs, timestamps = epochs[1:][valid], timestamps[1:][valid]
+
+    if not doc.get_record(f'{name}_{ctx}'):
+        metric_entity = doc.entity(f'{name}_{ctx}',{
+            'prov-ml:type':Prov4MLAttribute.get_attr('Metric'),
+            'prov-ml:name':Prov4MLAttribute.get_attr(name),
+            'prov-ml:context':Prov4MLAttribute.get_attr(ctx),
+            'prov-ml:source':Prov4MLAttribute.get_source_from_kind(LoggingItemKind.FLOPS_PER_BATCH),
+        })
+    else:
+        metric_entity = doc.get_record(f'{name}_{ctx}')[0]
+
+    if ctx == Context.TRAINING:
+        for epoch in set(epochs): 
+            doc.wasGeneratedBy(metric_entity,f'epoch_{epoch}',identifier=f'{name}_train_{epoch}_gen')
+
+    metric_entity.add_attributes({
+        'prov-ml:metric_epoch_list': Prov4MLAttribute.get_attr(array2string(epochs, separator=', ', max_line_width=inf, threshold=sys.maxsize)), 
+        'prov-ml:metric_value_list': Prov4MLAttribute.get_attr(array2string(throughput, separator=', ', max_line_width=inf, threshold=sys.maxsize)),
+        'prov-ml:metric_timestamp_list': Prov4MLAttribute.get_attr(array2string(timestamps, separator=', ', max_line_width=inf, threshold=sys.maxsize)),
+        'prov-ml:context': Prov4MLAttribute.get_attr(ctx),
+    })
+
 def save_metric_from_file(
         metric_file : str,
         name : str, 
@@ -142,9 +228,13 @@ def save_metric_from_file(
         run_activity=current_run_activity
     )
     """
-    if PROV4ML_DATA.METRICS_FILE_TYPE == MetricsType.ZARR:
-        dataset = zarr.open(os.path.join(PROV4ML_DATA.METRICS_DIR, metric_file), 'r')
-        source = ', '.join(dataset.attrs.values())
+    if PROV4ML_DATA.METRICS_FILE_TYPE == MetricsType.ZARR or PROV4ML_DATA.METRICS_FILE_TYPE == MetricsType.ZARR_ZIP:
+        with open_zarr_store(os.path.join(PROV4ML_DATA.METRICS_DIR, metric_file), 'r') as dataset:
+            source = ', '.join(dataset.attrs.values())
+
+            epochs = dataset['epochs'][:]
+            values = dataset['values'][:]
+            timestamps = dataset['timestamps'][:]
 
         if not doc.get_record(f'{name}_{ctx}'):
             metric_entity = doc.entity(f'{name}_{ctx}',{
@@ -156,10 +246,6 @@ def save_metric_from_file(
         else:
             metric_entity = doc.get_record(f'{name}_{ctx}')[0]
 
-        epochs = dataset['epochs'][:]
-        values = dataset['values'][:]
-        timestamps = dataset['timestamps'][:]
-
     elif PROV4ML_DATA.METRICS_FILE_TYPE == MetricsType.TXT:
         with open(os.path.join(PROV4ML_DATA.METRICS_DIR, metric_file), 'r') as f:
             lines = f.readlines()
@@ -220,12 +306,20 @@ def save_metric_from_file(
             doc.wasGeneratedBy(metric_entity,'test',identifier=f'test_gen')
 
     metric_entity.add_attributes({
-        'prov-ml:metric_epoch_list': Prov4MLAttribute.get_attr(array2string(epochs, separator=', ', max_line_width=inf)), 
-        'prov-ml:metric_value_list': Prov4MLAttribute.get_attr(array2string(values, separator=', ', max_line_width=inf)), 
-        'prov-ml:metric_timestamp_list': Prov4MLAttribute.get_attr(array2string(timestamps, separator=', ', max_line_width=inf)), 
+        'prov-ml:metric_epoch_list': Prov4MLAttribute.get_attr(array2string(epochs, separator=', ', max_line_width=inf, threshold=sys.maxsize)), 
+        'prov-ml:metric_value_list': Prov4MLAttribute.get_attr(array2string(values, separator=', ', max_line_width=inf, threshold=sys.maxsize)), 
+        'prov-ml:metric_timestamp_list': Prov4MLAttribute.get_attr(array2string(timestamps, separator=', ', max_line_width=inf, threshold=sys.maxsize)), 
         'prov-ml:context': Prov4MLAttribute.get_attr(ctx),
     })
 
+    energy_name = get_energy_metric_name(name)
+    if energy_name is not None:
+        calculate_energy_consumption(doc, ctx, epochs, timestamps, values, name=energy_name)
+
+    # FLOPs per batch are logged as a cumulative counter
+    if str(LoggingItemKind.FLOPS_PER_BATCH) in source and len(values) > 1:
+        calculate_flops_throughput(doc, ctx, epochs, timestamps, values, name=f"{name}_throughput")
+
 def create_prov_document() -> prov.ProvDocument:
     """
     Generates the first level of provenance for a given run.
@@ -393,10 +487,24 @@ def create_prov_document() -> prov.ProvDocument:
         ent=doc.entity(f'{artifact.path}',{
             'prov-ml:artifact_path': Prov4MLAttribute.get_attr(artifact.path),
         })
+        if artifact.digest is not None:
+            ent.add_attributes({
+                'prov-ml:artifact_digest': Prov4MLAttribute.get_attr(f"{HASH_ALGORITHM}:{artifact.digest}"),
+                'prov-ml:artifact_size': Prov4MLAttribute.get_attr(artifact.size),
+            })
         #the FileInfo object stores only size and path of the artifact, specific connectors 
         # to the artifact store are needed to get other metadata
         if artifact_is_pytorch_model(artifact):
             doc.wasGeneratedBy(f"{artifact.path}", model_ser)
+            # deduplicated and delta-compressed versions record the version they derive from
+            if isinstance(artifact.value, dict):
+                ent.add_attributes({
+                    f'prov-ml:{key}': Prov4MLAttribute.get_attr(value) 
+                    for key, value in artifact.value.items() if key not in ("previous_version", "keyframe")
+                })
+                for key in ("previous_version", "keyframe"):
+                    if artifact.value.get(key) is not None:
+                        doc.wasDerivedFrom(ent, f'{artifact.value[key]}')
         else: 
             doc.wasGeneratedBy(ent,run_activity,identifier=f'{artifact.path}_gen')    
 
@@ -0,0 +1,192 @@
+import os
+import threading
+import warnings
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from prov4ml.configs import SILENT
+from prov4ml.constants import PROV4ML_DATA
+from prov4ml.utils import model_storage
+
+def snapshot_state(state: Any) -> Any:
+    """
+    Returns a copy of a (nested) state dict on the CPU, detached from the training tensors.
+
+    Device tensors are copied asynchronously into pinned host memory, so the training thread
+    does not wait for the transfer: the copies are queued on the current CUDA streams, before any
+    later update of the parameters, and must be waited for before reading them (see `_record_copy_events`).
+    CPU tensors are cloned.
+
+    Args:
+        state (Any): The state dict, or any nesting of dicts, lists and tuples of tensors.
+
+    Returns:
+        Any: The snapshot, with the same structure as `state`.
+    """
+    import torch
+
+    if isinstance(state, torch.Tensor):
+        state = state.detach()
+        if state.device.type == "cuda":
+            snapshot = torch.empty(state.shape, dtype=state.dtype, device="cpu", pin_memory=True)
+            return snapshot.copy_(state, non_blocking=True)
+        return state.clone()
+    if isinstance(state, dict):
+        return type(state)((key, snapshot_state(value)) for key, value in state.items())
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot_state(value) for value in state)
+    return state
+
+def _record_copy_events() -> List[Any]:
+    """Records an event on the current stream of every CUDA device, marking the end of the queued snapshot copies."""
+    import torch
+
+    if not torch.cuda.is_available() or not torch.cuda.is_initialized(): return []
+    events = []
+    for device in range(torch.cuda.device_count()):
+        event = torch.cuda.Event()
+        event.record(torch.cuda.current_stream(device))
+        events.append(event)
+    return events
+
+class AsyncCheckpointWriter:
+    """
+    Writes model checkpoints on a background thread, off the training loop.
+
+    `submit` snapshots the state to host memory and returns immediately, the snapshot is then
+    saved with `torch.save` (or the given save function) to a temporary file and atomically renamed to its final path.
+    The number of snapshots held in memory is bounded by `max_pending`: when it is reached,
+    `submit` blocks until the oldest write completes. Writes run in the context of the call to `submit`,
+    so `on_complete` logs to the run that submitted the checkpoint.
+
+    Attributes:
+        max_pending (int): The maximum number of checkpoints being snapshotted or written at the same time.
+    """
+    def __init__(self, max_pending: int = 2) -> None:
+        if max_pending < 1:
+            raise ValueError("The number of pending checkpoints must be at least 1.")
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prov4ml-checkpoint-writer")
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def _write(
+            self, 
+            state: Any, 
+            events: List[Any], 
+            path: str, 
+            on_complete: Optional[Callable[[str, Any], None]], 
+            save: Optional[Callable[[Any, str], Any]]
+        ) -> None:
+        import torch
+
+        try:
+            for event in events:
+                event.synchronize()
+            tmp_path = f"{path}.tmp"
+            result = (save or torch.save)(state, tmp_path)
+            os.replace(tmp_path, path)
+            if on_complete is not None:
+                on_complete(path, result)
+        except Exception as e:
+            if not SILENT:
+                warnings.warn(f"Could not write checkpoint {path}: {e}")
+        finally:
+            self._slots.release()
+
+    def submit(
+            self, 
+            state: Any, 
+            path: str, 
+            on_complete: Optional[Callable[[str, Any], None]] = None, 
+            save: Optional[Callable[[Any, str], Any]] = None
+        ) -> Future:
+        """
+        Snapshots the state and schedules its write to `path`.
+
+        Args:
+            state (Any): The state dict to save.
+            path (str): The path of the checkpoint file.
+            on_complete (Optional[Callable[[str, Any], None]]): Called with the path and the value returned by `save` once the file is written. Defaults to None.
+            save (Optional[Callable[[Any, str], Any]]): Writes the snapshot to the given path. Defaults to `torch.save`.
+
+        Returns:
+            Future: Completed when the checkpoint is written.
+        """
+        self._slots.acquire()
+        try:
+            snapshot = snapshot_state(state)
+            events = _record_copy_events()
+            future = self._executor.submit(contextvars.copy_context().run, self._write, snapshot, events, path, on_complete, save)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Blocks until every submitted checkpoint is written."""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Waits for the pending checkpoints and stops the writer thread."""
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+def _checkpoint_writer_init(max_pending: int = 2) -> None:
+    """Initializes the background checkpoint writer of the active run."""
+    _checkpoint_writer_stop()
+    PROV4ML_DATA.model_versions = {}
+    PROV4ML_DATA.checkpoint_writer = AsyncCheckpointWriter(max_pending)
+
+def _checkpoint_writer_stop() -> None:
+    """Waits for the pending checkpoints and stops the background checkpoint writer of the active run, if running."""
+    writer = PROV4ML_DATA.checkpoint_writer
+    if writer is not None:
+        writer.close()
+        PROV4ML_DATA.checkpoint_writer = None
+    model_storage._delta_series_reset(PROV4ML_DATA.ARTIFACTS_DIR)
+
+def wait_for_checkpoints() -> None:
+    """Blocks until every checkpoint submitted to the background writer of the active run is written."""
+    writer = PROV4ML_DATA.checkpoint_writer
+    if writer is not None:
+        writer.wait()
+
+def get_checkpoint_writer() -> AsyncCheckpointWriter:
+    """Returns the background checkpoint writer of the active run, creating it if the run did not."""
+    writer = PROV4ML_DATA.checkpoint_writer
+    if writer is None:
+        writer = PROV4ML_DATA.checkpoint_writer = AsyncCheckpointWriter()
+    return writer
+
+def next_model_version(path: str, model_name: str) -> int:
+    """
+    Returns the next version number of the model saved in `path`.
+
+    Existing versions are counted once, on the first version saved in the run, later
+    versions are numbered from an in-memory counter instead of listing the directory.
+
+    Args:
+        path (str): The directory of the model checkpoints.
+        model_name (str): The name of the model.
+
+    Returns:
+        int: The version number.
+    """
+    model_versions = PROV4ML_DATA.model_versions
+    if path not in model_versions:
+        model_versions[path] = len([
+            file for file in os.listdir(path) if str(file).startswith(model_name) and not str(file).endswith(".tmp")
+        ])
+    version = model_versions[path]
+    model_versions[path] = version + 1
+    return version
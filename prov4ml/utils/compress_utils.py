@@ -2,36 +2,152 @@ import gzip
 import os
 import shutil
 import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
+
+COMPRESSION_CODECS = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+class ParallelGzipWriter:
+    """
+    Write-only file object that compresses its input in parallel, block by block.
+
+    Every block is compressed as an independent gzip member on a thread pool (zlib releases
+    the GIL while deflating) and members are written to the underlying file in order.
+    Concatenated gzip members are a valid gzip stream, readable by `gzip`, `tar` and `pigz`.
+
+    Parameters:
+    -----------
+    fileobj : Any
+        The binary file object the compressed stream is written to.
+    level : int
+        The gzip compression level (1-9).
+    threads : int
+        The number of compression threads.
+    block_size : int
+        The size in bytes of the uncompressed blocks. Defaults to 1 MiB.
+    """
+    def __init__(self, fileobj, level: int = 6, threads: int = 1, block_size: int = 1 << 20) -> None:
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.max_pending = 2 * threads
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self.closed = False
+
+    def _compress_block(self, block: bytes) -> bytes:
+        return gzip.compress(block, compresslevel=self.level, mtime=0)
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(self._executor.submit(self._compress_block, block))
+        while len(self._pending) >= self.max_pending:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self.closed: return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+        self._executor.shutdown()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def _open_compressed_writer(fileobj, codec: str, level: int, threads: int):
+    """Wraps `fileobj` in a streaming compressor for the given codec."""
+    if codec == "gzip":
+        if threads > 1:
+            return ParallelGzipWriter(fileobj, level=level, threads=threads)
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=level, mtime=0)
+    elif codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=level, threads=threads).stream_writer(fileobj, closefd=False)
+    else:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+
+def compress_file(
+        input_file: str,
+        output_file: str,
+        codec: str = "gzip",
+        level: int = 6,
+        threads: Optional[int] = None
+    ) -> Optional[str]:
+    """
+    Compresses a file, or streams a folder through tar, into a single compressed archive.
+
+    Folders are tarred directly into the compressor, without writing an intermediate `.tar` to disk.
+
+    Parameters:
+    -----------
+    input_file : str
+        The path of the file or folder to compress.
+    output_file : str
+        The path of the compressed file, without extension.
+    codec : str
+        The compression codec, either "gzip" or "zstd" (requires the `zstandard` package). Defaults to "gzip".
+    level : int
+        The compression level. Defaults to 6.
+    threads : Optional[int]
+        The number of compression threads. Defaults to the number of available cores.
+
+    Returns:
+    --------
+    Optional[str]
+        The path of the compressed file, or None if the compression failed.
+    """
+    if codec not in COMPRESSION_CODECS:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+    threads = threads or os.cpu_count() or 1
 
-def compress_file(input_file, output_file):
-    """Compress a file using gzip."""
     try:
         # File
         if Path(input_file).is_file():
-            with open(input_file, 'rb') as f_in:
-                with gzip.open(output_file + '.gz', 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            print(f"File '{input_file}' compressed to '{output_file}.gz'.")
+            compressed_file = output_file + COMPRESSION_CODECS[codec]
+            with open(input_file, 'rb') as f_in, open(compressed_file, 'wb') as f_raw:
+                with _open_compressed_writer(f_raw, codec, level, threads) as f_out:
+                    shutil.copyfileobj(f_in, f_out, length=1 << 20)
 
         # Folder
         elif Path(input_file).is_dir():
-            with tarfile.open(output_file + ".tar", "w") as tar:
-                tar.add(output_file, arcname=os.path.basename(input_file))
-
-            with open(output_file + ".tar", "rb") as f_in:
-                with gzip.open(output_file + ".tar.gz", "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+            compressed_file = output_file + ".tar" + COMPRESSION_CODECS[codec]
+            with open(compressed_file, 'wb') as f_raw:
+                with _open_compressed_writer(f_raw, codec, level, threads) as f_out:
+                    with tarfile.open(fileobj=f_out, mode="w|") as tar:
+                        tar.add(input_file, arcname=os.path.basename(input_file))
 
-            os.remove(output_file + ".tar")
-            print(f"File '{input_file}' compressed to '{output_file}.tar.gz'.")
-        
         # File not found
         else:
             print(f"Error: The file '{input_file}' does not exist.")
+            return None
+
+        print(f"File '{input_file}' compressed to '{compressed_file}'.")
+        return compressed_file
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        return None
 
 def print_file_size(file_path):
     """Prints the size of the file at the given path in Mbytes."""
@@ -51,10 +167,10 @@ def print_file_size(file_path):
             file_size = sum(f.stat().st_size for f in file.glob('**/*') if f.is_file())
             file_size = file_size / 1024 / 1024
             print(f"The size of the file {file_path} is "  + CRED + f"{file_size:.2f} Mb." + CEND)
-        
+
         # File not found
         else:
             print(f"Error: The file '{file_path}' does not exist.")
 
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
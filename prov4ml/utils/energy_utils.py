@@ -1,44 +1,362 @@
+import os
+import time
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-import pandas as pd 
-from codecarbon import EmissionsTracker
-from typing import Any, Callable, Tuple
+ENERGY_FIELDS = ["cpu_energy", "gpu_energy", "ram_energy", "energy_consumed"]
+POWER_FIELDS = ["cpu_power", "gpu_power", "ram_power"]
+
+KWH_TO_J = 3.6e6
+
+# world average carbon intensity of electricity, in gCO2eq/kWh, used when no other estimate is available
+DEFAULT_CARBON_INTENSITY = 475.0
+
+class EnergyBackend:
+    """
+    Base class of the sources of energy readings.
+
+    `read` must be cheap and must not block: it returns the energy consumed since the backend
+    was started (cumulative, in J) for each of `ENERGY_FIELDS`, and the last measured power
+    (in W) for each of `POWER_FIELDS`.
+    """
+    name = "none"
+
+    def read(self) -> Dict[str, float]:
+        return {field: 0.0 for field in ENERGY_FIELDS + POWER_FIELDS}
+
+    def emissions_factor(self) -> float:
+        """Returns the carbon intensity of the consumed energy, in gCO2eq/J."""
+        return 0.0
+
+    def stop(self) -> None:
+        pass
+
+class CodecarbonEnergyBackend(EnergyBackend):
+    """
+    Reads the energy measured by a codecarbon `EmissionsTracker`, which is started once and kept running.
+
+    The tracker measures power on its own background scheduler every `measure_power_secs`
+    seconds, `read` only copies its running totals.
+    """
+    name = "codecarbon"
+
+    def __init__(self, measure_power_secs: float = 15) -> None:
+        from codecarbon import EmissionsTracker
+
+        self.tracker = EmissionsTracker(
+            save_to_file=False,
+            save_to_api=False,
+            save_to_logger=False,
+            log_level="error",
+            measure_power_secs=measure_power_secs,
+        ) #carbon emission tracker, don't save anywhere, just get the emissions value to log with prov4ml
+        self.tracker.start()
+        self._emissions_factor = None
+
+    def read(self) -> Dict[str, float]:
+        def kwh(name):
+            energy = getattr(self.tracker, name, None)
+            return energy.kWh * KWH_TO_J if energy is not None else 0.0
+        def watts(name):
+            power = getattr(self.tracker, name, None)
+            return power.W if power is not None else 0.0
+
+        return {
+            "cpu_energy": kwh("_total_cpu_energy"),
+            "gpu_energy": kwh("_total_gpu_energy"),
+            "ram_energy": kwh("_total_ram_energy"),
+            "energy_consumed": kwh("_total_energy"),
+            "cpu_power": watts("_cpu_power"),
+            "gpu_power": watts("_gpu_power"),
+            "ram_power": watts("_ram_power"),
+        }
+
+    def emissions_factor(self) -> float:
+        # the carbon intensity depends on the location only, it is computed once
+        # from codecarbon's own emissions estimate, as soon as some energy was measured
+        if self._emissions_factor is None:
+            emissions = self.tracker._prepare_emissions_data()
+            if not emissions.energy_consumed:
+                return 0.0
+            self._emissions_factor = emissions.emissions * 1000 / (emissions.energy_consumed * KWH_TO_J)
+        return self._emissions_factor
+
+    def stop(self) -> None:
+        self.tracker.stop()
+
+class RaplZone:
+    """
+    An energy counter of the Linux powercap interface, e.g. `/sys/class/powercap/intel-rapl:0`.
+
+    Attributes:
+    -----------
+    path : str
+        The directory of the zone.
+    name : str
+        The name of the zone, e.g. "package-0" or "dram".
+    max_energy_uj : int
+        The value at which the counter wraps around, in microjoules.
+    energy_j : float
+        The energy accumulated since the zone was opened, in J, corrected for wraparounds.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "name")) as f:
+            self.name = f.read().strip()
+        with open(os.path.join(path, "max_energy_range_uj")) as f:
+            self.max_energy_uj = int(f.read())
+        self._energy_file = os.path.join(path, "energy_uj")
+        self._last_uj = self._read_counter()
+        self.energy_j = 0.0
+
+    def _read_counter(self) -> int:
+        with open(self._energy_file) as f:
+            return int(f.read())
+
+    def update(self) -> float:
+        """
+        Reads the counter and accumulates the energy consumed since the previous read.
+
+        Returns:
+            float: The energy consumed since the previous read, in J.
+        """
+        counter = self._read_counter()
+        delta = counter - self._last_uj
+        if delta < 0:
+            # the counter wrapped around, at most once if it is read often enough
+            delta += self.max_energy_uj
+        self._last_uj = counter
+        self.energy_j += delta / 1e6
+        return delta / 1e6
+
+class RaplEnergyBackend(EnergyBackend):
+    """
+    Reads the CPU and DRAM energy counters exposed by RAPL through the Linux powercap sysfs interface.
+
+    Package zones (`package-N`) are summed into `cpu_energy` and `dram` zones into `ram_energy`.
+    Counters are read directly from sysfs, so reads cost a few microseconds and need no network
+    access. A daemon thread polls them every `poll_interval` seconds, so that wraparounds are
+    never missed and power is averaged over a known interval. GPU energy is not covered by RAPL
+    and is always reported as 0.
+
+    Attributes:
+    -----------
+    root : str
+        The powercap sysfs directory, configurable to read a fake tree in tests.
+    carbon_intensity : float
+        The carbon intensity of the electricity, in gCO2eq/kWh.
+    poll_interval : Optional[float]
+        The number of seconds between two background reads, None to only read the counters on `read`.
+    """
+    name = "rapl"
+
+    def __init__(
+            self, 
+            root: str = "/sys/class/powercap", 
+            carbon_intensity: float = DEFAULT_CARBON_INTENSITY, 
+            poll_interval: Optional[float] = 1.0
+        ) -> None:
+        self.root = root
+        self.carbon_intensity = carbon_intensity
+        self.poll_interval = poll_interval
+        self.cpu_zones: List[RaplZone] = []
+        self.ram_zones: List[RaplZone] = []
+
+        for entry in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            if not entry.startswith("intel-rapl:"): continue
+            zone = RaplZone(os.path.join(root, entry))
+            if zone.name.startswith("package"):
+                self.cpu_zones.append(zone)
+            elif zone.name == "dram":
+                self.ram_zones.append(zone)
+        if not self.cpu_zones:
+            raise ValueError(f"No readable RAPL package zone found in {root}")
+
+        self._lock = threading.Lock()
+        self._power = {"cpu_power": 0.0, "ram_power": 0.0}
+        self._interval_energy = {"cpu_power": 0.0, "ram_power": 0.0}
+        self._interval_start = time.perf_counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if poll_interval is not None:
+            self._thread = threading.Thread(target=self._poll, name="prov4ml-rapl-poller", daemon=True)
+            self._thread.start()
+
+    def _update(self) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            self._interval_energy["cpu_power"] += sum(zone.update() for zone in self.cpu_zones)
+            self._interval_energy["ram_power"] += sum(zone.update() for zone in self.ram_zones)
+            interval = now - self._interval_start
+            # power is averaged over at least half a polling interval, closer reads keep the last estimate
+            if interval > 0 and (self.poll_interval is None or interval >= self.poll_interval / 2):
+                self._power = {field: energy / interval for field, energy in self._interval_energy.items()}
+                self._interval_energy = {field: 0.0 for field in self._interval_energy}
+                self._interval_start = now
+
+    def _poll(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            self._update()
+
+    def read(self) -> Dict[str, float]:
+        self._update()
+        cpu_energy = sum(zone.energy_j for zone in self.cpu_zones)
+        ram_energy = sum(zone.energy_j for zone in self.ram_zones)
+        return {
+            "cpu_energy": cpu_energy,
+            "gpu_energy": 0.0,
+            "ram_energy": ram_energy,
+            "energy_consumed": cpu_energy + ram_energy,
+            "cpu_power": self._power["cpu_power"],
+            "gpu_power": 0.0,
+            "ram_power": self._power["ram_power"],
+        }
+
+    def emissions_factor(self) -> float:
+        return self.carbon_intensity / KWH_TO_J
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+ENERGY_BACKENDS = {
+    "codecarbon": CodecarbonEnergyBackend,
+    "rapl": RaplEnergyBackend,
+}
+
+class CarbonMonitor:
+    """
+    Turns the cumulative readings of an energy backend into per-interval carbon metrics.
+
+    The backend keeps running for the whole run: every `sample` returns the energy consumed
+    and the emissions since the previous sample, without stopping or flushing the backend.
+
+    Attributes:
+    -----------
+    backend : EnergyBackend
+        The source of the energy readings.
+    """
+    def __init__(self, backend: EnergyBackend) -> None:
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._last_reading = backend.read()
+        self._last_time = time.perf_counter()
+
+    def sample(self) -> Dict[str, float]:
+        """
+        Returns the carbon metrics of the interval since the previous sample.
+
+        Returns:
+            Dict[str, float]: The energy consumed in the interval (J) for each of `ENERGY_FIELDS`,
+            the last measured power (W) for each of `POWER_FIELDS`, the `emissions` (gCO2eq)
+            and the `emissions_rate` (gCO2eq/s) of the interval.
+        """
+        with self._lock:
+            reading = self.backend.read()
+            now = time.perf_counter()
+            interval = now - self._last_time
+            metrics = {field: reading[field] - self._last_reading[field] for field in ENERGY_FIELDS}
+            self._last_reading, self._last_time = reading, now
+
+        metrics.update({field: reading[field] for field in POWER_FIELDS})
+        metrics["emissions"] = metrics["energy_consumed"] * self.backend.emissions_factor()
+        metrics["emissions_rate"] = metrics["emissions"] / interval if interval > 0 else 0.0
+        return metrics
+
+    def stop(self) -> None:
+        """Stops the energy backend."""
+        self.backend.stop()
+
+MONITOR: Optional[CarbonMonitor] = None
 
 def carbon_tracked_function(f: Callable, *args, **kwargs) -> Tuple[Any, Any]:
     """
     Tracks carbon emissions for a given function call.
-    
+
     Args:
         f (Callable): The function to be executed and carbon emissions tracked.
         *args: Positional arguments to be passed to the function.
         **kwargs: Keyword arguments to be passed to the function.
-    
+
     Returns:
-        Tuple[Any, Any]: A tuple containing the result of the function call and the total emissions tracked.
+        Tuple[Any, Any]: A tuple containing the result of the function call and the carbon metrics of the call.
     """
-    TRACKER.start()
+    monitor = get_carbon_monitor()
+    monitor.sample()
     result = f(*args, **kwargs)
-    _ = TRACKER.stop()
-    total_emissions = TRACKER._prepare_emissions_data()
-    return result, total_emissions
-
-def _carbon_init() -> None:
-    """Initializes the carbon emissions tracker."""
-    global TRACKER
-    TRACKER = EmissionsTracker(
-        save_to_file=False,
-        save_to_api=False,
-        save_to_logger=False, 
-        log_level="error",
-    ) #carbon emission tracker, don't save anywhere, just get the emissions value to log with prov4ml
-    TRACKER.start()
-
-def stop_carbon_tracked_block() -> Any:
-    """
-    Stops the tracking of carbon emissions for a code block and returns the total emissions tracked.
-    
+    return result, monitor.sample()
+
+def _carbon_init(backend: Union[str, EnergyBackend] = "codecarbon") -> None:
+    """Initializes the carbon emissions tracker, with one of `ENERGY_BACKENDS` or a backend instance."""
+    global MONITOR
+    _carbon_stop()
+    if isinstance(backend, str):
+        if backend not in ENERGY_BACKENDS:
+            raise ValueError(f"Unsupported energy backend: {backend}")
+        backend = ENERGY_BACKENDS[backend]()
+    MONITOR = CarbonMonitor(backend)
+
+def _carbon_stop() -> None:
+    """Stops the carbon emissions tracker, if running."""
+    global MONITOR
+    if MONITOR is not None:
+        MONITOR.stop()
+        MONITOR = None
+
+def get_carbon_monitor() -> CarbonMonitor:
+    """
+    Returns the carbon monitor, initializing it on first use if `start_run` has not been called.
+
+    Returns:
+        CarbonMonitor: The carbon monitor.
+    """
+    if MONITOR is None:
+        _carbon_init()
+    return MONITOR
+
+def get_carbon_metrics() -> Dict[str, float]:
+    """
+    Returns the carbon metrics of the interval since the previous call, without stopping the tracker.
+
+    Returns:
+        Dict[str, float]: The energy, power and emissions metrics, by metric name.
+    """
+    return get_carbon_monitor().sample()
+
+def integrate_energy(
+        epochs: Any, 
+        timestamps: Any, 
+        values: Any
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Integrates a power series over time with the trapezoidal rule, per epoch.
+
+    Samples are ordered by timestamp, and the energy of each interval between two consecutive
+    samples is assigned to the epoch of the later sample. The whole computation is vectorized.
+
+    Args:
+        epochs (Any): The epoch of each power sample.
+        timestamps (Any): The timestamp of each power sample, in milliseconds.
+        values (Any): The power samples, in W.
+
     Returns:
-        Any: The total emissions tracked.
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The epochs, in increasing order, the energy
+        consumed in each epoch (J), the cumulative energy at the end of each epoch (J) and the last timestamp of each epoch.
     """
-    _ = TRACKER.stop()
-    total_emissions = TRACKER._prepare_emissions_data()
-    return total_emissions
+    epochs = np.asarray(epochs, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    order = np.argsort(timestamps, kind="stable")
+    epochs, timestamps, values = epochs[order], timestamps[order], values[order]
+
+    unique_epochs, inverse = np.unique(epochs, return_inverse=True)
+    intervals = np.diff(timestamps) / 1000
+    energy = (values[1:] + values[:-1]) / 2 * intervals
+    epoch_energy = np.bincount(inverse[1:], weights=energy, minlength=len(unique_epochs))
+
+    last_timestamps = np.zeros(len(unique_epochs), dtype=np.int64)
+    np.maximum.at(last_timestamps, inverse, timestamps)
+    return unique_epochs, epoch_energy, np.cumsum(epoch_energy), last_timestamps
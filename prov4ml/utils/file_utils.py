@@ -46,18 +46,6 @@ def save_prov_file(
         os.system(f"dot -Tsvg {path_dot} > {path_svg}")
 
 
-from prov.model import (
-    ProvException,
-    Identifier,
-    PROV_ATTRIBUTE_QNAMES,
-    datetime,
-)
-from prov.graph import INFERRED_ELEMENT_CLASS
-from prov.dot import ANNOTATION_STYLE, ANNOTATION_LINK_STYLE, ANNOTATION_START_ROW, ANNOTATION_ROW_TEMPLATE, ANNOTATION_END_ROW, DOT_PROV_STYLE, GENERIC_NODE_STYLE, sorted_attributes
-from xml.sax.saxutils import escape
-from datetime import datetime
-import pydot
-
 def custom_prov_to_dot(
     bundle,
     show_nary=True,
@@ -82,6 +70,18 @@ def custom_prov_to_dot(
     :type show_relation_attributes: bool
     :returns:  :class:`pydot.Dot` -- the Dot object.
     """
+    # pydot and prov.graph (networkx) are only needed to draw graphs
+    from prov.model import (
+        ProvException,
+        Identifier,
+        PROV_ATTRIBUTE_QNAMES,
+    )
+    from prov.graph import INFERRED_ELEMENT_CLASS
+    from prov.dot import ANNOTATION_STYLE, ANNOTATION_LINK_STYLE, ANNOTATION_START_ROW, ANNOTATION_ROW_TEMPLATE, ANNOTATION_END_ROW, DOT_PROV_STYLE, GENERIC_NODE_STYLE, sorted_attributes
+    from xml.sax.saxutils import escape
+    from datetime import datetime
+    import pydot
+
     if direction not in {"BT", "TB", "LR", "RL"}:
         # Invalid direction is provided
         direction = "BT"  # reset it to the default value
@@ -1,45 +1,220 @@
-from fvcore.nn import FlopCountAnalysis
-from typing import Any
+import math
+import weakref
+from typing import Any, Dict, Hashable, Tuple
+
+from prov4ml.constants import PROV4ML_DATA
+
+FLOPS_MODES = ["fvcore", "analytical"]
+
+# FLOP counts by model, then by counting mode and input signature, see `_get_cached_flops`
+_FLOPS_CACHE: "weakref.WeakKeyDictionary[Any, Tuple[Tuple, Dict[Hashable, Tuple[int, Dict[str, int]]]]]" = weakref.WeakKeyDictionary()
 
 def _init_flops_counters() -> None:
-    """Initializes the global FLOPs counters."""
-    global FLOPS_PER_BATCH_COUNTER
-    global FLOPS_PER_EPOCH_COUNTER
-    FLOPS_PER_BATCH_COUNTER = 0
-    FLOPS_PER_EPOCH_COUNTER = 0
+    """Resets the FLOPs counters of the active run."""
+    PROV4ML_DATA.flops_per_batch_counter = 0
+    PROV4ML_DATA.flops_per_epoch_counter = 0
+
+def _get_input_signature(x: Any) -> Hashable:
+    """Returns the shapes and dtypes of the tensors in `x`, which determine the FLOPs of a forward pass."""
+    if hasattr(x, "shape") and hasattr(x, "dtype"):
+        return (tuple(x.shape), str(x.dtype))
+    if isinstance(x, (list, tuple)):
+        return tuple(_get_input_signature(item) for item in x)
+    if isinstance(x, dict):
+        return tuple((key, _get_input_signature(value)) for key, value in sorted(x.items()))
+    return type(x).__name__
+
+def _get_model_signature(model: Any) -> Tuple:
+    """Returns the shapes of the parameters of the model, FLOP counts are invalidated when they change."""
+    if not hasattr(model, "parameters"): return ()
+    return tuple(tuple(p.shape) for p in model.parameters())
+
+def _linear_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    return output.numel() * module.in_features
+
+def _conv_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    return output.numel() * (module.in_channels // module.groups) * math.prod(module.kernel_size)
+
+def _conv_transpose_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    return args[0].numel() * (module.out_channels // module.groups) * math.prod(module.kernel_size)
+
+def _norm_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    # mean, variance and normalization, plus scale and shift if affine
+    affine = getattr(module, "affine", False) or getattr(module, "elementwise_affine", False)
+    return args[0].numel() * (5 if affine else 4)
+
+def _embedding_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    # a lookup, only bags reduce their embeddings
+    return output.numel() * args[0].shape[-1] if type(module).__name__ == "EmbeddingBag" and args[0].dim() > 1 else 0
+
+def _attention_flops(module: Any, args: Tuple, kwargs: Dict, output: Any) -> int:
+    query = args[0] if len(args) > 0 else kwargs["query"]
+    key = args[1] if len(args) > 1 else kwargs.get("key", query)
+    if query.dim() == 2:
+        batch, target_len, source_len = 1, query.shape[0], key.shape[0]
+    elif module.batch_first:
+        batch, target_len, source_len = query.shape[0], query.shape[1], key.shape[1]
+    else:
+        batch, target_len, source_len = query.shape[1], query.shape[0], key.shape[0]
+    embed_dim = module.embed_dim
+
+    projections = batch * (target_len * embed_dim * embed_dim + source_len * (module.kdim + module.vdim) * embed_dim)
+    attention = 2 * batch * target_len * source_len * embed_dim
+    output_projection = batch * target_len * embed_dim * embed_dim
+    return projections + attention + output_projection
+
+def _get_analytical_counters() -> Dict[Any, Any]:
+    """Returns the FLOP formula of each supported `torch.nn` module type, one multiply-add counted as one FLOP as in fvcore."""
+    from torch import nn
+    return {
+        nn.Linear: _linear_flops,
+        nn.Bilinear: lambda module, args, kwargs, output: output.numel() * module.in1_features * module.in2_features,
+        nn.Conv1d: _conv_flops, nn.Conv2d: _conv_flops, nn.Conv3d: _conv_flops,
+        nn.ConvTranspose1d: _conv_transpose_flops, nn.ConvTranspose2d: _conv_transpose_flops, nn.ConvTranspose3d: _conv_transpose_flops,
+        nn.BatchNorm1d: _norm_flops, nn.BatchNorm2d: _norm_flops, nn.BatchNorm3d: _norm_flops,
+        nn.LayerNorm: _norm_flops, nn.GroupNorm: _norm_flops,
+        nn.InstanceNorm1d: _norm_flops, nn.InstanceNorm2d: _norm_flops, nn.InstanceNorm3d: _norm_flops,
+        nn.Embedding: _embedding_flops, nn.EmbeddingBag: _embedding_flops,
+        nn.MultiheadAttention: _attention_flops,
+    }
+
+def _count_flops_analytical(model: Any, x: Any) -> Dict[str, int]:
+    """
+    Estimates the FLOPs of each supported layer of the model from tensor shapes, with forward hooks
+    and a single forward pass on `x`, without tracing.
+
+    The pass runs without gradients and in eval mode (the mode of every module is restored afterwards),
+    with the fused fast path of transformer layers disabled so that their submodules are visited.
+    Operations outside of the supported `torch.nn` modules are not counted.
+
+    Args:
+        model (Any): The model.
+        x (Any): The input of the model, passed as positional arguments if it is a tuple.
+
+    Returns:
+        Dict[str, int]: The FLOPs of each layer, by qualified module name.
+    """
+    import torch
+
+    counters = _get_analytical_counters()
+    flops_by_layer: Dict[str, int] = {}
+
+    def hook(name, counter):
+        def count(module, args, kwargs, output):
+            flops_by_layer[name] = flops_by_layer.get(name, 0) + int(counter(module, args, kwargs, output))
+        return count
+
+    handles = []
+    for name, module in model.named_modules():
+        counter = counters.get(type(module))
+        if counter is None:
+            counter = next((c for t, c in counters.items() if isinstance(module, t)), None)
+        if counter is not None:
+            handles.append(module.register_forward_hook(hook(name, counter), with_kwargs=True))
 
-def get_flops_per_epoch(model: Any, dataset: Any) -> int:
+    training = {module: module.training for module in model.modules()}
+    fastpath = torch.backends.mha.get_fastpath_enabled()
+    try:
+        model.eval()
+        torch.backends.mha.set_fastpath_enabled(False)
+        with torch.no_grad():
+            model(*x) if isinstance(x, tuple) else model(x)
+    finally:
+        torch.backends.mha.set_fastpath_enabled(fastpath)
+        for module, mode in training.items():
+            module.training = mode
+        for handle in handles:
+            handle.remove()
+
+    return flops_by_layer
+
+def _count_flops(model: Any, x: Any, mode: str = "fvcore") -> Tuple[int, Dict[str, int]]:
+    """Returns the total FLOPs of the model on `x` and, in analytical mode, the FLOPs of each layer."""
+    if mode == "fvcore":
+        from fvcore.nn import FlopCountAnalysis
+        return FlopCountAnalysis(model, x).total(), {}
+    elif mode == "analytical":
+        flops_by_layer = _count_flops_analytical(model, x)
+        return sum(flops_by_layer.values()), flops_by_layer
+    else:
+        raise ValueError(f"Unsupported FLOPs counting mode: {mode}")
+
+def _get_cached_flops(model: Any, x: Any, mode: str = "fvcore") -> Tuple[int, Dict[str, int]]:
+    """
+    Returns the FLOPs of a forward pass of the model on `x`, counting them only the first time
+    a given input signature (shapes and dtypes) is seen for the current model parameters.
+
+    Args:
+        model (Any): The model.
+        x (Any): The input of the model.
+        mode (str): The counting mode, one of `FLOPS_MODES`. Defaults to "fvcore".
+
+    Returns:
+        Tuple[int, Dict[str, int]]: The total number of FLOPs and, in analytical mode, the FLOPs of each layer.
+    """
+    try:
+        model_signature, flops_by_input = _FLOPS_CACHE.get(model, ((), None))
+    except TypeError: # models that cannot be weakly referenced are not cached
+        return _count_flops(model, x, mode)
+
+    current_signature = _get_model_signature(model)
+    if flops_by_input is None or model_signature != current_signature:
+        flops_by_input = {}
+        _FLOPS_CACHE[model] = (current_signature, flops_by_input)
+
+    input_signature = (mode, _get_input_signature(x))
+    if input_signature not in flops_by_input:
+        flops_by_input[input_signature] = _count_flops(model, x, mode)
+    return flops_by_input[input_signature]
+
+def get_flops_per_epoch(model: Any, dataset: Any, mode: str = "fvcore") -> int:
     """
-    Calculates and returns the total FLOPs per epoch for the given model and dataset.
+    Calculates and returns the total FLOPs per epoch of the active run, for the given model and dataset.
+
+    The cost of a single sample is computed once per model and sample shape, and multiplied by the size of the dataset.
 
     Args:
         model (Any): The model for which FLOPs per epoch are to be calculated.
         dataset (Any): The dataset used for training the model.
+        mode (str): "fvcore" to trace the model, or "analytical" to estimate FLOPs with forward hooks. Defaults to "fvcore".
 
     Returns:
         int: The total FLOPs per epoch.
     """
-    global FLOPS_PER_EPOCH_COUNTER
-
     x, _ = dataset[0]
-    flops = FlopCountAnalysis(model, x)
-    total_flops = flops.total() * len(dataset)
-    FLOPS_PER_EPOCH_COUNTER += total_flops
-    return FLOPS_PER_EPOCH_COUNTER
+    total_flops = _get_cached_flops(model, x, mode)[0] * len(dataset)
+    PROV4ML_DATA.flops_per_epoch_counter += total_flops
+    return PROV4ML_DATA.flops_per_epoch_counter
 
-def get_flops_per_batch(model: Any, batch: Any) -> int:
+def get_flops_per_batch(model: Any, batch: Any, mode: str = "fvcore") -> int:
     """
-    Calculates and returns the total FLOPs per batch for the given model and batch of data.
+    Calculates and returns the total FLOPs per batch of the active run, for the given model and batch of data.
+
+    The model is only traced the first time a batch shape is seen, later batches of the same
+    shape and dtype update the counter from the cache.
 
     Args:
         model (Any): The model for which FLOPs per batch are to be calculated.
         batch (Any): A batch of data used for inference with the model.
+        mode (str): "fvcore" to trace the model, or "analytical" to estimate FLOPs with forward hooks. Defaults to "fvcore".
 
     Returns:
         int: The total FLOPs per batch.
     """
-    global FLOPS_PER_BATCH_COUNTER
     x, _ = batch
-    flops = FlopCountAnalysis(model, x)
-    FLOPS_PER_BATCH_COUNTER += flops.total()
-    return FLOPS_PER_BATCH_COUNTER
\ No newline at end of file
+    PROV4ML_DATA.flops_per_batch_counter += _get_cached_flops(model, x, mode)[0]
+    return PROV4ML_DATA.flops_per_batch_counter
+
+def get_flops_per_layer(model: Any, batch: Any) -> Dict[str, int]:
+    """
+    Estimates the FLOPs of each supported layer of the model for the given batch of data, with forward hooks.
+
+    Args:
+        model (Any): The model for which FLOPs per layer are to be calculated.
+        batch (Any): A batch of data used for inference with the model.
+
+    Returns:
+        Dict[str, int]: The FLOPs of each layer, by qualified module name.
+    """
+    x, _ = batch
+    return _get_cached_flops(model, x, "analytical")[1]
@@ -1,9 +1,16 @@
 
 import os
-import torch
+import sys
+import json
+from contextlib import contextmanager
 from typing import Optional
 import time
 
+try:
+    import fcntl
+except ImportError: # not available on Windows, callers rely on atomic file system operations alone
+    fcntl = None
+
 def prov4ml_experiment_matches(
         experiment_name : str,
         exp_folder : str
@@ -26,6 +33,153 @@ def prov4ml_experiment_matches(
     exp_folder = "_".join(exp_folder.split("_")[:-1])
     return experiment_name == exp_folder
 
+@contextmanager
+def file_lock(lock_path: str):
+    """
+    Context manager holding an exclusive `flock` on `lock_path` (created if missing).
+
+    On platforms or file systems without `flock` support the lock is skipped, 
+    so callers must still rely on atomic file system operations for correctness.
+
+    Parameters:
+    -----------
+    lock_path : str
+        The path of the lock file.
+    """
+    with open(lock_path, "a") as lock_file:
+        locked = False
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                locked = True
+            except OSError: # e.g. Lustre mounted without flock support
+                pass
+        try:
+            yield
+        finally:
+            if locked:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def get_job_id() -> Optional[str]:
+    """
+    Returns an identifier shared by all the processes of the current distributed job, if any.
+
+    Returns:
+    --------
+    Optional[str]
+        The SLURM job and step id, the torchrun run id or the PMIx namespace, otherwise None.
+    """
+    if "SLURM_JOB_ID" in os.environ:
+        return f"slurm{os.environ['SLURM_JOB_ID']}.{os.getenv('SLURM_STEP_ID', '0')}"
+    if os.getenv("TORCHELASTIC_RUN_ID", "none") != "none":
+        return f"torchrun{os.environ['TORCHELASTIC_RUN_ID']}"
+    if "PMIX_NAMESPACE" in os.environ:
+        return f"pmix{os.environ['PMIX_NAMESPACE']}"
+    return None
+
+# Seconds after which the claim of a job on a run id is discarded, even if some of its ranks never joined
+RUN_CLAIM_TIMEOUT = 3600
+
+def _count_experiment_runs(prov_save_path: str, experiment_name: str) -> int:
+    """Counts the `<experiment_name>_<n>` directories in `prov_save_path`."""
+    with os.scandir(prov_save_path) as entries:
+        return len([e for e in entries if e.is_dir() and prov4ml_experiment_matches(experiment_name, e.name)])
+
+def allocate_run_id(
+        prov_save_path: str,
+        experiment_name: str,
+        rank: Optional[int] = None,
+        job_id: Optional[str] = None,
+        num_ranks: Optional[int] = None
+    ) -> int:
+    """
+    Atomically allocates the run id of an experiment and creates its directory `<experiment_name>_<run_id>`.
+
+    The next free id is kept in a counter file under `<prov_save_path>/.prov4ml`, updated under `flock`, 
+    so starting a run does not list the save directory. Directories are created with `os.mkdir`, 
+    retrying on the next id if the directory already exists, which keeps allocation correct across 
+    nodes even where `flock` is unavailable. 
+    Ranks of the same job (see `get_job_id`) share the run id allocated by the first of them; 
+    a rank claiming a run id twice in the same job starts a new run. The claim is removed once 
+    `num_ranks` ranks have joined it, and discarded after `RUN_CLAIM_TIMEOUT` seconds otherwise.
+
+    Without a job id, `num_ranks` ranks share the run id allocated by rank 0 and broadcast through 
+    torch.distributed if it is initialized, otherwise through a claim keyed on `num_ranks`.
+
+    Parameters:
+    -----------
+    prov_save_path : str
+        The directory where experiments are saved.
+    experiment_name : str
+        The name of the experiment.
+    rank : Optional[int], optional
+        The global rank of the current process. Defaults to None.
+    job_id : Optional[str], optional
+        The identifier of the distributed job. Defaults to None.
+    num_ranks : Optional[int], optional
+        The number of ranks expected to share the run id, if known. Defaults to None.
+
+    Returns:
+    --------
+    int
+        The allocated run id.
+    """
+    state_dir = os.path.join(prov_save_path, ".prov4ml")
+    os.makedirs(state_dir, exist_ok=True)
+    counter_file = os.path.join(state_dir, f"{experiment_name}.run_id")
+
+    if not job_id and num_ranks is not None and num_ranks > 1:
+        if _torch_distributed_is_initialized():
+            return _broadcast_run_id(prov_save_path, experiment_name, rank)
+        job_id = f"world{num_ranks}"
+
+    shared = job_id is not None and (num_ranks is None or num_ranks > 1)
+    claim_file = os.path.join(state_dir, f"{experiment_name}.{job_id}.job") if shared else None
+
+    with file_lock(counter_file + ".lock"):
+        if shared and os.path.exists(claim_file):
+            with open(claim_file, "r") as f:
+                claim = json.load(f)
+            expired = time.time() - claim.get("created", 0) > RUN_CLAIM_TIMEOUT
+            if not expired and rank not in claim["ranks"]:
+                claim["ranks"].append(rank)
+                if num_ranks is not None and len(claim["ranks"]) >= num_ranks:
+                    os.remove(claim_file)
+                else:
+                    with open(claim_file, "w") as f:
+                        json.dump(claim, f)
+                return claim["run_id"]
+            os.remove(claim_file)
+
+        if os.path.exists(counter_file):
+            with open(counter_file, "r") as f:
+                run_id = int(f.read().strip() or 0)
+        else:
+            # one-time scan, for save directories created before the counter existed
+            run_id = _count_experiment_runs(prov_save_path, experiment_name)
+
+        while True:
+            try:
+                os.mkdir(os.path.join(prov_save_path, f"{experiment_name}_{run_id}"))
+                break
+            except FileExistsError:
+                run_id += 1
+
+        with open(counter_file, "w") as f:
+            f.write(str(run_id + 1))
+        if shared:
+            with open(claim_file, "w") as f:
+                json.dump({"run_id": run_id, "ranks": [rank], "created": time.time()}, f)
+
+    return run_id
+
+def _broadcast_run_id(prov_save_path: str, experiment_name: str, rank: Optional[int]) -> int:
+    """Allocates the run id on rank 0 and broadcasts it to the other ranks of torch.distributed."""
+    distributed = sys.modules["torch"].distributed
+    run_id = [allocate_run_id(prov_save_path, experiment_name, rank, num_ranks=1) if distributed.get_rank() == 0 else None]
+    distributed.broadcast_object_list(run_id, src=0)
+    return run_id[0]
+
 def get_current_time_millis() -> int:
     """
     Get the current time in milliseconds.
@@ -37,6 +191,11 @@ def get_current_time_millis() -> int:
     """
     return int(round(time.time() * 1000))
 
+def _torch_distributed_is_initialized() -> bool:
+    """Checks if torch.distributed is initialized, without importing torch if the application has not."""
+    torch = sys.modules.get("torch")
+    return torch is not None and torch.distributed.is_available() and torch.distributed.is_initialized()
+
 def get_global_rank() -> Optional[int]:
     """
     Retrieves the global rank of the current process in a distributed computing environment.
@@ -66,8 +225,8 @@ def get_global_rank() -> Optional[int]:
     None
     """
     # if on torch.distributed, return the rank
-    if torch.distributed.is_available() and torch.distributed.is_initialized():
-        return torch.distributed.get_rank()
+    if _torch_distributed_is_initialized():
+        return sys.modules["torch"].distributed.get_rank()
     
     # if on slurm, return the local rank
     if "SLURM_PROCID" in os.environ:
@@ -76,6 +235,22 @@ def get_global_rank() -> Optional[int]:
     return 0
 
 
+def get_world_size() -> Optional[int]:
+    """
+    Retrieves the number of processes of the current distributed job, if known.
+
+    Returns:
+    --------
+    Optional[int]
+        The world size of torch.distributed, or the number of tasks of the torchrun or SLURM job, otherwise `None`.
+    """
+    if _torch_distributed_is_initialized():
+        return sys.modules["torch"].distributed.get_world_size()
+    for variable in ("WORLD_SIZE", "SLURM_NTASKS"):
+        if variable in os.environ:
+            return int(os.environ[variable])
+    return None
+
 def get_runtime_type(): 
     """
     Get the runtime type.
@@ -90,6 +265,6 @@ def get_runtime_type():
     >>> get_runtime_type()
     "single_core"
     """
-    if torch.distributed.is_available() and torch.distributed.is_initialized():
+    if _torch_distributed_is_initialized():
         return "distributed"
     return "single_core"
\ No newline at end of file
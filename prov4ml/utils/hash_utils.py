@@ -0,0 +1,136 @@
+import os
+import mmap
+import hashlib
+import threading
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from prov4ml.configs import SILENT
+
+HASH_ALGORITHM = "blake2b"
+HASH_CHUNK_SIZE = 8 << 20
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    Returns the BLAKE2b digest of a file, reading it through a memory map in fixed-size chunks.
+
+    hashlib releases the GIL while hashing each chunk, so several files can be hashed in parallel threads.
+
+    Args:
+        path (str): The path of the file.
+        chunk_size (int): The number of bytes hashed at a time. Defaults to 8 MiB.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    digest.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+class ArtifactHasher:
+    """
+    Computes the digest and size of logged artifacts on a pool of background threads.
+
+    Digests are cached by (device, inode, modification time, size), so a file that did not change
+    since it was last hashed, e.g. an artifact logged again or shared by several entries, is never read twice.
+    Directories are hashed from the relative paths and digests of the files they contain.
+
+    Attributes:
+        workers (int): The number of hashing threads.
+    """
+    def __init__(self, workers: int = 2) -> None:
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prov4ml-artifact-hasher")
+        self._futures: List[Future] = []
+        self._cache: Dict[Tuple[int, int, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _hash_path(self, path: str) -> Tuple[str, int]:
+        if os.path.isdir(path):
+            digest, size = hashlib.blake2b(), 0
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    file_digest, file_size = self._hash_path(file_path)
+                    digest.update(os.path.relpath(file_path, path).encode())
+                    digest.update(bytes.fromhex(file_digest))
+                    size += file_size
+            return digest.hexdigest(), size
+
+        stat = os.stat(path)
+        key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._cache.get(key)
+        if digest is None:
+            digest = hash_file(path)
+            with self._lock:
+                self._cache[key] = digest
+        return digest, stat.st_size
+
+    def _hash_artifact(self, artifact: Any) -> None:
+        try:
+            if not os.path.exists(artifact.path): return
+            artifact.digest, artifact.size = self._hash_path(artifact.path)
+        except Exception as e:
+            if not SILENT:
+                warnings.warn(f"Could not hash artifact {artifact.path}: {e}")
+
+    def submit(self, artifact: Any) -> Future:
+        """
+        Schedules the hashing of an artifact, which sets its `digest` and `size` once done.
+
+        Args:
+            artifact (ArtifactInfo): The artifact, its path must be a file or a directory.
+
+        Returns:
+            Future: Completed when the artifact is hashed.
+        """
+        future = self._executor.submit(self._hash_artifact, artifact)
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Blocks until every submitted artifact is hashed."""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Waits for the pending artifacts and stops the hashing threads."""
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+HASHER: Optional[ArtifactHasher] = None
+
+def _hasher_init(workers: int = 2) -> None:
+    """Initializes the background artifact hasher, an existing hasher and its digest cache are kept across runs."""
+    global HASHER
+    if HASHER is not None and HASHER.workers == workers: return
+    _hasher_stop()
+    HASHER = ArtifactHasher(workers)
+
+def _hasher_stop() -> None:
+    """Waits for the pending artifacts and stops the background artifact hasher, if running."""
+    global HASHER
+    if HASHER is not None:
+        HASHER.close()
+        HASHER = None
+
+def wait_for_hashes() -> None:
+    """Blocks until every artifact submitted to the background hasher is hashed."""
+    if HASHER is not None:
+        HASHER.wait()
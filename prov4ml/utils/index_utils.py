@@ -0,0 +1,121 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from prov4ml.utils.funcs import file_lock
+
+INDEX_FILENAME = "prov4ml_index.sqlite"
+
+_COLUMNS = [
+    "experiment_name", "experiment_dir", "run_id", "global_rank", "user_namespace", "end_time",
+    "parameters", "final_metrics", "metrics", "files",
+]
+_JSON_COLUMNS = {"parameters", "final_metrics", "metrics", "files"}
+
+class ExperimentIndex:
+    """
+    An experiment-level index with one summary row per run and rank, stored as SQLite.
+
+    Rows are appended by `end_run`, so collections and cross-run queries are lookups
+    instead of rescans of every provenance file. Writers from concurrent ranks are
+    serialized with an exclusive `flock` on a sidecar lock file, since SQLite's own
+    locking is unreliable on network and parallel file systems.
+
+    Attributes:
+    -----------
+    path : str
+        The path of the SQLite index file.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @contextmanager
+    def _locked_connection(self):
+        with file_lock(self.path + ".lock"):
+            connection = sqlite3.connect(self.path, timeout=60)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                connection.close()
+
+    def add_run(self, summary: Dict[str, Any]) -> None:
+        """
+        Adds or replaces the summary row of a run.
+
+        Parameters:
+        -----------
+        summary : Dict[str, Any]
+            The run summary, with a key for each index column (see `Prov4MLData.get_run_summary`).
+
+        Returns:
+        --------
+        None
+        """
+        row = [
+            json.dumps(summary.get(column), default=str) if column in _JSON_COLUMNS else summary.get(column)
+            for column in _COLUMNS
+        ]
+        with self._locked_connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "experiment_name TEXT, experiment_dir TEXT, run_id INTEGER, global_rank INTEGER, user_namespace TEXT, end_time REAL, "
+                "parameters TEXT, final_metrics TEXT, metrics TEXT, files TEXT)"
+            )
+            # one row per run and rank, global_rank is NULL for single-process runs and NULLs never conflict in a key
+            connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS runs_rank ON runs (experiment_dir, COALESCE(global_rank, -1))"
+            )
+            connection.execute(
+                f"INSERT OR REPLACE INTO runs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", row
+            )
+
+    def get_runs(
+            self,
+            experiment_name: Optional[str] = None,
+            experiment_dir: Optional[str] = None
+        ) -> List[Dict[str, Any]]:
+        """
+        Returns the summary rows of the indexed runs.
+
+        Parameters:
+        -----------
+        experiment_name : Optional[str], optional
+            Only return runs of this experiment. Defaults to None.
+        experiment_dir : Optional[str], optional
+            Only return the ranks of the run saved in this directory. Defaults to None.
+
+        Returns:
+        --------
+        List[Dict[str, Any]]
+            The summary rows, ordered by run id and rank.
+        """
+        if not os.path.exists(self.path): return []
+
+        conditions, values = [], []
+        if experiment_name is not None:
+            conditions.append("experiment_name = ?")
+            values.append(experiment_name)
+        if experiment_dir is not None:
+            conditions.append("experiment_dir = ?")
+            values.append(os.path.abspath(experiment_dir))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM runs{where} ORDER BY run_id, global_rank", values
+            ).fetchall()
+        finally:
+            connection.close()
+
+        return [
+            {column: json.loads(value) if column in _JSON_COLUMNS else value for column, value in zip(_COLUMNS, row)}
+            for row in rows
+        ]
+
+def get_index_path(prov_save_path: str) -> str:
+    """Returns the path of the experiment index stored in `prov_save_path`."""
+    return os.path.join(prov_save_path, INDEX_FILENAME)
@@ -0,0 +1,629 @@
+import os
+import json
+import mmap
+import zlib
+import base64
+import pickle
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MANIFEST_EXTENSION = ".manifest.json"
+MANIFEST_FORMAT = "prov4ml-dedup-1"
+OBJECTS_DIR = "objects"
+
+DELTA_EXTENSION = ".delta"
+DELTA_FORMAT = "prov4ml-delta-1"
+DELTA_MAGIC = b"PROV4MLD"
+
+SAFETENSORS_EXTENSION = ".safetensors"
+SAFETENSORS_ALIGNMENT = 8
+# safetensors dtype codes, by torch dtype name
+SAFETENSORS_DTYPES = {
+    "torch.bool": "BOOL", "torch.uint8": "U8", "torch.int8": "I8", "torch.int16": "I16", "torch.uint16": "U16",
+    "torch.int32": "I32", "torch.uint32": "U32", "torch.int64": "I64", "torch.uint64": "U64",
+    "torch.float16": "F16", "torch.bfloat16": "BF16", "torch.float32": "F32", "torch.float64": "F64",
+    "torch.float8_e4m3fn": "F8_E4M3", "torch.float8_e5m2": "F8_E5M2",
+}
+_PICKLED_METADATA_PREFIX = "prov4ml.pickle."
+
+# file extension of the model versions saved with each storage
+MODEL_STORAGES = {
+    "torch": ".pth",
+    "dedup": MANIFEST_EXTENSION,
+    "delta": DELTA_EXTENSION,
+    "safetensors": SAFETENSORS_EXTENSION,
+}
+
+def _tensor_bytes(tensor: Any) -> memoryview:
+    """Returns the raw bytes of a CPU tensor, without copying it if it is contiguous."""
+    import torch
+    return memoryview(tensor.detach().contiguous().reshape(-1).view(torch.uint8).numpy())
+
+def _dtype_from_name(name: str) -> Any:
+    import torch
+    return getattr(torch, name.replace("torch.", "", 1))
+
+def _tensor_from_bytes(data: bytes, dtype: str, shape: List[int]) -> Any:
+    import torch
+    if not data:
+        return torch.empty(shape, dtype=_dtype_from_name(dtype))
+    return torch.frombuffer(bytearray(data), dtype=_dtype_from_name(dtype)).reshape(shape)
+
+def _tensor_from_array(data: np.ndarray, dtype: str, shape: List[int]) -> Any:
+    """Returns a tensor with a copy of the raw bytes of `data`."""
+    import torch
+    return torch.from_numpy(data.copy()).view(_dtype_from_name(dtype)).reshape(shape)
+
+class ContentAddressedStore:
+    """
+    A directory of immutable blobs, each stored once under the BLAKE2b digest of its content.
+
+    Attributes:
+        root (str): The directory of the blobs, split in subdirectories by the first two hex digits of the digest.
+    """
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: Any) -> Tuple[str, int]:
+        """
+        Stores a blob, unless a blob with the same content is already stored.
+
+        Args:
+            data (Any): The content of the blob, any object supporting the buffer protocol.
+
+        Returns:
+            Tuple[str, int]: The digest of the blob and the number of bytes written, 0 if it was already stored.
+        """
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, memoryview(data).nbytes
+
+    def get(self, digest: str) -> bytes:
+        with open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+def save_deduplicated(state: Dict[str, Any], path: str, previous_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Saves a state dict as a manifest, with each tensor stored as a content-addressed blob.
+
+    Tensors identical to a tensor of any previous version (e.g. frozen layers) are not written again,
+    so a version only costs the tensors that changed and a small JSON manifest. The blobs are shared by
+    all the models saved in the same artifacts directory, in the `objects` directory next to the model directories.
+
+    Args:
+        state (Dict[str, Any]): The state dict, with tensors on any device. Non-tensor entries are pickled.
+        path (str): The path of the manifest file.
+        previous_path (Optional[str]): The manifest of the previous version of the model, to find the changed tensors. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: The names of the tensors which changed since the previous version, the number
+            of bytes written and the previous version.
+    """
+    import torch
+
+    objects_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(path))), OBJECTS_DIR)
+    store = ContentAddressedStore(objects_dir)
+
+    entries, written_bytes = {}, 0
+    for name, value in state.items():
+        if isinstance(value, torch.Tensor):
+            # device tensors are copied to host memory before hashing their bytes
+            value = value.detach().cpu()
+            digest, written = store.put(_tensor_bytes(value))
+            entries[name] = {"hash": digest, "dtype": str(value.dtype), "shape": list(value.shape)}
+        else:
+            digest, written = store.put(pickle.dumps(value))
+            entries[name] = {"hash": digest, "pickle": True}
+        written_bytes += written
+
+    previous_entries = {}
+    if previous_path is not None and os.path.exists(previous_path):
+        with open(previous_path, "r") as f:
+            previous_entries = json.load(f)["entries"]
+    else:
+        previous_path = None
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "objects": os.path.relpath(objects_dir, os.path.dirname(os.path.abspath(path))),
+        "entries": entries,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+    changed = [name for name, entry in entries.items() if previous_entries.get(name, {}).get("hash") != entry["hash"]]
+    return {
+        "changed_tensors": changed,
+        "written_bytes": written_bytes,
+        "previous_version": previous_path,
+    }
+
+def _compress(data: Any, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 1)
+    elif codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    elif codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+def _default_codec() -> str:
+    """Returns "zstd" if the zstandard package is installed, "zlib" otherwise."""
+    try:
+        import zstandard
+        return "zstd"
+    except ImportError:
+        return "zlib"
+
+def _byteshuffle(data: np.ndarray, itemsize: int) -> np.ndarray:
+    """Groups the i-th byte of every element together, so that the slowly varying sign and exponent bytes compress well."""
+    if itemsize == 1 or data.size % itemsize: return data
+    return np.ascontiguousarray(data.reshape(-1, itemsize).T).reshape(-1)
+
+def _byteunshuffle(data: np.ndarray, itemsize: int) -> np.ndarray:
+    if itemsize == 1 or data.size % itemsize: return data
+    # one strided copy per byte plane is several times faster than a transposed copy
+    planes = data.reshape(itemsize, -1)
+    unshuffled = np.empty((planes.shape[1], itemsize), dtype=np.uint8)
+    for i in range(itemsize):
+        unshuffled[:, i] = planes[i]
+    return unshuffled.reshape(-1)
+
+# series of delta-compressed versions, by model directory: the path and version of their last keyframe
+_DELTA_KEYFRAMES: Dict[str, Tuple[str, int]] = {}
+# raw bytes of the tensors of the keyframes last written or read, by path, least recently used first
+_KEYFRAME_CACHE: "OrderedDict[str, Dict[str, np.ndarray]]" = OrderedDict()
+# number of keyframes kept in memory, one per model series being saved or read at the same time
+KEYFRAME_CACHE_SIZE = 4
+_KEYFRAME_CACHE_LOCK = threading.Lock()
+
+def _get_cached_keyframe(path: str) -> Optional[Dict[str, np.ndarray]]:
+    path = os.path.abspath(path)
+    with _KEYFRAME_CACHE_LOCK:
+        raw = _KEYFRAME_CACHE.get(path)
+        if raw is not None:
+            _KEYFRAME_CACHE.move_to_end(path)
+        return raw
+
+def _cache_keyframe(path: str, raw: Dict[str, np.ndarray]) -> None:
+    """Caches the raw bytes of a keyframe, evicting the least recently used keyframe beyond `KEYFRAME_CACHE_SIZE`."""
+    path = os.path.abspath(path)
+    with _KEYFRAME_CACHE_LOCK:
+        _KEYFRAME_CACHE[path] = raw
+        _KEYFRAME_CACHE.move_to_end(path)
+        while len(_KEYFRAME_CACHE) > KEYFRAME_CACHE_SIZE:
+            _KEYFRAME_CACHE.popitem(last=False)
+
+def _delta_series_reset(directory: Optional[str] = None) -> None:
+    """Forgets the keyframes of the delta-compressed series and frees the cached keyframe, only the ones saved in `directory` if given."""
+    if directory is None:
+        with _KEYFRAME_CACHE_LOCK:
+            _DELTA_KEYFRAMES.clear()
+            _KEYFRAME_CACHE.clear()
+        return
+
+    directory = os.path.join(os.path.abspath(directory), "")
+    with _KEYFRAME_CACHE_LOCK:
+        for cache in (_DELTA_KEYFRAMES, _KEYFRAME_CACHE):
+            for path in [path for path in cache if os.path.abspath(path).startswith(directory)]:
+                cache.pop(path, None)
+
+def get_delta_keyframe(model_path: str, version: int, keyframe_interval: int) -> Optional[str]:
+    """
+    Returns the keyframe the given delta-compressed model version is stored against, or None if it is a keyframe itself.
+
+    A new keyframe is started on the first delta-compressed version of a model in the run, and then
+    every `keyframe_interval` versions. Must be called in the order versions are saved.
+
+    Args:
+        model_path (str): The path of the model version.
+        version (int): The version number.
+        keyframe_interval (int): The number of versions between two keyframes.
+
+    Returns:
+        Optional[str]: The path of the keyframe, or None.
+    """
+    model_dir = os.path.dirname(model_path)
+    keyframe = _DELTA_KEYFRAMES.get(model_dir)
+    if keyframe is None or version - keyframe[1] >= keyframe_interval or version < keyframe[1]:
+        _DELTA_KEYFRAMES[model_dir] = (model_path, version)
+        return None
+    return keyframe[0]
+
+def _read_delta_file(path: str) -> Tuple[Dict[str, Any], int]:
+    """Reads the header of a delta-compressed model version, and returns it with the offset of its payload."""
+    with open(path, "rb") as f:
+        magic, header_length = f.read(len(DELTA_MAGIC)), struct.unpack("<Q", f.read(8))[0]
+        if magic != DELTA_MAGIC:
+            raise ValueError(f"Not a delta-compressed model version: {path}")
+        header = json.loads(f.read(header_length))
+    if header.get("format") != DELTA_FORMAT:
+        raise ValueError(f"Unsupported delta model format: {header.get('format')}")
+    return header, len(DELTA_MAGIC) + 8 + header_length
+
+def _read_delta_raw(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Reads a delta-compressed model version, and returns its header and the raw bytes of each entry, XORed back with the keyframe."""
+    header, payload_offset = _read_delta_file(path)
+    keyframe_raw = None
+    if header["keyframe"] is not None:
+        keyframe_path = os.path.join(os.path.dirname(os.path.abspath(path)), header["keyframe"])
+        keyframe_raw = _get_cached_keyframe(keyframe_path)
+        if keyframe_raw is None:
+            keyframe_raw = _read_delta_raw(keyframe_path)[1]
+
+    raw = {}
+    with open(path, "rb") as f:
+        for name, entry in header["entries"].items():
+            f.seek(payload_offset + entry["offset"])
+            data = np.frombuffer(_decompress(f.read(entry["length"]), header["codec"]), dtype=np.uint8)
+            data = _byteunshuffle(data, entry.get("itemsize", 1))
+            if entry.get("delta"):
+                data = np.bitwise_xor(data, keyframe_raw[name])
+            raw[name] = data
+
+    if header["keyframe"] is None:
+        _cache_keyframe(path, raw)
+    return header, raw
+
+def save_delta(
+        state: Dict[str, Any], 
+        path: str, 
+        keyframe_path: Optional[str] = None, 
+        codec: Optional[str] = None
+    ) -> Dict[str, Any]:
+    """
+    Saves a state dict as a compressed difference from a keyframe version, or as a keyframe.
+
+    The raw bytes of each tensor are XORed with those of the same tensor in the keyframe: bits that did not change
+    become zeros, which after a byte shuffle (the same byte of every element stored contiguously) compress to almost
+    nothing for frozen tensors and far better than the original values for slowly changing ones. Keyframes are stored
+    byte-shuffled and compressed. The compression is lossless, any version is reconstructed exactly from itself and
+    its keyframe (see `load_model_version`).
+
+    The raw bytes of the last `KEYFRAME_CACHE_SIZE` keyframes are kept in memory, so that the deltas of several
+    models, or of several runs, do not read their keyframe back from disk.
+
+    Args:
+        state (Dict[str, Any]): The state dict, with tensors on any device. Non-tensor entries are pickled.
+        path (str): The path of the model version file.
+        keyframe_path (Optional[str]): The keyframe version, in the same directory, or None to save a keyframe. Defaults to None.
+        codec (Optional[str]): "zlib" or "zstd". Defaults to "zstd" if the zstandard package is installed, "zlib" otherwise.
+
+    Returns:
+        Dict[str, Any]: The keyframe of the version and the number of bytes written.
+    """
+    import torch
+
+    codec = codec or _default_codec()
+    keyframe_raw = None
+    if keyframe_path is not None:
+        keyframe_raw = _get_cached_keyframe(keyframe_path)
+        if keyframe_raw is None:
+            keyframe_raw = _read_delta_raw(keyframe_path)[1]
+
+    entries, payloads, raw, offset = {}, [], {}, 0
+    for name, value in state.items():
+        if isinstance(value, torch.Tensor):
+            value = value.detach().cpu()
+            data = np.frombuffer(_tensor_bytes(value), dtype=np.uint8)
+            entry = {"dtype": str(value.dtype), "shape": list(value.shape), "itemsize": value.element_size()}
+        else:
+            data = np.frombuffer(pickle.dumps(value), dtype=np.uint8)
+            entry = {"pickle": True}
+        if keyframe_path is None:
+            # synchronous saves pass the live tensors, the cached keyframe must not change with them
+            raw[name] = data.copy()
+
+        if keyframe_raw is not None and name in keyframe_raw and keyframe_raw[name].size == data.size:
+            data = np.bitwise_xor(data, keyframe_raw[name])
+            entry["delta"] = True
+        payload = _compress(_byteshuffle(data, entry.get("itemsize", 1)), codec)
+
+        entry.update({"offset": offset, "length": len(payload)})
+        entries[name] = entry
+        payloads.append(payload)
+        offset += len(payload)
+
+    header = json.dumps({
+        "format": DELTA_FORMAT,
+        "codec": codec,
+        "keyframe": os.path.basename(keyframe_path) if keyframe_path is not None else None,
+        "entries": entries,
+    }).encode()
+    with open(path, "wb") as f:
+        f.write(DELTA_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for payload in payloads:
+            f.write(payload)
+
+    if keyframe_path is None:
+        # the writer saves to a temporary path renamed afterwards, cache the keyframe under its final path
+        _cache_keyframe(path[:-len(".tmp")] if path.endswith(".tmp") else path, raw)
+
+    return {
+        "keyframe": keyframe_path,
+        "written_bytes": len(DELTA_MAGIC) + 8 + len(header) + offset,
+    }
+
+def save_safetensors(state: Dict[str, Any], path: str) -> None:
+    """
+    Saves a state dict in the safetensors format: a JSON header followed by the raw bytes of every tensor.
+
+    Tensors are sorted by decreasing element size and the header is padded to a multiple of 8 bytes,
+    so every tensor is aligned to its element size in the file, and can be memory mapped as is
+    (see `ModelVersionReader`). Non-tensor entries are pickled into the header metadata.
+
+    Args:
+        state (Dict[str, Any]): The state dict, with CPU tensors.
+        path (str): The path of the file.
+
+    Returns:
+        None
+    """
+    import torch
+
+    tensors = {name: value for name, value in state.items() if isinstance(value, torch.Tensor)}
+    metadata = {
+        f"{_PICKLED_METADATA_PREFIX}{name}": base64.b64encode(pickle.dumps(value)).decode()
+        for name, value in state.items() if name not in tensors
+    }
+
+    header, order, offset = {}, sorted(tensors, key=lambda name: (-tensors[name].element_size(), name)), 0
+    for name in order:
+        tensor = tensors[name]
+        if str(tensor.dtype) not in SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported dtype for safetensors storage: {tensor.dtype}")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": SAFETENSORS_DTYPES[str(tensor.dtype)], "shape": list(tensor.shape), "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    if metadata:
+        header["__metadata__"] = metadata
+
+    header = json.dumps(header, separators=(",", ":")).encode()
+    header += b" " * (-(8 + len(header)) % SAFETENSORS_ALIGNMENT)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name in order:
+            f.write(_tensor_bytes(tensors[name]))
+
+class ModelVersionReader:
+    """
+    Lazy, read-only access to the tensors of a model version saved by `save_model_version`, with any storage.
+
+    Tensors are only read when requested: safetensors files and deduplicated blobs are memory mapped,
+    and their tensors are views of the mapped pages (copy-on-write, changes are never written back),
+    `.pth` files are loaded with `torch.load(mmap=True)`. Delta-compressed versions are decompressed
+    when opened, as their bytes are not stored as is.
+
+    Comparing many versions of a large model therefore only keeps the pages actually read in memory,
+    and the operating system can drop them again under memory pressure.
+
+    Attributes:
+        path (str): The path of the model version.
+    """
+    def __init__(self, path: str, map_location: Any = None) -> None:
+        self.path = path
+        self.map_location = map_location
+        # memory maps by file path, each file is mapped once
+        self._maps: Dict[str, Optional[mmap.mmap]] = {}
+        self._entries: Dict[str, Any] = {}
+        self._manifest_entries: Optional[Dict[str, Any]] = None
+        self._state: Optional[Dict[str, Any]] = None
+
+        if path.endswith(SAFETENSORS_EXTENSION):
+            self._open_safetensors()
+        elif path.endswith(MANIFEST_EXTENSION):
+            self._open_manifest()
+        elif path.endswith(DELTA_EXTENSION):
+            self._state = load_model_version(path, map_location)
+        else:
+            import torch
+            self._state = torch.load(path, map_location=map_location, mmap=True)
+
+    def _map(self, path: str) -> Optional[mmap.mmap]:
+        if path in self._maps:
+            return self._maps[path]
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) if os.fstat(f.fileno()).st_size else None
+        self._maps[path] = mapped
+        return mapped
+
+    def _open_safetensors(self) -> None:
+        with open(self.path, "rb") as f:
+            header_length = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_length))
+        mapped = self._map(self.path)
+        codes = {code: name for name, code in SAFETENSORS_DTYPES.items()}
+
+        metadata = header.pop("__metadata__", {})
+        for name, entry in header.items():
+            start, end = entry["data_offsets"]
+            self._entries[name] = (mapped, 8 + header_length + start, end - start, codes[entry["dtype"]], entry["shape"])
+        for key, value in metadata.items():
+            if key.startswith(_PICKLED_METADATA_PREFIX):
+                self._entries[key[len(_PICKLED_METADATA_PREFIX):]] = pickle.loads(base64.b64decode(value))
+
+    def _open_manifest(self) -> None:
+        with open(self.path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise ValueError(f"Unsupported model manifest format: {manifest.get('format')}")
+        self._store = ContentAddressedStore(os.path.join(os.path.dirname(os.path.abspath(self.path)), manifest["objects"]))
+        self._manifest_entries = manifest["entries"]
+
+    def keys(self) -> List[str]:
+        """Returns the names of the entries of the state dict."""
+        if self._state is not None:
+            return list(self._state.keys())
+        if self._manifest_entries is not None:
+            return list(self._manifest_entries.keys())
+        return list(self._entries.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get_tensor(self, name: str) -> Any:
+        """
+        Returns an entry of the state dict, reading only its bytes.
+
+        Args:
+            name (str): The name of the entry.
+
+        Returns:
+            Any: The tensor, or the value of a non-tensor entry.
+        """
+        import torch
+
+        if self._state is not None:
+            return self._state[name]
+
+        if self._manifest_entries is not None:
+            entry = self._manifest_entries[name]
+            if entry.get("pickle"):
+                return pickle.loads(self._store.get(entry["hash"]))
+            mapped = self._map(self._store.blob_path(entry["hash"]))
+            value = (mapped, 0, len(mapped) if mapped is not None else 0, entry["dtype"], entry["shape"])
+        else:
+            value = self._entries[name]
+            if not isinstance(value, tuple):
+                return value
+
+        mapped, offset, nbytes, dtype, shape = value
+        dtype = _dtype_from_name(dtype)
+        if nbytes == 0:
+            tensor = torch.empty(shape, dtype=dtype)
+        else:
+            count = nbytes // torch.empty((), dtype=dtype).element_size()
+            tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=offset).reshape(shape)
+        return tensor.to(self.map_location) if self.map_location is not None else tensor
+
+    def get_statistics(self, name: str, chunk_size: int = 1 << 22) -> Dict[str, float]:
+        """
+        Returns summary statistics of a tensor, computed in chunks so that at most `chunk_size` elements are converted at a time.
+
+        Args:
+            name (str): The name of the tensor.
+            chunk_size (int): The number of elements processed at a time. Defaults to 4M.
+
+        Returns:
+            Dict[str, float]: The number of elements, mean, standard deviation, minimum, maximum and L2 norm.
+        """
+        import torch
+
+        flat = self.get_tensor(name).reshape(-1)
+        count, total, total_squares = flat.numel(), 0.0, 0.0
+        minimum, maximum = float("inf"), float("-inf")
+        for start in range(0, count, chunk_size):
+            chunk = flat[start:start + chunk_size].to(torch.float64)
+            total += chunk.sum().item()
+            total_squares += chunk.square().sum().item()
+            minimum = min(minimum, chunk.min().item())
+            maximum = max(maximum, chunk.max().item())
+
+        mean = total / count if count else float("nan")
+        variance = max(total_squares / count - mean * mean, 0.0) if count else float("nan")
+        return {
+            "numel": count, "mean": mean, "std": variance ** 0.5,
+            "min": minimum if count else float("nan"), "max": maximum if count else float("nan"),
+            "norm": total_squares ** 0.5,
+        }
+
+    def close(self) -> None:
+        """Releases the memory maps, tensors returned by `get_tensor` keep their own mapping alive."""
+        self._maps, self._entries, self._manifest_entries, self._state = {}, {}, None, None
+
+    def __enter__(self) -> 'ModelVersionReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def open_model_version(path: str, map_location: Any = None) -> ModelVersionReader:
+    """
+    Opens a model version for lazy reading of its tensors, see `ModelVersionReader`.
+
+    Args:
+        path (str): The path of the model version, as logged in the artifacts.
+        map_location (Any): The device tensors are moved to when read. Defaults to None, keeping them memory mapped on the CPU.
+
+    Returns:
+        ModelVersionReader: The reader.
+    """
+    return ModelVersionReader(path, map_location)
+
+def load_model_version(path: str, map_location: Any = None) -> Dict[str, Any]:
+    """
+    Loads the state dict of a model version saved by `save_model_version`, with any storage.
+
+    Args:
+        path (str): The path of the model version, as logged in the artifacts.
+        map_location (Any): The device to load the tensors on, as in `torch.load`. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: The state dict.
+    """
+    import torch
+
+    if path.endswith(DELTA_EXTENSION):
+        header, raw = _read_delta_raw(path)
+        state = {}
+        for name, entry in header["entries"].items():
+            if entry.get("pickle"):
+                state[name] = pickle.loads(raw[name].tobytes())
+            else:
+                tensor = _tensor_from_array(raw[name], entry["dtype"], entry["shape"])
+                state[name] = tensor.to(map_location) if map_location is not None else tensor
+        return state
+
+    if path.endswith(SAFETENSORS_EXTENSION):
+        reader = ModelVersionReader(path, map_location)
+        return {name: reader.get_tensor(name) for name in reader.keys()}
+
+    if not path.endswith(MANIFEST_EXTENSION):
+        return torch.load(path, map_location=map_location)
+
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Unsupported model manifest format: {manifest.get('format')}")
+
+    store = ContentAddressedStore(os.path.join(os.path.dirname(os.path.abspath(path)), manifest["objects"]))
+    state = {}
+    for name, entry in manifest["entries"].items():
+        data = store.get(entry["hash"])
+        if entry.get("pickle"):
+            state[name] = pickle.loads(data)
+        else:
+            tensor = _tensor_from_bytes(data, entry["dtype"], entry["shape"])
+            state[name] = tensor.to(map_location) if map_location is not None else tensor
+    return state
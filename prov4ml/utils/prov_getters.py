@@ -1,5 +1,4 @@
 import json
-import pandas as pd
 import numpy as np
 from prov4ml.utils.time_utils import timestamp_to_seconds
 
@@ -11,6 +10,8 @@ def get_metrics(data, keyword=None):
         return [m for m in ms if keyword in m]
 
 def get_metric(data, metric, time_in_sec=False, time_incremental=False):
+    import pandas as pd
+
     try: 
         epochs = eval(data["entity"][metric]["prov-ml:metric_epoch_list"])
         values = eval(data["entity"][metric]["prov-ml:metric_value_list"])
@@ -30,11 +31,15 @@ def get_metric(data, metric, time_in_sec=False, time_incremental=False):
     df = df.sort_values(by="time")
     return df
 
+def parse_metric_list(metric_list, dtype='f8'):
+    """Parses a metric list saved with numpy.array2string (e.g. "[0., 1.5]") into a numpy array."""
+    return np.fromstring(metric_list.strip().strip("[]"), dtype=dtype, sep=',')
+
 def get_metric_numpy(data, metric, time_in_sec=False, time_incremental=False):
     try: 
-        epochs = np.array(json.loads(data["entity"][metric]["prov-ml:metric_epoch_list"]), dtype='i4')
-        values = np.array(json.loads(data["entity"][metric]["prov-ml:metric_value_list"]), dtype='f4')
-        times = np.array(json.loads(data["entity"][metric]["prov-ml:metric_timestamp_list"]), dtype='i8')
+        epochs = parse_metric_list(data["entity"][metric]["prov-ml:metric_epoch_list"], dtype='i4')
+        values = parse_metric_list(data["entity"][metric]["prov-ml:metric_value_list"], dtype='f4')
+        times = parse_metric_list(data["entity"][metric]["prov-ml:metric_timestamp_list"], dtype='i8')
     except Exception as e: 
         print('Impossibile ottenere metriche per il campo: ' + metric)
         print('Errore:', e)
@@ -0,0 +1,361 @@
+import sys
+import math
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+class QuantileSketch:
+    """
+    A mergeable, fixed-memory quantile sketch with relative accuracy guarantees.
+
+    Values are counted in logarithmically spaced buckets (as in DDSketch), so any quantile
+    is returned within a relative error of `relative_accuracy`. Sketches built on different
+    processes or runs can be merged without loss, and the number of buckets is bounded by
+    `max_buckets`: when exceeded, the lowest buckets are collapsed together.
+
+    Attributes:
+    -----------
+    relative_accuracy : float
+        The relative accuracy of the returned quantiles.
+    max_buckets : int
+        The maximum number of buckets kept for positive and negative values.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add_to_buckets(self, buckets: Dict[int, int], values: np.ndarray) -> None:
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+        self._collapse(buckets)
+
+    def _collapse(self, buckets: Dict[int, int]) -> None:
+        if len(buckets) <= self.max_buckets: return
+        keys = sorted(buckets)
+        lowest = keys[len(keys) - self.max_buckets]
+        for key in keys[:len(keys) - self.max_buckets]:
+            buckets[lowest] += buckets.pop(key)
+
+    def update(self, values: Any) -> None:
+        """
+        Adds one value or an array of values to the sketch.
+
+        Parameters:
+        -----------
+        values : Any
+            A scalar or an array-like of values. NaN values are ignored.
+
+        Returns:
+        --------
+        None
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0: return
+
+        positive = values[values > 0]
+        negative = values[values < 0]
+        if positive.size:
+            self._add_to_buckets(self.positive, positive)
+        if negative.size:
+            self._add_to_buckets(self.negative, -negative)
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self.count += int(values.size)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """
+        Merges another sketch, built with the same accuracy, into this one.
+
+        Parameters:
+        -----------
+        other : QuantileSketch
+            The sketch to merge.
+
+        Returns:
+        --------
+        None
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge quantile sketches with different relative accuracy")
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_buckets.items():
+                buckets[key] = buckets.get(key, 0) + count
+            self._collapse(buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the approximate q-quantile of the values added to the sketch.
+
+        Parameters:
+        -----------
+        q : float
+            The quantile to compute, between 0 and 1.
+
+        Returns:
+        --------
+        Optional[float]
+            The approximate quantile, or None if the sketch is empty.
+        """
+        if self.count == 0: return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+
+class RunningStats:
+    """
+    Mergeable running statistics: count, mean, variance (Welford), min, max and quantiles.
+
+    Memory does not depend on the number of values added: arrays are reduced with NumPy and
+    combined with the running state using the parallel variant of Welford's algorithm, so the
+    statistics of different runs or processes can be merged exactly.
+
+    Attributes:
+    -----------
+    count : int
+        The number of values added.
+    mean : float
+        The mean of the values.
+    m2 : float
+        The sum of squared differences from the mean.
+    min : float
+        The minimum value.
+    max : float
+        The maximum value.
+    sketch : QuantileSketch
+        The sketch used to estimate quantiles.
+    """
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch()
+
+    def _combine(self, count: int, mean: float, m2: float, min_value: float, max_value: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def update(self, values: Any) -> None:
+        """
+        Adds one value or an array of values to the statistics.
+
+        Parameters:
+        -----------
+        values : Any
+            A scalar or an array-like of values. NaN values are ignored.
+
+        Returns:
+        --------
+        None
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0: return
+
+        mean = float(values.mean())
+        self._combine(int(values.size), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+        self.sketch.update(values)
+
+    def merge(self, other: 'RunningStats') -> None:
+        """
+        Merges the statistics computed on another set of values into this one.
+
+        Parameters:
+        -----------
+        other : RunningStats
+            The statistics to merge.
+
+        Returns:
+        --------
+        None
+        """
+        if other.count == 0: return
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def var(self) -> float:
+        """The population variance of the values."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """The population standard deviation of the values."""
+        return math.sqrt(self.var)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the statistics as a dictionary.
+
+        Returns:
+        --------
+        Dict[str, Any]
+            The count, mean, var, std, min, max and the 5th, 50th and 95th percentiles.
+        """
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "var": self.var,
+            "std": self.std,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p05": self.sketch.quantile(0.05),
+            "p50": self.sketch.quantile(0.5),
+            "p95": self.sketch.quantile(0.95),
+        }
+
+TENSOR_STATISTICS = ["norm", "mean", "std", "min", "max"]
+
+def tensor_statistics(tensors: Any, max_elements: Optional[int] = None) -> List[List[float]]:
+    """
+    Computes the L2 norm, mean, standard deviation, minimum and maximum of each tensor, with a single
+    device to host copy per device.
+
+    Norms are computed with a fused `torch._foreach_norm` call, means, standard deviations and extrema with
+    one reduction per tensor, and the results of the tensors of each device are stacked into one tensor, so that
+    no reduction waits for the host. Statistics are accumulated in float32 whatever the dtype of the tensors,
+    the standard deviation around the mean rather than from the sum of squares.
+
+    Parameters:
+    -----------
+    tensors : List[torch.Tensor]
+        The tensors, on any device.
+    max_elements : Optional[int]
+        If given, the mean, standard deviation and extrema of larger tensors are estimated on an evenly
+        strided sample of about `max_elements` elements. Norms are always exact. Defaults to None.
+
+    Returns:
+    --------
+    List[List[float]]
+        For each tensor, its statistics in the order of `TENSOR_STATISTICS`.
+    """
+    import torch
+
+    by_device: Dict[Any, List[int]] = {}
+    for index, tensor in enumerate(tensors):
+        by_device.setdefault(tensor.device, []).append(index)
+
+    results: List[List[float]] = [[] for _ in tensors]
+    for device, indices in by_device.items():
+        flats = [tensors[i].detach().reshape(-1) for i in indices]
+        norms = torch._foreach_norm(flats, 2, dtype=torch.float32)
+
+        samples = flats
+        if max_elements is not None and any(flat.numel() > max_elements for flat in flats):
+            samples = [flat[::-(-flat.numel() // max_elements)] if flat.numel() > max_elements else flat for flat in flats]
+
+        rows = []
+        for sample, norm in zip(samples, norms):
+            if sample.numel():
+                # centred, so the std of values with a large mean (e.g. norm weights close to 1) does not cancel out
+                std, mean = torch.std_mean(sample.float(), correction=0)
+                minimum, maximum = torch.aminmax(sample)
+            else:
+                std = mean = minimum = maximum = torch.full((), float("nan"), device=device)
+            rows.append(torch.stack([norm, mean, std, minimum.float(), maximum.float()]))
+
+        for index, row in zip(indices, torch.stack(rows).cpu().tolist()):
+            results[index] = row
+    return results
+
+def is_tensor(value: Any) -> bool:
+    """Returns whether the value is a torch tensor, without importing torch if it was not imported yet."""
+    torch = sys.modules.get("torch")
+    return torch is not None and isinstance(value, torch.Tensor)
+
+def stage_tensor(value: Any) -> Any:
+    """
+    Returns a detached float32 copy of a single-element tensor, on the same device.
+
+    The copy is queued on the device like any other operation, so staging a value does not wait for
+    the computation that produces it, and later in-place updates of `value` do not change the staged copy.
+
+    Parameters:
+    -----------
+    value : torch.Tensor
+        A tensor with a single element, on any device.
+
+    Returns:
+    --------
+    torch.Tensor
+        The 0-dimensional staged copy.
+    """
+    import torch
+
+    if value.numel() != 1:
+        raise ValueError(f"Tensor metric values must have a single element, got shape {tuple(value.shape)}.")
+    return value.detach().reshape(()).to(torch.float32, copy=True)
+
+def tensors_to_host(tensors: List[Any]) -> List[float]:
+    """
+    Copies staged single-element tensors (see `stage_tensor`) to host memory and returns their values.
+
+    The tensors of each device are stacked and transferred with a single copy, CUDA copies are issued
+    non-blocking into pinned memory for every device before waiting for any of them, so the host
+    synchronizes once per call rather than once per value.
+
+    Parameters:
+    -----------
+    tensors : List[torch.Tensor]
+        The staged tensors, on any device.
+
+    Returns:
+    --------
+    List[float]
+        The values of the tensors, in the same order.
+    """
+    import torch
+
+    by_device: Dict[Any, List[int]] = {}
+    for index, tensor in enumerate(tensors):
+        by_device.setdefault(tensor.device, []).append(index)
+
+    copies = []
+    for device, indices in by_device.items():
+        stacked = torch.stack([tensors[i] for i in indices])
+        if device.type == "cuda":
+            host = torch.empty(stacked.shape, dtype=stacked.dtype, pin_memory=True)
+            host.copy_(stacked, non_blocking=True)
+            event = torch.cuda.Event()
+            event.record(torch.cuda.current_stream(device))
+        else:
+            host, event = stacked.cpu(), None
+        copies.append((indices, host, event))
+
+    values: List[float] = [0.0] * len(tensors)
+    for indices, host, event in copies:
+        if event is not None:
+            event.synchronize()
+        for index, value in zip(indices, host.tolist()):
+            values[index] = value
+    return values
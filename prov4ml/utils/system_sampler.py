@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+import warnings
+from typing import Optional
+
+from prov4ml.constants import PROV4ML_DATA
+from prov4ml.configs import SILENT
+from prov4ml.datamodel.attribute_type import LoggingItemKind
+from prov4ml.utils import system_utils
+
+class SystemMetricsSampler(threading.Thread):
+    """
+    Daemon thread sampling the system metrics at a fixed interval, off the training loop.
+
+    Every sample is timestamped when taken and tagged with the step and context of the
+    last metric logged by the training loop, read from `PROV4ML_DATA.current_step` and
+    `PROV4ML_DATA.current_context` without any synchronization.
+
+    Attributes:
+    -----------
+    interval : float
+        The number of seconds between two samples.
+    """
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="prov4ml-system-sampler", daemon=True)
+        if interval <= 0:
+            raise ValueError("The system sampling interval must be positive.")
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _lower_priority(self) -> None:
+        # on Linux setpriority applies to the calling thread when given its native id
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def sample(self) -> None:
+        """Logs one sample of every system metric."""
+        metrics = system_utils.get_system_metrics()
+        timestamp = int(time.time() * 1000)
+        step = PROV4ML_DATA.current_step
+        context = PROV4ML_DATA.current_context
+        PROV4ML_DATA.add_metrics(metrics, step, context=context, source=LoggingItemKind.SYSTEM_METRIC, timestamp=timestamp)
+
+    def run(self) -> None:
+        self._lower_priority()
+        next_sample = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                if not SILENT:
+                    warnings.warn(f"Could not sample system metrics: {e}")
+
+            # keep a fixed rate regardless of how long sampling took
+            next_sample += self.interval
+            self._stop_event.wait(max(0.0, next_sample - time.monotonic()))
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the sampling and waits for the thread to exit."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+SAMPLER: Optional[SystemMetricsSampler] = None
+
+def _sampler_init(interval: Optional[float]) -> None:
+    """Starts the background system metrics sampler, if an interval is given."""
+    global SAMPLER
+    _sampler_stop()
+    if interval is None or not PROV4ML_DATA.is_collecting: return
+    SAMPLER = SystemMetricsSampler(interval)
+    SAMPLER.start()
+
+def _sampler_stop() -> None:
+    """Stops the background system metrics sampler, if running."""
+    global SAMPLER
+    if SAMPLER is not None:
+        SAMPLER.stop()
+        SAMPLER = None
@@ -1,24 +1,282 @@
 
+import os
 import psutil
-import torch
 import sys
 import warnings
+from typing import Any, Dict, List, Optional
 
 from prov4ml.configs import SILENT
 
-if sys.platform != 'darwin':
-    import GPUtil
-    import gpustat
+GPU_FIELDS = ["memory_usage", "usage", "temperature", "power_usage"]
 
-    if torch.cuda.device_count() == 0:
+def _to_float(value: Any) -> float:
+    """Converts a value returned by a GPU library to float, unavailable values become 0.0."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class GpuBackend:
+    """
+    Base class of the libraries used to read GPU metrics.
+
+    Backends open their device handles once, when created, and `query` reads every
+    field of every device in a single pass, returning one dictionary per device with
+    the keys in `GPU_FIELDS`: memory usage (fraction of the total memory), usage (%),
+    temperature (Celsius) and power usage (W).
+    """
+    name = "none"
+
+    def query(self) -> List[Dict[str, float]]:
+        return []
+
+class NvidiaGpuBackend(GpuBackend):
+    """Reads NVIDIA GPUs through NVML, using cached `nvitop.Device` handles."""
+    name = "nvitop"
+
+    def __init__(self) -> None:
+        from nvitop import Device
+        self.devices = Device.all()
+
+    def query(self) -> List[Dict[str, float]]:
+        samples = []
+        for device in self.devices:
+            memory_total = _to_float(device.memory_total())
+            samples.append({
+                "memory_usage": _to_float(device.memory_used()) / memory_total if memory_total else 0.0,
+                "usage": _to_float(device.gpu_utilization()),
+                "temperature": _to_float(device.temperature()),
+                "power_usage": _to_float(device.power_usage()) / 1000,
+            })
+        return samples
+
+class AmdGpuBackend(GpuBackend):
+    """Reads AMD GPUs through cached `pyamdgpuinfo` handles."""
+    name = "pyamdgpuinfo"
+
+    def __init__(self) -> None:
+        import pyamdgpuinfo
+        self.devices = [pyamdgpuinfo.get_gpu(i) for i in range(pyamdgpuinfo.detect_gpus())]
+
+    def query(self) -> List[Dict[str, float]]:
+        samples = []
+        for device in self.devices:
+            memory_total = _to_float(device.memory_info.get("vram_size"))
+            samples.append({
+                "memory_usage": _to_float(device.query_vram_usage()) / memory_total if memory_total else 0.0,
+                "usage": _to_float(device.query_utilization()) * 100,
+                "temperature": _to_float(device.query_temperature()),
+                "power_usage": _to_float(device.query_power()),
+            })
+        return samples
+
+class GPUtilGpuBackend(GpuBackend):
+    """Reads NVIDIA GPUs through `GPUtil`, with a single `nvidia-smi` call for all devices and fields."""
+    name = "GPUtil"
+
+    def __init__(self) -> None:
+        import GPUtil
+        self._gputil = GPUtil
+
+    def query(self) -> List[Dict[str, float]]:
+        return [{
+            "memory_usage": _to_float(gpu.memoryUtil),
+            "usage": _to_float(gpu.load) * 100,
+            "temperature": _to_float(gpu.temperature),
+            "power_usage": 0.0,
+        } for gpu in self._gputil.getGPUs()]
+
+class AppleGpuBackend(GpuBackend):
+    """Reads the Apple silicon GPU through `apple_gpu`."""
+    name = "apple_gpu"
+
+    def __init__(self) -> None:
+        import apple_gpu
+        self._apple_gpu = apple_gpu
+
+    def query(self) -> List[Dict[str, float]]:
+        statistics = self._apple_gpu.accelerator_performance_statistics()
+        return [{
+            "memory_usage": _to_float(statistics.get('Alloc system memory')),
+            "usage": _to_float(statistics.get('Device Utilization %')),
+            "temperature": 0.0,
+            "power_usage": 0.0,
+        }]
+
+def _resolve_gpu_backend() -> GpuBackend:
+    """Selects the GPU library for this machine, preferring in-process libraries over `nvidia-smi`."""
+    import torch
+
+    if sys.platform == 'darwin':
+        candidates = [AppleGpuBackend]
+    elif torch.cuda.device_count() == 0:
         if not SILENT:
             warnings.warn("No GPU found")
-    elif "AMD" in torch.cuda.get_device_name(0): 
-        import pyamdgpuinfo
-    elif "NVIDIA" in torch.cuda.get_device_name(0): 
-        from nvitop import Device
-else: 
-    import apple_gpu
+        return GpuBackend()
+    elif "AMD" in torch.cuda.get_device_name(0):
+        candidates = [AmdGpuBackend]
+    else:
+        candidates = [NvidiaGpuBackend, GPUtilGpuBackend]
+
+    for backend in candidates:
+        try:
+            return backend()
+        except Exception as e:
+            if not SILENT:
+                warnings.warn(f"Could not initialize GPU backend {backend.name}: {e}")
+    return GpuBackend()
+
+class GpuProbe:
+    """
+    Reads the metrics of the GPUs, resolving the backend library and device handles only once.
+
+    A full snapshot of all GPU fields costs a single `query` to the backend, instead of one
+    device lookup (and possibly one `nvidia-smi` launch) per metric.
+
+    Attributes:
+    -----------
+    backend : GpuBackend
+        The backend used to read the devices. Any object with a `query` method returning one
+        dictionary of `GPU_FIELDS` per device can be used, e.g. a fake backend for testing.
+    device_index : int
+        The index of the device reported by `sample`.
+    """
+    def __init__(self, backend: Optional[GpuBackend] = None, device_index: Optional[int] = None) -> None:
+        self.backend = backend if backend is not None else _resolve_gpu_backend()
+        if device_index is None:
+            import torch
+            device_index = torch.cuda.current_device() if torch.cuda.is_available() else 0
+        self.device_index = device_index
+
+    def sample(self, per_device: bool = False) -> Dict[str, float]:
+        """
+        Returns all the GPU metrics of the selected device, read with a single backend query.
+
+        Parameters:
+            per_device (bool): Whether to also return the metrics of every device, named `gpu_<field>_<index>`. Defaults to False.
+
+        Returns:
+            Dict[str, float]: The GPU metrics, named `gpu_<field>`. Fields are 0.0 if no GPU is available.
+        """
+        devices = self.backend.query()
+        device = devices[self.device_index] if self.device_index < len(devices) else {}
+        sample = {f"gpu_{field}": device.get(field, 0.0) for field in GPU_FIELDS}
+        if per_device:
+            for index, device in enumerate(devices):
+                for field in GPU_FIELDS:
+                    sample[f"gpu_{field}_{index}"] = device.get(field, 0.0)
+        return sample
+
+GPU_PROBE: Optional[GpuProbe] = None
+
+def _gpu_init(backend: Optional[GpuBackend] = None) -> None:
+    """Initializes the GPU probe, resolving the backend and the device handles."""
+    global GPU_PROBE
+    GPU_PROBE = GpuProbe(backend)
+
+def get_gpu_probe() -> GpuProbe:
+    """
+    Returns the GPU probe, initializing it on first use if `start_run` has not been called.
+    
+    Returns:
+        GpuProbe: The GPU probe.
+    """
+    if GPU_PROBE is None:
+        _gpu_init()
+    return GPU_PROBE
+
+class ProcessProbe:
+    """
+    Reads the resources used by the training process and by its child processes (e.g. DataLoader workers).
+
+    `psutil.Process` handles are kept between samples, so children are only looked up by pid
+    when they are first seen, and exited children are dropped.
+
+    Attributes:
+    -----------
+    process : psutil.Process
+        The training process.
+    """
+    def __init__(self, pid: Optional[int] = None) -> None:
+        self.process = psutil.Process(pid)
+        self._children: Dict[int, psutil.Process] = {}
+
+    def _get_children(self) -> List[psutil.Process]:
+        children = {}
+        for child in self.process.children(recursive=True):
+            children[child.pid] = self._children.get(child.pid, child)
+        self._children = children
+        return list(children.values())
+
+    def sample(self) -> Dict[str, float]:
+        """
+        Returns the memory and CPU time of the process and of its children.
+
+        Returns:
+            Dict[str, float]: `process_rss` (bytes) and `process_cpu_time` (s) of the training process,
+            `workers_count`, `workers_rss` and `workers_cpu_time` summed over its children.
+        """
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            cpu_times = self.process.cpu_times()
+
+        workers_count, workers_rss, workers_cpu_time = 0, 0, 0.0
+        for child in self._get_children():
+            try:
+                with child.oneshot():
+                    workers_rss += child.memory_info().rss
+                    child_times = child.cpu_times()
+                workers_cpu_time += child_times.user + child_times.system
+                workers_count += 1
+            except psutil.Error:
+                continue
+
+        return {
+            "process_rss": float(rss),
+            "process_cpu_time": cpu_times.user + cpu_times.system,
+            "workers_count": float(workers_count),
+            "workers_rss": float(workers_rss),
+            "workers_cpu_time": workers_cpu_time,
+        }
+
+PROCESS_PROBE: Optional[ProcessProbe] = None
+
+def _process_init() -> None:
+    """Initializes the probe of the training process and its children."""
+    global PROCESS_PROBE
+    PROCESS_PROBE = ProcessProbe()
+
+def get_process_probe() -> ProcessProbe:
+    """
+    Returns the process probe, initializing it on first use or after a fork.
+    
+    Returns:
+        ProcessProbe: The process probe.
+    """
+    if PROCESS_PROBE is None or PROCESS_PROBE.process.pid != os.getpid():
+        _process_init()
+    return PROCESS_PROBE
+
+def get_system_metrics(per_device: bool = True, per_process: bool = True) -> Dict[str, float]:
+    """
+    Returns a snapshot of all system metrics.
+
+    Args:
+        per_device (bool): Whether to include the metrics of every GPU, named `gpu_<field>_<index>`. Defaults to True.
+        per_process (bool): Whether to include the resources of the training process and its workers. Defaults to True.
+
+    Returns:
+        Dict[str, float]: The CPU, memory, disk and GPU metrics, by metric name.
+    """
+    metrics = {
+        "cpu_usage": get_cpu_usage(),
+        "memory_usage": get_memory_usage(),
+        "disk_usage": get_disk_usage(),
+        **get_gpu_probe().sample(per_device=per_device),
+    }
+    if per_process:
+        metrics.update(get_process_probe().sample())
+    return metrics
 
 def get_cpu_usage() -> float:
     """
@@ -49,47 +307,21 @@ def get_disk_usage() -> float:
 
 def get_gpu_memory_usage() -> float:
     """
-    Returns the current GPU memory usage percentage, if GPU is available.
+    Returns the current GPU memory usage, as a fraction of the total memory, if GPU is available.
     
     Returns:
-        float: The GPU memory usage percentage.
-    """    
-    if sys.platform != 'darwin':
-        if torch.cuda.is_available():
-            return torch.cuda.memory_allocated() / torch.cuda.memory_reserved()
-        else: 
-            if "NVIDIA" in torch.cuda.get_device_name(0):
-                devices = Device.all()
-                if len(devices) == 0:  
-                    return 0.0
-                device = devices[0] 
-                return device.memory_used / device.memory_total
-            return 0.0
-    else: 
-        return get_gpu_metric_apple('memory')
+        float: The GPU memory usage.
+    """
+    return get_gpu_probe().sample()["gpu_memory_usage"]
 
-    
 def get_gpu_power_usage() -> float:
     """
-    Returns the current GPU power usage percentage, if GPU is available.
+    Returns the current GPU power usage in W, if GPU is available.
     
     Returns:
-        float: The GPU power usage percentage.
-    """
-    if sys.platform != 'darwin':
-        if torch.cuda.device_count() == 0:
-            print("RET")
-            return 0.0
-
-        gpu_power = 0.0
-        if torch.cuda.is_available():
-            gpu_power = get_gpu_metric_gputil('power')
-        if not gpu_power and "AMD" in torch.cuda.get_device_name(0):
-            gpu_power = get_gpu_metric_amd('power')
-    else:
-        gpu_power = get_gpu_metric_apple('power')
-
-    return gpu_power
+        float: The GPU power usage.
+    """
+    return get_gpu_probe().sample()["gpu_power_usage"]
     
 def get_gpu_temperature() -> float:
     """
@@ -98,22 +330,7 @@ def get_gpu_temperature() -> float:
     Returns:
         float: The GPU temperature.
     """
-    if sys.platform != 'darwin':
-        if torch.cuda.device_count() == 0:
-            return 0.0
-
-        gpu_temperature = 0.0
-        if torch.cuda.is_available():
-            gpu_temperature = get_gpu_metric_gputil('temperature')
-        if not gpu_temperature and "NVIDIA" in torch.cuda.get_device_name(0): 
-            gpu_utilization = get_gpu_metric_nvidia('temperature')
-        if not gpu_temperature and "AMD" in torch.cuda.get_device_name(0): 
-            gpu_temperature = get_gpu_metric_amd('temperature')
-
-    else:
-        gpu_temperature = get_gpu_metric_apple('temperature')
-
-    return gpu_temperature
+    return get_gpu_probe().sample()["gpu_temperature"]
 
 def get_gpu_usage() -> float:
     """
@@ -122,84 +339,4 @@ def get_gpu_usage() -> float:
     Returns:
         float: The GPU usage percentage.
     """
-    if sys.platform != 'darwin':
-        if torch.cuda.device_count() == 0:
-            return 0.0
-        
-        gpu_utilization = 0.0
-        if torch.cuda.is_available():
-            gpu_utilization = get_gpu_metric_gputil('utilization')
-        if not gpu_utilization and "NVIDIA" in torch.cuda.get_device_name(0):
-            gpu_utilization = get_gpu_metric_nvidia('utilization')
-        if not gpu_utilization and "AMD" in torch.cuda.get_device_name(0):
-            gpu_utilization = get_gpu_metric_amd('utilization')
-    else:
-        gpu_utilization = get_gpu_metric_apple('utilization')
-
-    return gpu_utilization
-
-def get_gpu_metric_amd(metric): 
-    try: 
-        first_gpu = pyamdgpuinfo.get_gpu(0)
-        if metric == 'power':
-            m = first_gpu.query_power()
-        elif metric == 'temperature':
-            m = first_gpu.query_temperature()
-        elif metric == 'utilization':
-            m = first_gpu.query_utilization()
-
-        return m
-    except:
-        if not SILENT:
-            warnings.warn(f"Could not get metric: {metric}")
-        return 0.0
-
-def get_gpu_metric_nvidia(metric):
-
-    devices = Device.all()
-    if len(devices) == 0:  
-        return None
-    device = devices[0] 
-
-    if metric == 'temperature':
-        return device.temperature()
-    elif metric == "utilization": 
-        return device.gpu_utilization()
-    elif metric == 'fan_speed': 
-        return device.fan_speed()
-    elif metric == 'memory_total':
-        return device.memory_total_human()
-    else: 
-        if not SILENT:
-            warnings.warn(f"Could not get metric: {metric}")
-        return 0.0
-
-def get_gpu_metric_gputil(metric):
-    current_gpu = torch.cuda.current_device()
-    gpus = GPUtil.getGPUs()
-    if current_gpu < len(gpus):
-        if metric == 'temperature':
-            return gpus[current_gpu].temperature
-        elif metric == "utilization": 
-            return gpus[current_gpu].load
-        else: 
-            return 0.0
-    else:
-        if not SILENT:
-            warnings.warn(f"Could not get metric: {metric}")
-        return 0.0
-
-def get_gpu_metric_apple(metric):
-    statistics = apple_gpu.accelerator_performance_statistics()
-    if metric == 'power':
-        return 0.0
-    elif metric == 'temperature':
-        return 0.0
-    elif metric == 'utilization':
-        return statistics['Device Utilization %']
-    elif metric == 'memory':
-        return statistics['Alloc system memory']
-    else: 
-        if not SILENT:
-            warnings.warn(f"Could not get metric: {metric}")
-        return 0.0
\ No newline at end of file
+    return get_gpu_probe().sample()["gpu_usage"]
@@ -0,0 +1,93 @@
+import os
+import shutil
+from contextlib import contextmanager
+
+def is_zip_store(path: str) -> bool:
+    """
+    Checks if the given path refers to a single-file (zip) zarr store.
+
+    Parameters:
+    -----------
+    path : str
+        The path of the zarr store.
+
+    Returns:
+    --------
+    bool
+        True if the store is a zip file, False otherwise.
+    """
+    return path.endswith(".zip")
+
+@contextmanager
+def open_zarr_store(path: str, mode: str = 'r'):
+    """
+    Context manager opening a zarr group stored either as a directory or as a single zip file.
+
+    Zip stores are opened in place, chunks are read with random access and never extracted.
+    The underlying zip file is closed when the context exits.
+
+    Parameters:
+    -----------
+    path : str
+        The path of the zarr store. Paths ending in `.zip` are opened as `zarr.ZipStore`.
+    mode : str
+        The mode used to open the store. Defaults to 'r'.
+
+    Yields:
+    -------
+    zarr.hierarchy.Group
+        The root group of the store.
+    """
+    import zarr
+
+    if not is_zip_store(path):
+        yield zarr.open(path, mode=mode)
+        return
+
+    store = zarr.ZipStore(path, mode=mode)
+    try:
+        yield zarr.open(store, mode=mode)
+    finally:
+        store.close()
+
+def pack_zarr_to_zip(zarr_dir: str, zip_file: str, remove_source: bool = True) -> None:
+    """
+    Packs a directory zarr store into a single zip file that can be opened in place.
+
+    Parameters:
+    -----------
+    zarr_dir : str
+        The path of the directory store to pack.
+    zip_file : str
+        The path of the zip file to create.
+    remove_source : bool
+        Whether to delete the directory store once it has been packed. Defaults to True.
+
+    Returns:
+    --------
+    None
+    """
+    import zarr
+
+    # chunks are already compressed by zarr, the zip only stores them
+    with zarr.ZipStore(zip_file, mode='w') as store:
+        zarr.copy_store(zarr.DirectoryStore(zarr_dir), store)
+
+    if remove_source:
+        shutil.rmtree(zarr_dir)
+
+def get_zarr_staging_path(zip_file: str) -> str:
+    """
+    Returns the directory store used to accumulate data before it is packed into `zip_file`.
+
+    Parameters:
+    -----------
+    zip_file : str
+        The path of the zip store.
+
+    Returns:
+    --------
+    str
+        The path of the directory store, `zip_file` without the `.zip` suffix.
+    """
+    return os.path.splitext(zip_file)[0]
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from prov4ml.utils.system_utils import GPU_FIELDS, GpuBackend, GpuProbe, GPUtilGpuBackend, NvidiaGpuBackend
+
+class FakeGpuBackend(GpuBackend):
+    name = "fake"
+
+    def __init__(self, devices):
+        self.devices = devices
+        self.queries = 0
+
+    def query(self):
+        self.queries += 1
+        return self.devices
+
+DEVICES = [
+    {"memory_usage": 0.25, "usage": 50.0, "temperature": 60.0, "power_usage": 150.0},
+    {"memory_usage": 0.5, "usage": 100.0, "temperature": 70.0, "power_usage": 300.0},
+]
+
+def test_sample_selected_device():
+    backend = FakeGpuBackend(DEVICES)
+    probe = GpuProbe(backend, device_index=1)
+
+    assert probe.sample() == {f"gpu_{field}": DEVICES[1][field] for field in GPU_FIELDS}
+    assert backend.queries == 1
+
+def test_sample_per_device():
+    backend = FakeGpuBackend(DEVICES)
+    probe = GpuProbe(backend, device_index=0)
+
+    sample = probe.sample(per_device=True)
+    expected = {f"gpu_{field}": DEVICES[0][field] for field in GPU_FIELDS}
+    for index, device in enumerate(DEVICES):
+        expected.update({f"gpu_{field}_{index}": device[field] for field in GPU_FIELDS})
+    assert sample == expected
+    # all the fields of all the devices are read with a single query
+    assert backend.queries == 1
+
+    probe.sample(per_device=True)
+    assert backend.queries == 2
+
+def test_sample_without_gpu():
+    probe = GpuProbe(FakeGpuBackend([]), device_index=0)
+    assert probe.sample(per_device=True) == {f"gpu_{field}": 0.0 for field in GPU_FIELDS}
+
+class FakeNvitopDevice:
+    def __init__(self, memory_used, memory_total, utilization, temperature, power_mw):
+        self._values = (memory_used, memory_total, utilization, temperature, power_mw)
+
+    def memory_used(self): return self._values[0]
+    def memory_total(self): return self._values[1]
+    def gpu_utilization(self): return self._values[2]
+    def temperature(self): return self._values[3]
+    def power_usage(self): return self._values[4]
+
+def test_nvitop_units_are_normalized():
+    # created without __init__, which opens the NVML device handles
+    backend = NvidiaGpuBackend.__new__(NvidiaGpuBackend)
+    backend.devices = [FakeNvitopDevice(2 << 30, 8 << 30, 40, 55, 120_000), FakeNvitopDevice("N/A", "N/A", "N/A", "N/A", "N/A")]
+
+    sample = GpuProbe(backend, device_index=0).sample(per_device=True)
+
+    assert sample["gpu_memory_usage"] == pytest.approx(0.25)
+    assert sample["gpu_usage"] == 40.0
+    assert sample["gpu_temperature"] == 55.0
+    assert sample["gpu_power_usage"] == pytest.approx(120.0) # mW to W
+    # unavailable values are reported as 0.0
+    assert all(sample[f"gpu_{field}_1"] == 0.0 for field in GPU_FIELDS)
+
+def test_gputil_units_are_normalized():
+    backend = GPUtilGpuBackend.__new__(GPUtilGpuBackend)
+    backend._gputil = SimpleNamespace(getGPUs=lambda: [SimpleNamespace(memoryUtil=0.5, load=0.75, temperature=65.0)])
+
+    sample = GpuProbe(backend, device_index=0).sample()
+
+    assert sample == {"gpu_memory_usage": 0.5, "gpu_usage": 75.0, "gpu_temperature": 65.0, "gpu_power_usage": 0.0}
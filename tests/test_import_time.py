@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy dependencies, imported only when the features using them are
+LAZY_MODULES = ("torch", "codecarbon", "zarr", "lightning", "pandas", "fvcore", "GPUtil", "gpustat", "nvitop")
+
+# cumulative import time of prov4ml, in seconds, about 0.15s is spent importing numpy and prov
+IMPORT_TIME_BUDGET = 1.0
+
+def import_times() -> dict:
+    """Returns the cumulative import time in seconds of every module imported by `import prov4ml`."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import prov4ml"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    # each line of -X importtime reads "import time: <self us> | <cumulative us> | <indented module name>"
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"): continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative) / 1e6
+    return times
+
+def test_import_does_not_load_heavy_dependencies():
+    imported = import_times()
+    for module in LAZY_MODULES:
+        assert module not in imported, f"import prov4ml imports {module}"
+
+def test_import_time_budget():
+    assert import_times()["prov4ml"] < IMPORT_TIME_BUDGET
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from prov4ml.utils.energy_utils import RaplEnergyBackend
+
+MAX_ENERGY_UJ = 1_000_000
+
+def write_zone(root, entry, name, energy_uj, max_energy_uj=MAX_ENERGY_UJ):
+    zone = os.path.join(root, entry)
+    os.makedirs(zone, exist_ok=True)
+    for file, value in (("name", name), ("max_energy_range_uj", max_energy_uj), ("energy_uj", energy_uj)):
+        with open(os.path.join(zone, file), "w") as f:
+            f.write(f"{value}\n")
+
+def set_energy(root, entry, energy_uj):
+    with open(os.path.join(root, entry, "energy_uj"), "w") as f:
+        f.write(f"{energy_uj}\n")
+
+@pytest.fixture
+def powercap(tmp_path):
+    root = str(tmp_path)
+    write_zone(root, "intel-rapl:0", "package-0", 100)
+    write_zone(root, "intel-rapl:1", "package-1", 200)
+    write_zone(root, "intel-rapl:0:0", "core", 0)
+    write_zone(root, "intel-rapl:0:1", "dram", 50)
+    return root
+
+def test_sums_package_and_dram_zones(powercap):
+    backend = RaplEnergyBackend(root=powercap, poll_interval=None)
+    assert [zone.name for zone in backend.cpu_zones] == ["package-0", "package-1"]
+    assert [zone.name for zone in backend.ram_zones] == ["dram"]
+
+    set_energy(powercap, "intel-rapl:0", 100 + 2_000)
+    set_energy(powercap, "intel-rapl:1", 200 + 3_000)
+    set_energy(powercap, "intel-rapl:0:0", 500_000) # subzone of package-0, not counted twice
+    set_energy(powercap, "intel-rapl:0:1", 50 + 4_000)
+    reading = backend.read()
+
+    assert reading["cpu_energy"] == pytest.approx(0.005)
+    assert reading["ram_energy"] == pytest.approx(0.004)
+    assert reading["gpu_energy"] == 0.0
+    assert reading["energy_consumed"] == pytest.approx(0.009)
+
+def test_counter_wraparound(powercap):
+    set_energy(powercap, "intel-rapl:0", MAX_ENERGY_UJ - 1_000)
+    backend = RaplEnergyBackend(root=powercap, poll_interval=None)
+
+    set_energy(powercap, "intel-rapl:0", 500)
+    assert backend.read()["cpu_energy"] == pytest.approx(0.0015)
+
+    set_energy(powercap, "intel-rapl:0", 2_500)
+    assert backend.read()["cpu_energy"] == pytest.approx(0.0035)
+
+def test_no_rapl_zone(tmp_path):
+    with pytest.raises(ValueError):
+        RaplEnergyBackend(root=str(tmp_path / "missing"), poll_interval=None)
+
+    root = str(tmp_path / "powercap")
+    write_zone(root, "intel-rapl:0:1", "dram", 0)
+    with pytest.raises(ValueError):
+        RaplEnergyBackend(root=root, poll_interval=None)
+
+def test_stop_joins_poller(powercap):
+    backend = RaplEnergyBackend(root=powercap, poll_interval=0.01)
+    backend.stop()
+    assert not backend._thread.is_alive()